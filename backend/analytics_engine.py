@@ -1,12 +1,24 @@
 """
 Advanced Analytics Engine
-Provides trend analysis, pattern recognition, and insights
+Provides trend analysis, pattern recognition, and insights per sensor
+node, with zone and fleet views derived from the node partitions
 """
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+import time
 import numpy as np
-from collections import defaultdict
+from collections import OrderedDict, deque
 from pydantic import BaseModel
+from config import settings
+from models import DEFAULT_NODE_ID
+from metric_buffer import MetricRingBuffer, to_epoch, from_epoch
+from streaming_stats import MetricSeries, WindowStats
+from quantile_sketch import TDigest
+from rollups import RollupPyramid, combine_aggregates
+from anomaly_detector import ANOMALY_METRICS, AnomalyEvent, MetricAnomalyDetector
+from pattern_engine import DEFAULT_PATTERNS, NodePatterns, PatternEvent, PatternSpec
+from diurnal_baseline import DiurnalBaseline, pooled_expected
+from smart_alerts import alert_system
 
 
 class TrendAnalysis(BaseModel):
@@ -18,9 +30,15 @@ class TrendAnalysis(BaseModel):
     trend_strength: float  # 0-1
     forecast_24h: float
     anomaly_detected: bool
+    expected_value: Optional[float] = None  # Diurnal baseline for the current hour of week
+
+
+RESIDUAL_DECAY_HOURS = 6  # How fast a departure from the diurnal baseline fades in forecasts
+ANALYTICS_FIELDS = ['temperature', 'humidity', 'smoke_level', 'rain_level', 'fire_risk_score']
 
 
 class PatternRecognition(BaseModel):
+    node_id: Optional[str] = None
     pattern_type: str
     confidence: float
     description: str
@@ -29,56 +47,441 @@ class PatternRecognition(BaseModel):
     severity: str
 
 
+class AnalyticsPartition:
+    """
+    Analytics state of one sensor node: a ring buffer of its readings
+    (one shared timestamp column), rollups sharing one bucket time axis,
+    a MetricSeries per metric, plus an hour-of-week baseline and
+    streaming anomaly detectors for the monitored metrics
+
+    Buffer and rollups are preallocated and the quantile sketches have a
+    fixed number of bounded buckets, so footprint() is an upper bound on
+    a partition's arrays: about 0.6 MB for ANALYTICS_FIELDS with a 1-day
+    buffer (raw rows ~140 KB, rollups ~360 KB, sketches ~130 KB).
+    AdvancedAnalytics holds no more partitions than its memory budget
+    allows at that size.
+    """
+    
+    # Class defaults cover partitions restored from snapshots taken before these existed
+    newest: Optional[float] = None  # Timestamp of the latest accepted reading
+    late_points = 0  # Readings dropped for arriving older than `newest`
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer = MetricRingBuffer(capacity)
+        self.rollups = RollupPyramid()
+        self.series: Dict[str, MetricSeries] = {}
+        self.baselines: Dict[str, DiurnalBaseline] = {}
+        self.detectors: Dict[str, MetricAnomalyDetector] = {}
+        self.patterns = NodePatterns()
+        self.last_update = time.monotonic()
+        self.version = 0  # Engine data_version at the last update
+    
+    @classmethod
+    def footprint(cls, capacity: int, metrics: List[str] = ANALYTICS_FIELDS) -> int:
+        """Upper bound in bytes of a partition holding `metrics`"""
+        partition = cls(capacity)
+        for metric in metrics:
+            partition.series[metric] = MetricSeries(partition.buffer, partition.rollups, metric)
+        return partition.nbytes
+    
+    @property
+    def nbytes(self) -> int:
+        """Buffer and rollup arrays plus the quantile sketches' upper bound"""
+        return self.buffer.nbytes + self.rollups.nbytes + sum(s.nbytes for s in self.series.values())
+    
+    def latest(self) -> Optional[float]:
+        """Epoch time of the newest accepted reading"""
+        if self.newest is None and len(self.buffer):
+            self.newest = float(self.buffer.last_timestamp)
+        return self.newest
+    
+    def add(self, seconds: float, data: Dict) -> Optional[List[Tuple[str, float, Tuple]]]:
+        """
+        Append a reading; returns (metric, value, detection) for newly fired detectors
+        A reading older than the node's latest is dropped (None): buffers,
+        rollups and baselines all assume time order
+        """
+        newest = self.latest()
+        if newest is not None and seconds < newest:
+            self.late_points += 1
+            return None
+        self.newest = seconds
+        values = {key: float(value) for key, value in data.items() if isinstance(value, (int, float))}
+        for key in values:
+            if key not in self.series:
+                self.series[key] = MetricSeries(self.buffer, self.rollups, key)
+        
+        # One row for every metric; series lose the row it overwrites first
+        if len(self.buffer) == self.capacity:
+            for series in self.series.values():
+                series.drop_oldest()
+        self.buffer.append(seconds, values)
+        self.rollups.add(seconds, values)
+        for key, series in self.series.items():
+            series.add(seconds, values.get(key))
+        
+        detections = []
+        for key, value in values.items():
+            if key in ANOMALY_METRICS:
+                if key not in self.baselines:
+                    self.baselines[key] = DiurnalBaseline()
+                if key not in self.detectors:
+                    self.detectors[key] = MetricAnomalyDetector(self.baselines[key])
+                # Score against the baseline before it absorbs the reading
+                detection = self.detectors[key].update(seconds, value)
+                self.baselines[key].add(seconds, value)
+                if detection:
+                    detections.append((key, value, detection))
+        self.last_update = time.monotonic()
+        return detections
+
+
 class AdvancedAnalytics:
     """
     Advanced analytics for fire risk prediction and insights
+    
+    State is partitioned by node. Queries take a node_id, a list of
+    node_ids (e.g. a zone's nodes) or neither for the whole fleet;
+    multi-node results pool the partitions' running statistics,
+    sketches and rollups without touching raw points.
     """
     
-    def __init__(self):
-        self.data_buffer = defaultdict(list)  # Store recent data
-        self.max_buffer_size = 10080  # 1 week at 1 min intervals
-    
-    def add_data_point(self, timestamp: datetime, data: Dict):
-        """Add a new data point to the analytics buffer"""
-        for key, value in data.items():
-            if isinstance(value, (int, float)):
-                self.data_buffer[key].append({
-                    'timestamp': timestamp,
-                    'value': value
-                })
-                
-                # Trim buffer if too large
-                if len(self.data_buffer[key]) > self.max_buffer_size:
-                    self.data_buffer[key] = self.data_buffer[key][-self.max_buffer_size:]
+    def __init__(self, max_buffer_size: int = 1440, max_partitions: int = 500,
+                 partition_idle_seconds: float = 86400,
+                 pattern_specs: Optional[List[PatternSpec]] = None,
+                 memory_budget_bytes: Optional[float] = None):
+        self.max_buffer_size = max_buffer_size  # Per node: 1 day at 1 min intervals
+        # Partitions are preallocated, so a budget caps how many are held
+        self.partition_bytes = AnalyticsPartition.footprint(max_buffer_size)
+        if memory_budget_bytes is not None:
+            max_partitions = max(1, min(max_partitions, int(memory_budget_bytes // self.partition_bytes)))
+        self.max_partitions = max_partitions
+        self.partition_idle_seconds = partition_idle_seconds
+        # node_id -> partition, least recently updated first
+        self.partitions: "OrderedDict[str, AnalyticsPartition]" = OrderedDict()
+        # Bumped on every data point; keys the insights memo
+        self.data_version = 0
+        self.insights_cache_size = 256
+        self._insights_cache: "OrderedDict[tuple, Tuple[object, Dict]]" = OrderedDict()
+        # Live points held back while history is being loaded (see begin_bulk_load)
+        self.bulk_loading = False
+        self._pending: deque = deque(maxlen=100000)
+        # Streaming anomaly events, newest last, and their subscribers
+        self.recent_anomalies: deque = deque(maxlen=500)
+        self.anomaly_listeners: List[Callable[[AnomalyEvent], None]] = []
+        # Pattern specs evaluated on every data point, and their start/end events
+        self.pattern_specs: List[PatternSpec] = list(pattern_specs or DEFAULT_PATTERNS)
+        self.recent_pattern_events: deque = deque(maxlen=500)
+        self.pattern_listeners: List[Callable[[PatternEvent], None]] = []
+    
+    def add_data_point(self, timestamp: datetime, data: Dict, node_id: str = DEFAULT_NODE_ID):
+        """Add a new data point to the node's analytics partition"""
+        if self.bulk_loading:
+            self._pending.append((timestamp, data, node_id))
+            return
+        self._add_point(timestamp, data, node_id, publish=True)
+    
+    def add_history_point(self, timestamp: datetime, data: Dict, node_id: str = DEFAULT_NODE_ID):
+        """
+        Add a point regardless of bulk loading; history must arrive oldest first
+        Detectors learn from it but anomaly events are not published
+        """
+        self._add_point(timestamp, data, node_id, publish=False)
+    
+    def _partition(self, node_id: str) -> AnalyticsPartition:
+        """A node's partition, created if needed and marked most recently used"""
+        partition = self.partitions.get(node_id)
+        if partition is None:
+            partition = self.partitions[node_id] = AnalyticsPartition(self.max_buffer_size)
+        else:
+            self.partitions.move_to_end(node_id)
+        return partition
+    
+    def _add_point(self, timestamp: datetime, data: Dict, node_id: str, publish: bool):
+        partition = self._partition(node_id)
+        
+        seconds = to_epoch(timestamp)
+        detections = partition.add(seconds, data)
+        if detections is None:
+            return  # Late reading
+        pattern_events = partition.patterns.update(
+            node_id, seconds, data, self.pattern_specs, partition.baselines
+        )
+        self.data_version += 1
+        partition.version = self.data_version
+        if publish:
+            if detections:
+                self._publish_anomalies(node_id, timestamp, detections)
+            for event in pattern_events:
+                self._publish_pattern_event(event)
+        self._evict_partitions()
+    
+    def get_baseline_states(self, newer_than: Optional[Dict[Tuple[str, str], float]] = None) -> List[Dict]:
+        """
+        Hour-of-week baseline states of every node and metric, for persistence
+        With newer_than ((node_id, metric) -> through), only those updated since
+        """
+        states = []
+        for node_id, partition in self.partitions.items():
+            for metric, baseline in partition.baselines.items():
+                if baseline.last_t is None:
+                    continue
+                if newer_than is not None and newer_than.get((node_id, metric), -1) >= baseline.last_t:
+                    continue
+                states.append({'node_id': node_id, 'metric': metric, **baseline.get_state()})
+        return states
+    
+    def set_baseline_state(self, node_id: str, metric: str, state: Dict):
+        """
+        Install a persisted baseline unless the node's current one is newer
+        Readings it already covers are not added to it again
+        """
+        partition = self._partition(node_id)
+        current = partition.baselines.get(metric)
+        if current is not None and current.last_t is not None and \
+                (state.get('through') is None or current.last_t >= state['through']):
+            return
+        baseline = DiurnalBaseline()
+        baseline.set_state(state)
+        partition.baselines[metric] = baseline
+        partition.detectors.pop(metric, None)  # Rebuilt around the new baseline
+    
+    def _expected(self, metric: str, offset_seconds: float = 0, node_id: Optional[str] = None,
+                  node_ids: Optional[List[str]] = None) -> Optional[Tuple[float, float]]:
+        """
+        Pooled diurnal (mean, std) of a metric `offset_seconds` after each
+        node's latest reading; None unless every node in scope has one
+        """
+        pairs = [
+            (p.baselines.get(metric), p.series[metric].last_timestamp + offset_seconds)
+            for p in self._select(node_id, node_ids)
+            if metric in p.series and len(p.series[metric])
+        ]
+        if not pairs or any(b is None for b, _ in pairs):
+            return None
+        return pooled_expected([b for b, _ in pairs], [t for _, t in pairs])
+    
+    def _diurnal_forecast(self, metric: str, current_value: float, hours_ahead: float,
+                          node_id: Optional[str] = None,
+                          node_ids: Optional[List[str]] = None) -> Optional[float]:
+        """
+        Baseline for the target hour plus today's departure from the
+        baseline, fading over RESIDUAL_DECAY_HOURS
+        """
+        now = self._expected(metric, 0, node_id, node_ids)
+        later = self._expected(metric, hours_ahead * 3600, node_id, node_ids)
+        if now is None or later is None:
+            return None
+        residual = current_value - now[0]
+        return later[0] + residual * np.exp(-hours_ahead / RESIDUAL_DECAY_HOURS)
+    
+    def subscribe_anomalies(self, listener: Callable[[AnomalyEvent], None]):
+        """Call listener with every anomaly event as it is detected"""
+        self.anomaly_listeners.append(listener)
+    
+    def _publish_anomalies(self, node_id: str, timestamp: datetime, detections: List[Tuple]):
+        for metric, value, (score, expected, detectors) in detections:
+            event = AnomalyEvent(
+                node_id=node_id,
+                metric=metric,
+                value=value,
+                expected=expected,
+                score=score,
+                detectors=detectors,
+                direction="high" if score > 0 else "low",
+                timestamp=timestamp
+            )
+            self.recent_anomalies.append(event)
+            for listener in self.anomaly_listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"⚠️ Anomaly listener failed: {e}")
+    
+    def subscribe_patterns(self, listener: Callable[[PatternEvent], None]):
+        """Call listener with every pattern start and end event as it happens"""
+        self.pattern_listeners.append(listener)
+    
+    def _publish_pattern_event(self, event: PatternEvent):
+        self.recent_pattern_events.append(event)
+        for listener in self.pattern_listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"⚠️ Pattern listener failed: {e}")
+    
+    def get_pattern_events(self, node_id: Optional[str] = None, node_ids: Optional[List[str]] = None,
+                           limit: int = 50) -> List[PatternEvent]:
+        """Recent pattern start/end events in scope, newest first"""
+        if node_id is not None:
+            node_ids = [node_id]
+        scope = set(node_ids) if node_ids is not None else None
+        events = [e for e in reversed(self.recent_pattern_events) if scope is None or e.node_id in scope]
+        return events[:limit]
+    
+    def set_pattern_specs(self, specs: List[PatternSpec]):
+        """
+        Replace the pattern specs
+        Pattern state restarts, so windows refill from new data
+        """
+        self.pattern_specs = list(specs)
+        for partition in self.partitions.values():
+            partition.patterns = NodePatterns()
+        self.data_version += 1
+        for partition in self.partitions.values():
+            partition.version = self.data_version
+    
+    def get_anomalies(self, node_id: Optional[str] = None, node_ids: Optional[List[str]] = None,
+                      limit: int = 50) -> List[AnomalyEvent]:
+        """Recent anomaly events in scope, newest first"""
+        if node_id is not None:
+            node_ids = [node_id]
+        scope = set(node_ids) if node_ids is not None else None
+        events = [e for e in reversed(self.recent_anomalies) if scope is None or e.node_id in scope]
+        return events[:limit]
     
-    def analyze_trends(self, metric: str = 'temperature') -> Optional[TrendAnalysis]:
+    def is_anomalous(self, metric: str, node_id: Optional[str] = None,
+                     node_ids: Optional[List[str]] = None) -> bool:
+        """Whether any streaming detector is currently raised for the metric in scope"""
+        return any(
+            p.detectors[metric].is_anomalous
+            for p in self._select(node_id, node_ids) if metric in p.detectors
+        )
+    
+    def begin_bulk_load(self):
+        """
+        Start replaying history through add_history_point
+        Live points are queued meanwhile so they don't land before
+        older history (buffers clamp out-of-order timestamps)
+        """
+        self.bulk_loading = True
+    
+    def end_bulk_load(self) -> int:
+        """Finish a bulk load and apply the queued live points; returns how many"""
+        self.bulk_loading = False
+        replayed = 0
+        while self._pending:
+            self._add_point(*self._pending.popleft(), publish=True)
+            replayed += 1
+        return replayed
+    
+    def newest_timestamp(self) -> Optional[datetime]:
+        """Timestamp of the newest point in any partition"""
+        newest = self.newest_by_node()
+        return from_epoch(max(newest.values())) if newest else None
+    
+    def newest_by_node(self) -> Dict[str, float]:
+        """Epoch time of each node's newest point"""
+        newest = {node_id: p.latest() for node_id, p in self.partitions.items()}
+        return {node_id: t for node_id, t in newest.items() if t is not None}
+    
+    def get_state(self) -> Dict:
+        """Picklable snapshot of every partition"""
+        return {'partitions': self.partitions, 'data_version': self.data_version}
+    
+    def set_state(self, state: Dict):
+        """Replace all partitions with a snapshot from get_state"""
+        now = time.monotonic()
+        self.partitions = state['partitions']
+        for partition in self.partitions.values():
+            partition.last_update = now  # Monotonic clocks don't survive restarts
+        self.data_version = max(self.data_version, state.get('data_version', 0)) + 1
+        for partition in self.partitions.values():
+            partition.version = self.data_version
+        self._insights_cache.clear()
+    
+    def _evict_partitions(self):
+        """Drop idle partitions and the least recently updated ones beyond the limit"""
+        now = time.monotonic()
+        while self.partitions:
+            node_id, oldest = next(iter(self.partitions.items()))
+            if len(self.partitions) <= self.max_partitions and \
+                    now - oldest.last_update <= self.partition_idle_seconds:
+                break
+            del self.partitions[node_id]
+            print(f"📊 Evicted analytics partition for {node_id}")
+    
+    def _select(self, node_id: Optional[str] = None,
+                node_ids: Optional[List[str]] = None) -> List[AnalyticsPartition]:
+        """Partitions in scope: one node, a list of nodes, or the whole fleet"""
+        if node_id is not None:
+            node_ids = [node_id]
+        if node_ids is None:
+            return list(self.partitions.values())
+        return [self.partitions[n] for n in node_ids if n in self.partitions]
+    
+    def _series(self, metric: str, node_id: Optional[str] = None,
+                node_ids: Optional[List[str]] = None) -> List[MetricSeries]:
+        """A metric's series in every partition in scope"""
+        return [
+            p.series[metric] for p in self._select(node_id, node_ids)
+            if metric in p.series and len(p.series[metric])
+        ]
+    
+    def get_partition_summary(self) -> List[Dict]:
+        """Nodes with analytics state, their metrics and buffered points"""
+        now = time.monotonic()
+        return [
+            {
+                'node_id': node_id,
+                'metrics': {metric: len(series) for metric, series in partition.series.items()},
+                'late_points': partition.late_points,
+                'bytes': partition.nbytes,
+                'idle_seconds': round(now - partition.last_update, 1)
+            }
+            for node_id, partition in self.partitions.items()
+        ]
+    
+    def window(self, metric: str, start: datetime, end: Optional[datetime] = None,
+               node_id: str = DEFAULT_NODE_ID) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (epoch-second timestamps, values) of a node's metric between start and end
+        Found by binary search on the time-ordered buffer; returns views
+        unless some readings in the window lack the metric
+        """
+        partition = self.partitions.get(node_id)
+        if partition is None or metric not in partition.series:
+            return np.empty(0), np.empty(0)
+        buffer = partition.buffer
+        end_seconds = to_epoch(end) if end else buffer.last_timestamp
+        timestamps, values = buffer.window(metric, to_epoch(start), end_seconds)
+        present = ~np.isnan(values)
+        if present.all():
+            return timestamps, values
+        return timestamps[present], values[present]
+    
+    def analyze_trends(self, metric: str = 'temperature', node_id: Optional[str] = None,
+                       node_ids: Optional[List[str]] = None) -> Optional[TrendAnalysis]:
         """
         Analyze trends for a specific metric
-        Uses moving averages and linear regression
+        Uses moving averages and linear regression; across several nodes
+        the current value is the mean of their latest readings
         """
-        if metric not in self.data_buffer or len(self.data_buffer[metric]) < 100:
+        series = self._series(metric, node_id, node_ids)
+        if sum(len(s) for s in series) < 100:
             return None
         
-        data = self.data_buffer[metric]
-        current_value = data[-1]['value']
-        
-        # Calculate moving averages
-        recent_24h = [d['value'] for d in data if 
-                     (data[-1]['timestamp'] - d['timestamp']).total_seconds() <= 86400]
-        recent_7d = [d['value'] for d in data if 
-                    (data[-1]['timestamp'] - d['timestamp']).total_seconds() <= 604800]
+        current_value = float(np.mean([s.last_value for s in series]))
+        last_timestamp = max(s.last_timestamp for s in series)
+        day = WindowStats.merged([s.windows['24h'] for s in series])
+        week = self.aggregate(metric, from_epoch(last_timestamp - 7 * 86400), from_epoch(last_timestamp),
+                              3600, node_id, node_ids)
         
-        avg_24h = np.mean(recent_24h) if recent_24h else current_value
-        avg_7d = np.mean(recent_7d) if recent_7d else current_value
+        # 24h average from the running window sums, 7d from hourly rollups
+        avg_24h = day.mean if day.n else current_value
+        avg_7d = week['mean'] if week['count'] else current_value
+        expected = self._expected(metric, 0, node_id, node_ids)
         
-        # Calculate trend using linear regression
-        if len(recent_24h) > 10:
-            x = np.arange(len(recent_24h))
-            y = np.array(recent_24h)
-            slope, intercept = np.polyfit(x, y, 1)
+        # Calculate trend using linear regression (slope per minute)
+        if day.n > 10:
+            slope, _ = day.regression()
             
-            # Forecast 24 hours ahead
-            forecast_24h = intercept + slope * (len(recent_24h) + 1440)  # +24 hours
+            # Forecast 24 hours ahead from the diurnal baseline, or the
+            # regression line until the baseline covers both hours
+            forecast_24h = self._diurnal_forecast(metric, current_value, 24, node_id, node_ids)
+            if forecast_24h is None:
+                forecast_24h = day.predict(last_timestamp + 86400)
             
             # Determine trend direction and strength
             if abs(slope) < 0.01:
@@ -91,9 +494,14 @@ class AdvancedAnalytics:
                 trend_direction = "decreasing"
                 trend_strength = min(1.0, abs(slope) * 10)
             
-            # Detect anomalies (values > 2 std deviations from mean)
-            std_dev = np.std(recent_24h)
-            anomaly_detected = abs(current_value - avg_24h) > (2 * std_dev)
+            # Detect anomalies (values > 2 std deviations from the expected
+            # value for this hour of week, or from the 24h mean until the
+            # baseline has it; or a streaming detector currently raised)
+            if expected is not None:
+                anomaly_detected = bool(abs(current_value - expected[0]) > 2 * expected[1])
+            else:
+                anomaly_detected = bool(abs(current_value - avg_24h) > (2 * day.std))
+            anomaly_detected = anomaly_detected or self.is_anomalous(metric, node_id, node_ids)
         else:
             forecast_24h = current_value
             trend_direction = "stable"
@@ -107,108 +515,85 @@ class AdvancedAnalytics:
             average_7d=avg_7d,
             trend_direction=trend_direction,
             trend_strength=trend_strength,
-            forecast_24h=forecast_24h,
-            anomaly_detected=anomaly_detected
+            forecast_24h=float(forecast_24h),
+            anomaly_detected=anomaly_detected,
+            expected_value=expected[0] if expected is not None else None
         )
     
-    def detect_patterns(self) -> List[PatternRecognition]:
+    def detect_patterns(self, node_id: Optional[str] = None,
+                        node_ids: Optional[List[str]] = None) -> List[PatternRecognition]:
         """
-        Detect common fire risk patterns
+        Fire risk patterns currently active in each node in scope
+        Pattern state machines advance with every data point, so this
+        only reads their state
         """
         patterns = []
-        
-        # Pattern 1: Continuous high temperature + low humidity
-        temp_data = self.data_buffer.get('temperature', [])
-        humidity_data = self.data_buffer.get('humidity', [])
-        
-        if temp_data and humidity_data:
-            recent_temps = [d['value'] for d in temp_data[-60:]]  # Last hour
-            recent_humidity = [d['value'] for d in humidity_data[-60:]]
-            
-            if len(recent_temps) > 30:
-                avg_temp = np.mean(recent_temps)
-                avg_humidity = np.mean(recent_humidity)
-                
-                if avg_temp > 35 and avg_humidity < 30:
-                    patterns.append(PatternRecognition(
-                        pattern_type="extreme_dryness",
-                        confidence=0.9,
-                        description="Sustained high temperature with low humidity",
-                        start_time=temp_data[-60]['timestamp'],
-                        end_time=None,
-                        severity="high"
-                    ))
-        
-        # Pattern 2: Rapid temperature increase
-        if temp_data and len(temp_data) > 30:
-            recent = [d['value'] for d in temp_data[-30:]]
-            older = [d['value'] for d in temp_data[-60:-30]] if len(temp_data) > 60 else recent
-            
-            temp_increase = np.mean(recent) - np.mean(older)
-            if temp_increase > 5:  # 5°C increase in 30 minutes
+        for partition in self._select(node_id, node_ids):
+            for started in partition.patterns.active.values():
                 patterns.append(PatternRecognition(
-                    pattern_type="rapid_heating",
-                    confidence=0.85,
-                    description=f"Temperature increased by {temp_increase:.1f}°C in 30 minutes",
-                    start_time=temp_data[-30]['timestamp'],
-                    end_time=temp_data[-1]['timestamp'],
-                    severity="medium"
-                ))
-        
-        # Pattern 3: Smoke spike detection
-        smoke_data = self.data_buffer.get('smoke_level', [])
-        if smoke_data and len(smoke_data) > 10:
-            recent_smoke = [d['value'] for d in smoke_data[-10:]]
-            baseline = np.mean([d['value'] for d in smoke_data[-60:-10]]) if len(smoke_data) > 60 else 0
-            
-            current_smoke = recent_smoke[-1]
-            if current_smoke > baseline * 2 and current_smoke > 1500:
-                patterns.append(PatternRecognition(
-                    pattern_type="smoke_spike",
-                    confidence=0.95,
-                    description=f"Sudden smoke increase: {current_smoke:.0f} (baseline: {baseline:.0f})",
-                    start_time=smoke_data[-10]['timestamp'],
+                    node_id=started.node_id,
+                    pattern_type=started.pattern_type,
+                    confidence=started.confidence,
+                    description=started.description,
+                    start_time=started.start_time,
                     end_time=None,
-                    severity="critical"
+                    severity=started.severity
                 ))
-        
-        # Pattern 4: Diurnal risk pattern (time of day analysis)
-        if temp_data:
-            current_hour = datetime.utcnow().hour
-            if 12 <= current_hour <= 16:  # Peak heat hours
-                avg_temp = np.mean([d['value'] for d in temp_data[-60:]])
-                if avg_temp > 33:
-                    patterns.append(PatternRecognition(
-                        pattern_type="peak_heat_hours",
-                        confidence=0.8,
-                        description="High risk during peak heat hours (12pm-4pm)",
-                        start_time=datetime.utcnow().replace(hour=12, minute=0),
-                        end_time=datetime.utcnow().replace(hour=16, minute=0),
-                        severity="medium"
-                    ))
-        
         return patterns
     
-    def generate_insights(self) -> Dict:
+    def _scope_version(self, node_id: Optional[str] = None,
+                       node_ids: Optional[List[str]] = None):
+        """Data version of the partitions in scope; changes whenever any of them gets data"""
+        if node_id is not None:
+            node_ids = [node_id]
+        if node_ids is None:
+            return self.data_version
+        return tuple(self.partitions[n].version if n in self.partitions else -1 for n in node_ids)
+    
+    def generate_insights(self, node_id: Optional[str] = None,
+                          node_ids: Optional[List[str]] = None) -> Dict:
         """
         Generate comprehensive insights from analytics
+        Covers one node, a list of nodes, or the whole fleet
+        
+        Results are memoized per scope until new data arrives for it.
+        The returned dict is shared between callers and must not be modified.
         """
+        key = (node_id, tuple(node_ids) if node_ids is not None else None)
+        version = self._scope_version(node_id, node_ids)
+        
+        cached = self._insights_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._insights_cache.move_to_end(key)
+            return cached[1]
+        
+        insights = self._compute_insights(node_id, node_ids)
+        self._insights_cache[key] = (version, insights)
+        if len(self._insights_cache) > self.insights_cache_size:
+            self._insights_cache.popitem(last=False)
+        return insights
+    
+    def _compute_insights(self, node_id: Optional[str] = None,
+                          node_ids: Optional[List[str]] = None) -> Dict:
+        """Build the insights returned by generate_insights"""
         insights = {
             'trends': {},
             'patterns': [],
             'recommendations': [],
             'risk_forecast': {},
-            'statistics': {}
+            'statistics': {},
+            'anomalies': []
         }
         
         # Analyze trends for key metrics
+        trends = {}
         for metric in ['temperature', 'humidity', 'smoke_level', 'fire_risk_score']:
-            trend = self.analyze_trends(metric)
-            if trend:
-                insights['trends'][metric] = trend.dict()
+            trends[metric] = self.analyze_trends(metric, node_id, node_ids)
+            if trends[metric]:
+                insights['trends'][metric] = trends[metric].dict()
         
         # Detect patterns
-        patterns = self.detect_patterns()
+        patterns = self.detect_patterns(node_id, node_ids)
         insights['patterns'] = [p.dict() for p in patterns]
         
         # Generate recommendations based on patterns
@@ -238,36 +623,47 @@ class AdvancedAnalytics:
                         'reason': 'Smoke levels exceed safety threshold'
                     })
         
+        # Latest streaming anomaly events
+        insights['anomalies'] = [e.dict() for e in self.get_anomalies(node_id, node_ids, limit=10)]
+        
         # Calculate statistics
-        insights['statistics'] = self._calculate_statistics()
+        insights['statistics'] = self._calculate_statistics(node_id, node_ids)
         
         # Risk forecast
-        insights['risk_forecast'] = self._generate_risk_forecast()
+        insights['risk_forecast'] = self._generate_risk_forecast(node_id, node_ids, trends)
         
         return insights
     
-    def _calculate_statistics(self) -> Dict:
+    def _calculate_statistics(self, node_id: Optional[str] = None,
+                              node_ids: Optional[List[str]] = None) -> Dict:
         """Calculate key statistics from historical data"""
         stats = {}
         
         for metric in ['temperature', 'humidity', 'smoke_level']:
-            if metric in self.data_buffer and self.data_buffer[metric]:
-                values = [d['value'] for d in self.data_buffer[metric][-1440:]]  # Last 24h
-                
-                if values:
-                    stats[metric] = {
-                        'current': values[-1],
-                        'min_24h': np.min(values),
-                        'max_24h': np.max(values),
-                        'avg_24h': np.mean(values),
-                        'std_24h': np.std(values),
-                        'percentile_95': np.percentile(values, 95)
-                    }
+            series = self._series(metric, node_id, node_ids)
+            day = WindowStats.merged([s.windows['24h'] for s in series])
+            
+            if day.n:
+                # Last 24h of each node
+                recent = [s.recent('24h')[1] for s in series if s.windows['24h'].n]
+                stats[metric] = {
+                    'current': float(np.mean([s.last_value for s in series])),
+                    'min_24h': float(min(np.min(v) for v in recent)),
+                    'max_24h': float(max(np.max(v) for v in recent)),
+                    'avg_24h': day.mean,
+                    'std_24h': day.std,
+                    'percentile_95': self.percentile(metric, 0.95, 86400, node_id, node_ids)
+                }
         
         return stats
     
-    def _generate_risk_forecast(self) -> Dict:
-        """Generate fire risk forecast for next 24 hours"""
+    def _generate_risk_forecast(self, node_id: Optional[str] = None,
+                                node_ids: Optional[List[str]] = None,
+                                trends: Optional[Dict[str, Optional[TrendAnalysis]]] = None) -> Dict:
+        """
+        Generate fire risk forecast for next 24 hours
+        Reuses trend analyses already computed by the caller
+        """
         forecast = {
             'next_1h': {'risk_score': 0, 'confidence': 0},
             'next_6h': {'risk_score': 0, 'confidence': 0},
@@ -275,14 +671,24 @@ class AdvancedAnalytics:
         }
         
         # Use trend analysis for forecasting
-        risk_trend = self.analyze_trends('fire_risk_score')
-        temp_trend = self.analyze_trends('temperature')
+        trends = trends or {}
+        risk_trend = trends['fire_risk_score'] if 'fire_risk_score' in trends \
+            else self.analyze_trends('fire_risk_score', node_id, node_ids)
+        temp_trend = trends['temperature'] if 'temperature' in trends \
+            else self.analyze_trends('temperature', node_id, node_ids)
         
         if risk_trend and temp_trend:
             current_risk = risk_trend.current_value
+            diurnal = {
+                key: self._diurnal_forecast('fire_risk_score', current_risk, hours, node_id, node_ids)
+                for key, hours in (('next_1h', 1), ('next_6h', 6), ('next_24h', 24))
+            }
             
-            # Simple linear extrapolation
-            if risk_trend.trend_direction == "increasing":
+            # Diurnal baseline where it covers the hour, else simple linear extrapolation
+            if all(v is not None for v in diurnal.values()):
+                for key, value in diurnal.items():
+                    forecast[key]['risk_score'] = float(min(100, max(0, value)))
+            elif risk_trend.trend_direction == "increasing":
                 forecast['next_1h']['risk_score'] = min(100, current_risk + 2)
                 forecast['next_6h']['risk_score'] = min(100, current_risk + 8)
                 forecast['next_24h']['risk_score'] = min(100, risk_trend.forecast_24h)
@@ -296,16 +702,20 @@ class AdvancedAnalytics:
                 forecast['next_24h']['risk_score'] = current_risk
             
             # Confidence based on trend strength and data availability
-            base_confidence = 0.7 if len(self.data_buffer['fire_risk_score']) > 500 else 0.5
+            risk_points = sum(len(s) for s in self._series('fire_risk_score', node_id, node_ids))
+            base_confidence = 0.7 if risk_points > 500 else 0.5
             forecast['next_1h']['confidence'] = base_confidence + 0.2
             forecast['next_6h']['confidence'] = base_confidence
             forecast['next_24h']['confidence'] = base_confidence - 0.1
         
         return forecast
     
-    def get_historical_comparison(self, days_back: int = 7) -> Dict:
+    def get_historical_comparison(self, days_back: int = 7, node_id: Optional[str] = None,
+                                  node_ids: Optional[List[str]] = None) -> Dict:
         """
         Compare current conditions with historical data
+        Averages cover days_back (from rollups); percentiles cover at most
+        the quantile sketches' retention, reported as percentile_days
         """
         comparison = {
             'current_vs_weekly_avg': {},
@@ -313,33 +723,106 @@ class AdvancedAnalytics:
             'safest_times': []
         }
         
-        cutoff = datetime.utcnow() - timedelta(days=days_back)
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=days_back)
         
         for metric in ['temperature', 'humidity', 'fire_risk_score']:
-            if metric in self.data_buffer:
-                historical = [d for d in self.data_buffer[metric] 
-                            if d['timestamp'] >= cutoff]
+            series = self._series(metric, node_id, node_ids)
+            if series:
+                # ~168 buckets over the range is plenty for an average
+                history = self.aggregate(metric, cutoff, now, days_back * 86400 / 168, node_id, node_ids)
                 
-                if historical:
-                    historical_values = [d['value'] for d in historical]
-                    current_value = historical[-1]['value']
-                    avg_value = np.mean(historical_values)
+                if history['count']:
+                    current_value = float(np.mean([s.last_value for s in series]))
+                    avg_value = history['mean']
+                    # Quantile sketches only reach back as far as their retention (7 days)
+                    retention = min(s.quantiles.bucket_seconds * s.quantiles.num_buckets for s in series)
+                    rank_window = min(days_back * 86400, retention)
+                    rank = self.percentile_rank(metric, current_value, rank_window, node_id, node_ids)
                     
                     comparison['current_vs_weekly_avg'][metric] = {
                         'current': current_value,
                         'weekly_avg': avg_value,
                         'difference': current_value - avg_value,
-                        'percentile': self._calculate_percentile(current_value, historical_values)
+                        'percentile': int(rank * 100),
+                        'percentile_days': round(rank_window / 86400, 2)
                     }
         
         return comparison
     
-    def _calculate_percentile(self, value: float, dataset: List[float]) -> int:
-        """Calculate percentile rank of a value in dataset"""
-        sorted_data = sorted(dataset)
-        rank = sum(1 for v in sorted_data if v <= value)
-        return int((rank / len(sorted_data)) * 100)
+    def aggregate(self, metric: str, start: datetime, end: Optional[datetime] = None,
+                  resolution_seconds: float = 3600, node_id: Optional[str] = None,
+                  node_ids: Optional[List[str]] = None) -> Dict:
+        """
+        count/mean/std/min/max of a metric between start and end, from the
+        coarsest rollup tier that meets resolution_seconds and covers start
+        """
+        series = self._series(metric, node_id, node_ids)
+        end_seconds = to_epoch(end) if end else max((s.last_timestamp for s in series), default=0)
+        return combine_aggregates([
+            s.rollups.aggregate(s.metric, to_epoch(start), end_seconds, resolution_seconds)
+            for s in series
+        ])
+    
+    def downsample(self, metric: str, start: datetime, end: Optional[datetime] = None,
+                   resolution_seconds: float = 3600, node_id: Optional[str] = None,
+                   node_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Per-bucket count/mean/min/max of a metric, e.g. for long-range charts"""
+        series = self._series(metric, node_id, node_ids)
+        end_seconds = to_epoch(end) if end else max((s.last_timestamp for s in series), default=0)
+        merged: Dict[float, Dict] = {}
+        
+        for s in series:
+            buckets = s.rollups.series(s.metric, to_epoch(start), end_seconds, resolution_seconds)
+            for i in range(len(buckets['count'])):
+                count = int(buckets['count'][i])
+                entry = merged.setdefault(float(buckets['timestamp'][i]), {
+                    'count': 0, 'sum': 0.0, 'min': float('inf'), 'max': float('-inf')
+                })
+                entry['count'] += count
+                entry['sum'] += float(buckets['mean'][i]) * count
+                entry['min'] = min(entry['min'], float(buckets['min'][i]))
+                entry['max'] = max(entry['max'], float(buckets['max'][i]))
+        
+        return [
+            {
+                'timestamp': from_epoch(t),
+                'count': entry['count'],
+                'mean': entry['sum'] / max(entry['count'], 1),
+                'min': entry['min'],
+                'max': entry['max']
+            }
+            for t, entry in sorted(merged.items())
+        ]
+    
+    def _digest(self, metric: str, window_seconds: float, node_id: Optional[str] = None,
+                node_ids: Optional[List[str]] = None) -> Optional[TDigest]:
+        """A metric's quantile sketch over the window, merged across nodes in scope"""
+        series = self._series(metric, node_id, node_ids)
+        if not series:
+            return None
+        if len(series) == 1:
+            return series[0].quantiles.digest(window_seconds)
+        return TDigest.merged(s.quantiles.digest(window_seconds) for s in series)
+    
+    def percentile(self, metric: str, q: float, window_seconds: float = 86400,
+                   node_id: Optional[str] = None, node_ids: Optional[List[str]] = None) -> Optional[float]:
+        """q-th quantile (0-1) of a metric over the window, from its sketches"""
+        digest = self._digest(metric, window_seconds, node_id, node_ids)
+        return digest.quantile(q) if digest is not None else None
+    
+    def percentile_rank(self, metric: str, value: float, window_seconds: float = 86400,
+                        node_id: Optional[str] = None, node_ids: Optional[List[str]] = None) -> Optional[float]:
+        """Fraction (0-1) of a metric's values over the window at or below value"""
+        digest = self._digest(metric, window_seconds, node_id, node_ids)
+        return digest.rank(value) if digest is not None else None
 
 
 # Global analytics instance
-analytics_engine = AdvancedAnalytics()
+analytics_engine = AdvancedAnalytics(
+    max_buffer_size=settings.analytics_buffer_size_per_node,
+    max_partitions=settings.analytics_max_partitions,
+    partition_idle_seconds=settings.analytics_partition_idle_hours * 3600,
+    memory_budget_bytes=settings.analytics_memory_budget_mb * 1e6
+)
+analytics_engine.subscribe_anomalies(alert_system.publish_anomaly)
@@ -0,0 +1,243 @@
+"""
+Analytics Warm Start
+Refills the analytics engine after a restart, from a local snapshot file
+and/or recent sensor_data in MongoDB, in the background with progress,
+and persists the long-memory diurnal baselines to MongoDB
+"""
+import os
+import asyncio
+import joblib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+from config import settings
+from models import DEFAULT_NODE_ID
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from analytics_engine import ANALYTICS_FIELDS, AdvancedAnalytics, analytics_engine
+from metric_buffer import to_epoch
+
+
+BASELINE_SAVE_SECONDS = 600  # Minimum interval between baseline saves from ingestion
+
+_baselines_saved_at: Optional[datetime] = None
+_baselines_saved_through: Dict = {}  # (node_id, metric) -> through of the last save
+
+SNAPSHOT_FORMAT = 6  # Bumped whenever partition contents change
+
+
+def save_snapshot(engine: AdvancedAnalytics, path: str) -> int:
+    """Write the engine's partitions to a binary file; returns the file size"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    joblib.dump({
+        'format': SNAPSHOT_FORMAT,
+        'saved_at': datetime.utcnow(),
+        'state': engine.get_state()
+    }, tmp_path)
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def restore_snapshot(engine: AdvancedAnalytics, path: str) -> Optional[datetime]:
+    """
+    Load partitions from a snapshot file
+    Returns the snapshot's newest reading time, or None if there is no usable snapshot
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        snapshot = joblib.load(path)
+        if snapshot.get('format') != SNAPSHOT_FORMAT:
+            print(f"⚠️ Ignoring analytics snapshot with format {snapshot.get('format')}")
+            return None
+        engine.set_state(snapshot['state'])
+    except Exception as e:
+        print(f"⚠️ Could not restore analytics snapshot: {e}")
+        return None
+    return engine.newest_timestamp()
+
+
+async def save_baselines(db, engine: AdvancedAnalytics) -> int:
+    """
+    Write baselines updated since the last save to db.analytics_baselines
+    A stored baseline is only replaced by one covering later readings, so
+    processes with staler engines can't roll it back
+    """
+    global _baselines_saved_at
+    _baselines_saved_at = datetime.utcnow()
+    states = engine.get_baseline_states(newer_than=_baselines_saved_through)
+    if not states:
+        return 0
+
+    for state in states:
+        state['updated_at'] = _baselines_saved_at
+    try:
+        await db.analytics_baselines.bulk_write([
+            UpdateOne(
+                {'_id': f"{state['node_id']}:{state['metric']}", 'through': {'$lt': state['through']}},
+                {'$set': state},
+                upsert=True
+            )
+            for state in states
+        ], ordered=False)
+    except BulkWriteError as e:
+        # A newer stored baseline makes the upsert collide on _id; keep it
+        if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+            raise
+
+    for state in states:
+        _baselines_saved_through[(state['node_id'], state['metric'])] = state['through']
+    return len(states)
+
+
+async def maybe_save_baselines(db, engine: AdvancedAnalytics = analytics_engine):
+    """save_baselines at most every BASELINE_SAVE_SECONDS (called per reading by ingestion)"""
+    if _baselines_saved_at and \
+            (datetime.utcnow() - _baselines_saved_at).total_seconds() < BASELINE_SAVE_SECONDS:
+        return
+    try:
+        saved = await save_baselines(db, engine)
+        if saved:
+            print(f"📊 Saved {saved} diurnal baselines")
+    except Exception as e:
+        print(f"⚠️ Could not save diurnal baselines: {e}")
+
+
+async def load_baselines(db, engine: AdvancedAnalytics) -> int:
+    """Install stored baselines that are newer than the engine's; returns how many were read"""
+    count = 0
+    async for doc in db.analytics_baselines.find({'through': {'$ne': None}}):
+        engine.set_baseline_state(doc['node_id'], doc['metric'], doc)
+        _baselines_saved_through[(doc['node_id'], doc['metric'])] = doc['through']
+        count += 1
+    return count
+
+
+class AnalyticsWarmStart:
+    """
+    Background loader for the analytics engine
+
+    Restores the snapshot if there is one, then streams the readings it
+    lacks (or the last `days` of readings) from sensor_data, oldest first,
+    with a projected and batched cursor. Live points arriving meanwhile are
+    queued by the engine and applied once history is in.
+    """
+
+    def __init__(self, engine: AdvancedAnalytics, days: float = 7, batch_size: int = 1000,
+                 snapshot_path: Optional[str] = None):
+        self.engine = engine
+        self.days = days
+        self.batch_size = batch_size
+        self.snapshot_path = snapshot_path
+        self.task: Optional[asyncio.Task] = None
+        self.status = {
+            'state': 'idle',  # idle, restoring, loading, done, failed
+            'restored_from_snapshot': False,
+            'loaded': 0,
+            'total': 0,
+            'started_at': None,
+            'finished_at': None,
+            'error': None
+        }
+
+    def start(self, db) -> asyncio.Task:
+        """Run the warm start as a background task"""
+        self.task = asyncio.create_task(self.run(db))
+        return self.task
+
+    async def run(self, db):
+        self.status.update(state='restoring', started_at=datetime.utcnow(),
+                           finished_at=None, error=None, loaded=0, total=0)
+        self.engine.begin_bulk_load()
+        try:
+            since = datetime.utcnow() - timedelta(days=self.days)
+            newest = restore_snapshot(self.engine, self.snapshot_path) if self.snapshot_path else None
+            if newest is not None:
+                self.status['restored_from_snapshot'] = True
+                print(f"✅ Analytics snapshot restored (data up to {newest.isoformat()})")
+            baselines = await load_baselines(db, self.engine)
+            if baselines:
+                print(f"✅ Loaded {baselines} diurnal baselines")
+
+            self.status['state'] = 'loading'
+            # Resume from the snapshot's newest reading; readings sharing that
+            # timestamp are only skipped for nodes whose partitions hold them
+            await self._load(db, newest if newest is not None and newest > since else since,
+                             seen_through=self.engine.newest_by_node() if newest is not None else None)
+            self.status['state'] = 'done'
+        except asyncio.CancelledError:
+            self.status['state'] = 'failed'
+            self.status['error'] = 'cancelled'
+            raise
+        except Exception as e:
+            self.status['state'] = 'failed'
+            self.status['error'] = str(e)
+            print(f"❌ Analytics warm start failed: {e}")
+        finally:
+            replayed = self.engine.end_bulk_load()
+            self.status['finished_at'] = datetime.utcnow()
+            print(f"📊 Analytics warm start {self.status['state']}: "
+                  f"{self.status['loaded']} readings loaded, {replayed} live readings applied")
+
+    async def _load(self, db, since: datetime, seen_through: Optional[Dict[str, float]] = None):
+        """
+        Stream readings from `since` into the engine, oldest first
+        seen_through (node_id -> epoch seconds) skips readings a node already has
+        """
+        query = {'timestamp': {'$gte': since}}
+        seen_through = seen_through or {}
+        self.status['total'] = await db.sensor_data.count_documents(query)
+        print(f"📊 Warm-starting analytics from {self.status['total']} readings since {since.isoformat()}")
+
+        projection = {field: 1 for field in ANALYTICS_FIELDS}
+        projection.update({'_id': 0, 'timestamp': 1, 'node_id': 1})
+        cursor = db.sensor_data.find(query, projection).sort('timestamp', 1) \
+            .batch_size(self.batch_size)
+
+        report_every = max(self.batch_size, self.status['total'] // 10)
+        next_report = report_every
+        async for doc in cursor:
+            timestamp = doc.pop('timestamp', None)
+            if timestamp is None:
+                continue
+            node_id = doc.pop('node_id', None) or DEFAULT_NODE_ID
+            if node_id in seen_through and to_epoch(timestamp) <= seen_through[node_id]:
+                continue
+            self.engine.add_history_point(timestamp, doc, node_id)
+            self.status['loaded'] += 1
+
+            if self.status['loaded'] % self.batch_size == 0:
+                await asyncio.sleep(0)  # Let requests in between batches
+                if self.status['loaded'] >= next_report:
+                    next_report += report_every
+                    print(f"   ... {self.get_progress()['percent']}% "
+                          f"({self.status['loaded']}/{self.status['total']})")
+
+    def get_progress(self) -> Dict:
+        total = self.status['total']
+        percent = 100.0 if self.status['state'] == 'done' else \
+            round(100 * self.status['loaded'] / total, 1) if total else 0.0
+        return {**self.status, 'percent': percent}
+
+    def save(self) -> Optional[int]:
+        """Snapshot the engine if a snapshot path is configured; returns the file size"""
+        if not self.snapshot_path:
+            return None
+        if self.engine.bulk_loading:
+            print("⚠️ Skipping analytics snapshot during warm start")
+            return None
+        size = save_snapshot(self.engine, self.snapshot_path)
+        print(f"✅ Analytics snapshot saved ({size / 1e6:.1f} MB)")
+        return size
+
+
+# Global warm start instance
+analytics_warm_start = AnalyticsWarmStart(
+    analytics_engine,
+    days=settings.analytics_warm_start_days,
+    batch_size=settings.analytics_warm_start_batch_size,
+    snapshot_path=settings.analytics_snapshot_path
+)
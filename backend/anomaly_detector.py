@@ -0,0 +1,162 @@
+"""
+Streaming Anomaly Detection
+Per-node, per-metric detectors updated in O(1) with every reading:
+EWMA z-score, robust median/MAD score and a seasonal (hour-of-week) residual
+"""
+import math
+import numpy as np
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
+from diurnal_baseline import DiurnalBaseline
+
+
+ANOMALY_METRICS = ['temperature', 'humidity', 'smoke_level', 'fire_risk_score']
+
+
+class AnomalyEvent(BaseModel):
+    node_id: str
+    metric: str
+    value: float
+    expected: float
+    score: float  # Largest score among the detectors that fired
+    detectors: List[str]  # ewma, robust, seasonal
+    direction: str  # high, low
+    timestamp: datetime
+
+
+class EWMADetector:
+    """
+    Exponentially weighted mean and variance; scores are z-scores of a
+    reading against the estimate before it is absorbed
+    """
+
+    def __init__(self, alpha: float = 0.05, threshold: float = 4.0, warmup: int = 30):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def update(self, t: float, x: float) -> Optional[Tuple[float, float]]:
+        """Absorb a reading; returns (score, expected) once warmed up"""
+        result = None
+        if self.n >= self.warmup:
+            result = ((x - self.mean) / math.sqrt(self.var + 1e-9), self.mean)
+
+        self.n += 1
+        if self.n == 1:
+            self.mean = x
+            return result
+        # Plain running moments until alpha takes over
+        alpha = max(self.alpha, 1.0 / self.n)
+        diff = x - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.var = (1 - alpha) * (self.var + diff * increment)
+        return result
+
+
+class RobustDetector:
+    """
+    Streaming median and MAD, insensitive to the outliers it flags
+
+    Both are seeded exactly from the first `warmup` readings and then
+    tracked by stochastic approximation: each reading nudges the median
+    (and the MAD) one step towards itself, the step scaled by the MAD.
+    Scores are modified z-scores, 0.6745 * (x - median) / MAD.
+    """
+
+    def __init__(self, rate: float = 0.05, threshold: float = 5.0, warmup: int = 30):
+        self.rate = rate
+        self.threshold = threshold
+        self.warmup = warmup
+        self.n = 0
+        self.median = 0.0
+        self.mad = 0.0
+        self._seed: List[float] = []
+
+    def update(self, t: float, x: float) -> Optional[Tuple[float, float]]:
+        self.n += 1
+        if self._seed is not None:
+            self._seed.append(x)
+            if len(self._seed) >= self.warmup:
+                seed = np.asarray(self._seed)
+                self.median = float(np.median(seed))
+                self.mad = float(np.median(np.abs(seed - self.median)))
+                self._seed = None
+            return None
+
+        # Floor the scale so flat signals don't divide by zero
+        scale = max(self.mad, 1e-3 * (abs(self.median) + 1))
+        result = (0.6745 * (x - self.median) / scale, self.median)
+
+        step = self.rate * scale
+        deviation = abs(x - self.median)
+        if x > self.median:
+            self.median += step
+        elif x < self.median:
+            self.median -= step
+        self.mad = max(0.0, self.mad + (step if deviation > self.mad else -step))
+        return result
+
+
+class SeasonalDetector:
+    """
+    z-score of a reading's residual from its node's hour-of-week baseline
+    The baseline is owned (and updated) by the node's analytics partition
+    """
+
+    def __init__(self, baseline: DiurnalBaseline, threshold: float = 4.0):
+        self.baseline = baseline
+        self.threshold = threshold
+
+    def update(self, t: float, x: float) -> Optional[Tuple[float, float]]:
+        return self.baseline.zscore(t, x)
+
+
+class MetricAnomalyDetector:
+    """
+    The three detectors for one metric of one node
+
+    A detector raises once when its score crosses its threshold and
+    re-arms when the score falls back below 3/4 of it, so a sustained
+    excursion produces one event rather than one per reading.
+    """
+
+    def __init__(self, baseline: DiurnalBaseline):
+        self.detectors = {
+            'ewma': EWMADetector(),
+            'robust': RobustDetector(),
+            'seasonal': SeasonalDetector(baseline)
+        }
+        self.active = {name: False for name in self.detectors}
+
+    @property
+    def is_anomalous(self) -> bool:
+        return any(self.active.values())
+
+    def update(self, t: float, x: float) -> Optional[Tuple[float, float, List[str]]]:
+        """
+        Absorb a reading; returns (score, expected, detectors) if any
+        detector newly fired
+        """
+        fired, best = [], None
+        for name, detector in self.detectors.items():
+            result = detector.update(t, x)
+            if result is None:
+                continue
+            score, expected = result
+            if abs(score) >= detector.threshold:
+                if not self.active[name]:
+                    self.active[name] = True
+                    fired.append(name)
+                    if best is None or abs(score) > abs(best[0]):
+                        best = (score, expected)
+            elif abs(score) < 0.75 * detector.threshold:
+                self.active[name] = False
+
+        if not fired:
+            return None
+        return float(best[0]), float(best[1]), fired
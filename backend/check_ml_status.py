@@ -4,6 +4,8 @@ Check ML Model Status and Train if Needed
 import asyncio
 from database import connect_to_mongo, close_mongo_connection, get_database
 from ml_predictor import predictor
+from training_data import load_training_data
+from training_sampler import train_predictor_from_database
 
 async def check_and_train():
     """Check ML model status and train if possible"""
@@ -22,6 +24,12 @@ async def check_and_train():
         print(f"   Model Path: {predictor.model_path}")
         print(f"   Model Exists: {predictor.model_path.exists()}")
         
+        model_info = predictor.get_model_info()
+        if model_info['trained_at']:
+            print(f"   Model Version: {model_info['model_version']}")
+            print(f"   Trained At: {model_info['trained_at']}")
+            print(f"   Training Samples: {model_info['training_stats'].get('num_samples', 'unknown')}")
+        
         # Check available data
         sensor_count = await db.sensor_data.count_documents({})
         print(f"\n📈 Available Data:")
@@ -35,21 +43,10 @@ async def check_and_train():
             
             # Test prediction
             print(f"\n🧪 Testing prediction...")
-            sensor_data = await db.sensor_data.find().sort("timestamp", -1).limit(100).to_list(100)
+            recent_data = await load_training_data(db, limit=100)
             
-            if sensor_data:
-                history = [
-                    {
-                        'temperature': s.get('temperature', 25),
-                        'humidity': s.get('humidity', 50),
-                        'smoke_level': s.get('smoke_level', 0),
-                        'rain_level': s.get('rain_level', 0),
-                        'timestamp': s.get('timestamp')
-                    }
-                    for s in sensor_data
-                ]
-                
-                test_pred = predictor.predict(history, hours_ahead=1)
+            if len(recent_data):
+                test_pred = predictor.predict(recent_data.tail_records(100), hours_ahead=1)
                 
                 if 'predictions' in test_pred and test_pred['predictions']:
                     pred = test_pred['predictions'][0]
@@ -68,23 +65,7 @@ async def check_and_train():
             if response.lower() == 'y':
                 print(f"\n🔧 Training model with {sensor_count} samples...")
                 
-                sensor_data = await db.sensor_data.find().sort("timestamp", -1).limit(10000).to_list(10000)
-                
-                sensor_history = [
-                    {
-                        'temperature': s.get('temperature', 25),
-                        'humidity': s.get('humidity', 50),
-                        'smoke_level': s.get('smoke_level', 0),
-                        'rain_level': s.get('rain_level', 0),
-                        'timestamp': s.get('timestamp')
-                    }
-                    for s in sensor_data
-                ]
-                
-                risk_scores = [s.get('fire_risk_score', 30) for s in sensor_data]
-                risk_levels = [s.get('risk_level', 'low') for s in sensor_data]
-                
-                success = predictor.train(sensor_history, risk_scores, risk_levels)
+                success, _ = await train_predictor_from_database(db)
                 
                 if success:
                     print(f"\n✅ Training completed successfully!")
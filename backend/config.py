@@ -23,6 +23,29 @@ class Settings(BaseSettings):
     # AI Analysis Settings
     ai_analysis_interval: int = 30  # Run AI every N seconds (30-60 recommended)
     
+    # ML Model
+    ml_model_mmap_mode: Optional[str] = "r"  # Memory-map compiled tree arrays (None to load into RAM)
+    ml_use_compiled_engine: bool = True  # Flat-array tree inference instead of sklearn predict
+    training_use_reservoir: bool = True  # Train on the stratified sample instead of latest readings
+    training_reservoir_size_per_level: int = 2500  # Reservoir slots per risk level
+    ml_online_learning: bool = True  # Update the online model with every labelled reading
+    ml_prediction_mode: str = "batch"  # batch, online or blend (opt in to mix in the online model)
+    ml_online_blend_weight: float = 0.3  # Online model share of blended risk scores
+    ml_online_forgetting: float = 0.999  # Online model memory of ~1000 readings
+    
+    # Analytics
+    analytics_buffer_size_per_node: int = 1440  # Raw readings kept per node (1 day at 1/min); rollups cover longer ranges
+    analytics_max_partitions: int = 500  # Nodes with in-memory analytics state
+    analytics_memory_budget_mb: float = 256  # Analytics state of all nodes (~0.6 MB each); lowers analytics_max_partitions to fit
+    analytics_partition_idle_hours: float = 24  # Drop a node's analytics state after this long without data
+    analytics_warm_start_days: float = 7  # History replayed into the analytics engine at startup
+    analytics_warm_start_batch_size: int = 1000  # sensor_data cursor batch size for the warm start
+    analytics_snapshot_path: Optional[str] = "models/analytics_snapshot.joblib"  # Saved on shutdown (None to disable)
+    
+    # Sensor Network
+    zone_sync_seconds: float = 30  # Pick up nodes registered by other workers this often (0 to disable)
+    node_offline_timeout_seconds: float = 300  # A node is offline after this long without a reading
+    
     # External Data Integration
     openweather_api_key: Optional[str] = None
     forest_latitude: float = 28.6139  # Default: Delhi
@@ -11,6 +11,19 @@ async def connect_to_mongo():
     client = AsyncIOMotorClient(settings.mongodb_url)
     db = client[settings.database_name]
     print(f"✅ Connected to MongoDB: {settings.database_name}")
+    await ensure_indexes()
+
+
+async def ensure_indexes():
+    """Create indexes used by per-node queries"""
+    try:
+        await db.sensor_data.create_index([("node_id", 1), ("timestamp", -1)])
+        await db.training_reservoir.create_index([("risk_level", 1), ("slot", 1)], unique=True)
+        await db.sensor_nodes.create_index([("zone_id", 1)])
+        await db.sensor_nodes.create_index([("updated_at", 1)])
+        await db.node_offline_alerts.create_index([("created_at", 1)], expireAfterSeconds=86400)
+    except Exception as e:
+        print(f"⚠️ Failed to create indexes: {e}")
 
 
 async def close_mongo_connection():
@@ -0,0 +1,99 @@
+"""
+Diurnal Baselines
+Running mean and variance of a metric for each hour of the week, so a
+reading can be compared with what is normal for that node at that hour
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+
+HOURS_PER_WEEK = 168
+EPOCH_WEEK_OFFSET = 72  # 1970-01-01 was a Thursday; bucket 0 is Monday 00:00 UTC
+
+
+def hour_of_week(t: float) -> int:
+    """Hour-of-week bucket (0 = Monday 00:00 UTC) of an epoch time"""
+    return (int(t // 3600) + EPOCH_WEEK_OFFSET) % HOURS_PER_WEEK
+
+
+class DiurnalBaseline:
+    """
+    Mean and variance per hour-of-week bucket, updated in O(1)
+
+    Each bucket is a running average until it has seen `memory` readings
+    and exponentially weighted after that (~4 weeks at 1 reading/min), so
+    the baseline follows the seasons. Lookups are constant time.
+    """
+
+    def __init__(self, memory: int = 240, min_count: int = 30):
+        self.memory = memory
+        self.min_count = min_count
+        # Plain lists: scalar access is much cheaper than on NumPy arrays
+        self.n = [0] * HOURS_PER_WEEK
+        self.mean = [0.0] * HOURS_PER_WEEK
+        self.var = [0.0] * HOURS_PER_WEEK
+        self.last_t: Optional[float] = None
+        self.skip_until: Optional[float] = None  # Readings up to here are already included
+
+    def add(self, t: float, x: float):
+        if self.skip_until is not None and t <= self.skip_until:
+            return
+        b = hour_of_week(t)
+        n = self.n[b] + 1
+        self.n[b] = n
+        alpha = max(1.0 / n, 1.0 / self.memory)
+        diff = x - self.mean[b]
+        increment = alpha * diff
+        self.mean[b] += increment
+        self.var[b] = (1 - alpha) * (self.var[b] + diff * increment)
+        self.last_t = t
+
+    def expected(self, t: float) -> Optional[Tuple[float, float]]:
+        """(mean, std) for the hour of t, or None until the bucket has enough readings"""
+        b = hour_of_week(t)
+        if self.n[b] < self.min_count:
+            return None
+        return self.mean[b], math.sqrt(self.var[b])
+
+    def zscore(self, t: float, x: float) -> Optional[Tuple[float, float]]:
+        """(z-score, expected value) of a reading against its hour"""
+        expected = self.expected(t)
+        if expected is None:
+            return None
+        mean, std = expected
+        return (x - mean) / math.sqrt(std * std + 1e-9), mean
+
+    def is_peak_hour(self, t: float, top_hours: int) -> Optional[bool]:
+        """
+        Whether t falls in the `top_hours` highest-mean hours of its day
+        None until every hour of that day has enough readings
+        """
+        b = hour_of_week(t)
+        day_start = b - b % 24
+        day = range(day_start, day_start + 24)
+        if any(self.n[h] < self.min_count for h in day):
+            return None
+        higher = sum(1 for h in day if self.mean[h] > self.mean[b])
+        return higher < top_hours
+
+    def get_state(self) -> Dict:
+        return {'n': list(self.n), 'mean': list(self.mean), 'var': list(self.var), 'through': self.last_t}
+
+    def set_state(self, state: Dict):
+        self.n = [int(v) for v in state['n']]
+        self.mean = [float(v) for v in state['mean']]
+        self.var = [float(v) for v in state['var']]
+        self.last_t = state.get('through')
+        self.skip_until = self.last_t
+
+
+def pooled_expected(baselines: List[DiurnalBaseline], times: List[float]) -> Optional[Tuple[float, float]]:
+    """
+    Mean of several nodes' expected values (each at its own time) and the
+    root-mean-square of their standard deviations; None unless all are ready
+    """
+    ready = [b.expected(t) for b, t in zip(baselines, times)]
+    if not ready or any(e is None for e in ready):
+        return None
+    return (sum(m for m, _ in ready) / len(ready),
+            math.sqrt(sum(s * s for _, s in ready) / len(ready)))
@@ -0,0 +1,63 @@
+"""
+Benchmark FWI model configurations on stored sensor history
+Rolling-origin cross-validation plus fit/inference cost per candidate
+"""
+import asyncio
+import sys
+from database import connect_to_mongo, close_mongo_connection, get_database
+from training_data import load_training_data
+from model_evaluation import run_benchmark
+
+
+async def evaluate_models(limit: int = 50000):
+    """Run the evaluation harness and print a comparison table"""
+    print("=" * 60)
+    print("FWI Model Evaluation & Timing Benchmark")
+    print("=" * 60)
+    
+    await connect_to_mongo()
+    
+    try:
+        db = get_database()
+        
+        print(f"\n📊 Loading up to {limit} readings...")
+        data = await load_training_data(db, limit=limit)
+        print(f"   Loaded {len(data)} readings")
+        
+        print("\n⏱️ Running rolling-origin cross-validation...")
+        report = run_benchmark(data)
+        
+        if 'error' in report:
+            print(f"\n⚠️ {report['error']}")
+            return report
+        
+        for result in report['results']:
+            print(f"\n🔧 {result['name']}")
+            if 'error' in result:
+                print(f"   ⚠️ {result['error']}")
+                continue
+            for horizon, metrics in result['accuracy_by_horizon'].items():
+                if metrics['mae'] is not None:
+                    print(f"   {horizon:>4}: MAE {metrics['mae']:.2f}  RMSE {metrics['rmse']:.2f}  "
+                          f"(n={metrics['num_samples']})")
+            print(f"   Fit time: {result['fit_time_s']:.2f}s")
+            print(f"   Single-row latency: {result['single_row_latency_us']['compiled']:.0f}µs compiled, "
+                  f"{result['single_row_latency_us']['sklearn']:.0f}µs sklearn")
+            print(f"   Batch throughput: {result['batch_throughput_rows_per_s']['compiled']:.0f} rows/s compiled, "
+                  f"{result['batch_throughput_rows_per_s']['sklearn']:.0f} rows/s sklearn")
+            print(f"   Model size: {result['model_size_bytes']['pickle'] / 1e6:.1f}MB pickle, "
+                  f"{result['model_size_bytes']['compiled'] / 1e6:.1f}MB compiled")
+        
+        print(f"\n🏁 Speed/accuracy frontier (1h MAE vs latency): {', '.join(report['frontier_1h'])}")
+        return report
+    
+    except Exception as e:
+        print(f"\n❌ Error during evaluation: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        await close_mongo_connection()
+        print("\n" + "=" * 60)
+
+if __name__ == "__main__":
+    asyncio.run(evaluate_models(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
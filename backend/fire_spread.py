@@ -0,0 +1,312 @@
+"""
+Raster Fire Spread
+Cellular fire-spread model over a zone raster: spread rates per cell from
+interpolated node readings, wind and slope, ignition at the riskiest
+nodes, and fire arrival times propagated across the grid
+"""
+import math
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+BASE_SPREAD_RATE = 0.5  # m/min at <= 25°C and >= 50% humidity
+WIND_C1, WIND_C2 = 0.045, 0.131  # Wind factors per m/s (Alexandridis et al. cellular model)
+SLOPE_A = 0.078  # Slope factor per degree of slope
+MIN_SPREAD_RATE = 1e-3  # m/min; keeps travel times finite
+ISOCHRONE_MINUTES = (15, 30, 60)
+HORIZON_MINUTES = 120  # Arrival times are only tracked this far ahead
+COARSE_GRID = 64  # Readings are interpolated on at most this many cells per side, then upsampled
+
+# Moves into a cell from its neighbor at (-d_row, -d_col); rows grow southwards, columns eastwards
+DIRECTIONS = {
+    'N': (-1, 0), 'S': (1, 0), 'E': (0, 1), 'W': (0, -1),
+    'NE': (-1, 1), 'NW': (-1, -1), 'SE': (1, 1), 'SW': (1, -1)
+}
+
+
+def spread_rate(temperature, humidity):
+    """Still-air spread rate (m/min): faster when hot and dry"""
+    temp_factor = np.maximum(0, (np.asarray(temperature) - 25) / 10)
+    humidity_factor = np.maximum(0, (50 - np.asarray(humidity)) / 50)
+    return BASE_SPREAD_RATE * (1 + temp_factor) * (1 + humidity_factor)
+
+
+def wind_factor(bearing_deg: float, wind_speed: float, wind_direction: Optional[float]) -> float:
+    """
+    Spread multiplier for fire moving along a compass bearing
+    wind_direction is where the wind blows from (meteorological degrees)
+    """
+    if not wind_speed or wind_direction is None:
+        return 1.0
+    downwind = math.radians(wind_direction + 180)
+    cos_angle = math.cos(math.radians(bearing_deg) - downwind)
+    return math.exp(WIND_C1 * wind_speed) * math.exp(WIND_C2 * wind_speed * (cos_angle - 1))
+
+
+def idw_grid(xs: np.ndarray, ys: np.ndarray, values: np.ndarray, grid_x: np.ndarray, grid_y: np.ndarray,
+             chunk: int = 256) -> np.ndarray:
+    """
+    Inverse squared distance weighted values at grid points from scattered
+    points; values is (points, fields), the result (grid_y, grid_x, fields)
+    """
+    shape = (len(grid_y), len(grid_x))
+    numerator = np.zeros(shape + values.shape[1:])
+    denominator = np.zeros(shape)
+    for start in range(0, len(xs), chunk):
+        # The grid is separable: squared distance = row term + column term
+        dy2 = (grid_y[:, None] - ys[start:start + chunk]) ** 2
+        dx2 = (grid_x[:, None] - xs[start:start + chunk]) ** 2
+        weights = 1.0 / np.maximum(dy2[:, None, :] + dx2[None, :, :], 1.0)
+        numerator += weights @ values[start:start + chunk]
+        denominator += weights.sum(axis=-1)
+    return numerator / denominator[..., None]
+
+
+def upsample(coarse: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    rows = np.arange(shape[0]) * coarse.shape[0] // shape[0]
+    cols = np.arange(shape[1]) * coarse.shape[1] // shape[1]
+    return coarse[rows[:, None], cols]
+
+
+def _gradient(field: np.ndarray, spacing: float, axis: int) -> np.ndarray:
+    """Derivative along an axis (central inside, one-sided at the border; flat if one cell wide)"""
+    if field.shape[axis] < 2:
+        return np.zeros_like(field)
+    return np.gradient(field, spacing, axis=axis)
+
+
+def arrival_times(rate: np.ndarray, cell_size_m: float, ignition: Sequence[Tuple[int, int]],
+                  wind_speed: float = 0.0, wind_direction: Optional[float] = None,
+                  elevation: Optional[np.ndarray] = None, horizon: float = HORIZON_MINUTES,
+                  max_sweeps: int = 4) -> np.ndarray:
+    """
+    Minutes until fire reaches each cell from the ignition cells (inf
+    beyond `horizon`)
+
+    Each cell is entered from one of its 8 neighbors; the time to cross is
+    the step length over the cell's spread rate in that direction (rate x
+    wind x slope). Elevation may be on a coarser grid than the rates; its
+    gradient is then taken at that resolution and the slope factors
+    upsampled. Arrival times are the shortest such paths, found by
+    fast sweeping: a pass down the grid relaxes every row from the row
+    above, then along the row east and west with min-plus prefix scans
+    (np.minimum.accumulate); a pass up the grid does the reverse. Passes
+    repeat until nothing improves (usually 2-3 for smooth fields). Cells
+    past the horizon stay unburned, so passes stop at the last row the
+    fire reaches and the work scales with the area burned.
+    """
+    height, width = rate.shape
+    rate = np.maximum(rate, MIN_SPREAD_RATE)
+    if elevation is not None:
+        # Rise per meter southwards (rows) and eastwards (columns) at the elevation grid's own spacing
+        rise_row = _gradient(elevation, cell_size_m * height / elevation.shape[0], axis=0)
+        rise_col = _gradient(elevation, cell_size_m * width / elevation.shape[1], axis=1)
+    cost = {}
+    for name, (d_row, d_col) in DIRECTIONS.items():
+        length = math.hypot(d_row, d_col)
+        step = cell_size_m * length
+        bearing = math.degrees(math.atan2(d_col, -d_row))
+        directed = rate * wind_factor(bearing, wind_speed, wind_direction)
+        if elevation is not None:
+            # Slope along the direction the fire moves (uphill speeds it up)
+            slope = np.degrees(np.arctan((rise_row * d_row + rise_col * d_col) / length))
+            directed = directed * upsample(np.exp(SLOPE_A * slope), rate.shape)
+        cost[name] = step / np.maximum(directed, MIN_SPREAD_RATE)
+
+    # Prefix sums for the row scans: east_sum[j] = cost of entering columns 1..j from the west,
+    # west_sum[j] = cost of entering columns j..width-2 from the east
+    east = cost['E'].copy()
+    east[:, 0] = 0
+    east_sum = np.cumsum(east, axis=1)
+    west = cost['W'].copy()
+    west[:, -1] = 0
+    west_sum = np.cumsum(west[:, ::-1], axis=1)[:, ::-1]
+
+    def scan_row(row: np.ndarray, i: int) -> np.ndarray:
+        row = east_sum[i] + np.minimum.accumulate(row - east_sum[i])
+        row = west_sum[i] + np.minimum.accumulate((row - west_sum[i])[::-1])[::-1]
+        row[row > horizon] = np.inf
+        return row
+
+    def relax_from(row: np.ndarray, previous: np.ndarray, i: int, straight: str, right: str, left: str):
+        # right: from the neighbor to the west (column j - 1); left: from the east (j + 1)
+        candidate = previous + cost[straight][i]
+        np.minimum(candidate[1:], previous[:-1] + cost[right][i, 1:], out=candidate[1:])
+        np.minimum(candidate[:-1], previous[1:] + cost[left][i, :-1], out=candidate[:-1])
+        return np.minimum(row, candidate)
+
+    arrival = np.full((height, width), np.inf)
+    for row, col in ignition:
+        arrival[row, col] = 0.0
+
+    for _ in range(max_sweeps):
+        before = arrival.copy()
+        burning = np.flatnonzero(np.isfinite(arrival).any(axis=1))
+        first, last = burning[0], burning[-1]
+        arrival[first] = scan_row(arrival[first], first)
+        for i in range(first + 1, height):
+            arrival[i] = scan_row(relax_from(arrival[i], arrival[i - 1], i, 'S', 'SE', 'SW'), i)
+            if i >= last and not np.isfinite(arrival[i]).any():
+                break  # Nothing below can be reached in this pass
+        burning = np.flatnonzero(np.isfinite(arrival).any(axis=1))
+        first, last = burning[0], burning[-1]
+        for i in range(last - 1, -1, -1):
+            arrival[i] = scan_row(relax_from(arrival[i], arrival[i + 1], i, 'N', 'NE', 'NW'), i)
+            if i <= first and not np.isfinite(arrival[i]).any():
+                break
+        if np.array_equal(arrival, before):
+            break
+    return arrival
+
+
+# Marching squares: corner case (TL=8, TR=4, BR=2, BL=1 inside) -> edges joined
+_CASE_EDGES = {
+    1: [('L', 'B')], 2: [('B', 'R')], 3: [('L', 'R')], 4: [('T', 'R')],
+    5: [('L', 'T'), ('B', 'R')], 6: [('T', 'B')], 7: [('L', 'T')], 8: [('L', 'T')],
+    9: [('T', 'B')], 10: [('T', 'R'), ('L', 'B')], 11: [('T', 'R')], 12: [('L', 'R')],
+    13: [('B', 'R')], 14: [('L', 'B')]
+}
+
+
+def contours(field: np.ndarray, level: float) -> List[np.ndarray]:
+    """
+    Closed outlines of {field <= level} as arrays of (row, col) points,
+    interpolated along cell edges (marching squares)
+    """
+    height, width = field.shape
+    # Border of outside cells so every outline closes; unreached cells get a
+    # finite value past the level so edges can be interpolated
+    padded = np.full((height + 2, width + 2), level + 1.0)
+    padded[1:-1, 1:-1] = np.where(np.isfinite(field), field, level + 1.0)
+    inside = padded <= level
+    case = (inside[:-1, :-1] * 8 + inside[:-1, 1:] * 4 + inside[1:, 1:] * 2 + inside[1:, :-1]).astype(np.int8)
+
+    def edge_point(i: int, j: int, edge: str) -> Tuple[Tuple, Tuple[float, float]]:
+        # Key shared by the two squares on either side of the edge, and its crossing point
+        if edge == 'T':
+            a, b, key, fixed, along = padded[i, j], padded[i, j + 1], ('h', i, j), i, j
+        elif edge == 'B':
+            a, b, key, fixed, along = padded[i + 1, j], padded[i + 1, j + 1], ('h', i + 1, j), i + 1, j
+        elif edge == 'L':
+            a, b, key, fixed, along = padded[i, j], padded[i + 1, j], ('v', i, j), j, i
+        else:
+            a, b, key, fixed, along = padded[i, j + 1], padded[i + 1, j + 1], ('v', i, j + 1), j + 1, i
+        t = 0.5 if b == a else min(1.0, max(0.0, (level - a) / (b - a)))
+        point = (fixed, along + t) if key[0] == 'h' else (along + t, fixed)
+        return key, (point[0] - 1, point[1] - 1)  # Back to unpadded coordinates
+
+    links: Dict[Tuple, List[Tuple]] = {}
+    points: Dict[Tuple, Tuple[float, float]] = {}
+    for i, j in zip(*np.nonzero((case > 0) & (case < 15))):
+        for first, second in _CASE_EDGES[int(case[i, j])]:
+            key_a, point_a = edge_point(i, j, first)
+            key_b, point_b = edge_point(i, j, second)
+            points[key_a], points[key_b] = point_a, point_b
+            links.setdefault(key_a, []).append(key_b)
+            links.setdefault(key_b, []).append(key_a)
+
+    rings = []
+    while links:
+        start, neighbors = next(iter(links.items()))
+        ring, previous, current = [start], None, start
+        while True:
+            options = links.pop(current, [])
+            following = next((k for k in options if k != previous and k in links), None)
+            if following is None:
+                break
+            ring.append(following)
+            previous, current = current, following
+        if len(ring) > 2:
+            rings.append(np.array([points[k] for k in ring]))
+    return rings
+
+
+class SpreadGrid:
+    """
+    A square-celled raster in local planar meters (x east, y north), row 0
+    at the north edge
+    """
+
+    def __init__(self, x_min: float, x_max: float, y_min: float, y_max: float,
+                 cell_size_m: float, max_cells_per_side: int = 1000):
+        span = max(x_max - x_min, y_max - y_min)
+        self.cell_size = max(cell_size_m, span / max_cells_per_side)
+        self.width = max(1, int(math.ceil((x_max - x_min) / self.cell_size)))
+        self.height = max(1, int(math.ceil((y_max - y_min) / self.cell_size)))
+        self.x_min = x_min
+        self.y_max = y_max
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def cell_of(self, x, y) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.clip(((self.y_max - np.asarray(y)) / self.cell_size).astype(int), 0, self.height - 1)
+        cols = np.clip(((np.asarray(x) - self.x_min) / self.cell_size).astype(int), 0, self.width - 1)
+        return rows, cols
+
+    def to_xy(self, rows, cols) -> Tuple[np.ndarray, np.ndarray]:
+        """Planar coordinates of (fractional) cell centers"""
+        x = self.x_min + (np.asarray(cols) + 0.5) * self.cell_size
+        y = self.y_max - (np.asarray(rows) + 0.5) * self.cell_size
+        return x, y
+
+    def fields(self, xs: np.ndarray, ys: np.ndarray, *values: np.ndarray, coarse: bool = False) -> List[np.ndarray]:
+        """Interpolate point values over the grid (IDW on a coarse grid, then upsampled unless coarse)"""
+        coarse_h, coarse_w = min(self.height, COARSE_GRID), min(self.width, COARSE_GRID)
+        step_y = self.height * self.cell_size / coarse_h
+        step_x = self.width * self.cell_size / coarse_w
+        grid_x = self.x_min + (np.arange(coarse_w) + 0.5) * step_x
+        grid_y = self.y_max - (np.arange(coarse_h) + 0.5) * step_y
+        interpolated = idw_grid(xs, ys, np.column_stack(values), grid_x, grid_y)
+        if coarse:
+            return [interpolated[..., k] for k in range(len(values))]
+        return [upsample(interpolated[..., k], self.shape) for k in range(len(values))]
+
+
+def simulate_spread(xs: np.ndarray, ys: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                    ignition: Sequence[int], bounds: Tuple[float, float, float, float],
+                    cell_size_m: float = 10, wind_speed: float = 0.0,
+                    wind_direction: Optional[float] = None,
+                    elevation: Optional[np.ndarray] = None, horizon: float = HORIZON_MINUTES,
+                    max_cells_per_side: int = 1000) -> Tuple[SpreadGrid, np.ndarray]:
+    """
+    Rasterize an area and compute fire arrival times (minutes) over it
+
+    xs/ys are node positions in planar meters with their current readings;
+    ignition indexes the nodes where fire starts; elevation (meters, NaN
+    where unknown) adds slope when at least three nodes have it.
+    """
+    grid = SpreadGrid(*bounds, cell_size_m=cell_size_m, max_cells_per_side=max_cells_per_side)
+    rate = spread_rate(*grid.fields(xs, ys, temperature, humidity))
+
+    elevation_grid = None
+    if elevation is not None:
+        known = ~np.isnan(elevation)
+        if known.sum() >= 3:
+            elevation_grid, = grid.fields(xs[known], ys[known], elevation[known], coarse=True)
+
+    rows, cols = grid.cell_of(xs[list(ignition)], ys[list(ignition)])
+    arrival = arrival_times(rate, grid.cell_size, list(zip(rows.tolist(), cols.tolist())),
+                            wind_speed, wind_direction, elevation_grid, horizon)
+    return grid, arrival
+
+
+def isochrones(grid: SpreadGrid, arrival: np.ndarray,
+               minutes: Sequence[float] = ISOCHRONE_MINUTES, max_points: int = 200) -> List[Dict]:
+    """Burned area and outline rings (planar x, y) for each time horizon"""
+    cell_area = grid.cell_size ** 2
+    result = []
+    for limit in minutes:
+        rings = []
+        for ring in contours(arrival, limit):
+            if len(ring) > max_points:
+                ring = ring[::int(math.ceil(len(ring) / max_points))]
+            x, y = grid.to_xy(ring[:, 0], ring[:, 1])
+            rings.append((x, y))
+        result.append({
+            'minutes': limit,
+            'area_hectares': float((arrival <= limit).sum() * cell_area / 10000),
+            'rings': rings
+        })
+    return result
@@ -0,0 +1,78 @@
+"""
+Geographic Distance Utilities
+Vectorized haversine, local planar projection and cached per-zone
+pairwise distances between sensor nodes
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = 111320  # Along a meridian
+MATRIX_MAX_NODES = 2000  # Zones above this get distance rows on demand (a full matrix would be > 32 MB)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters; accepts scalars or broadcastable NumPy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def project_local(latitude, longitude, origin_lat: float, origin_lon: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equirectangular projection to meters east (x) and north (y) of an origin
+    Within a few kilometers distances match haversine to well under 0.1%
+    """
+    x = np.radians(np.asarray(longitude) - origin_lon) * EARTH_RADIUS_M * np.cos(np.radians(origin_lat))
+    y = np.radians(np.asarray(latitude) - origin_lat) * EARTH_RADIUS_M
+    return x, y
+
+
+def unproject_local(x, y, origin_lat: float, origin_lon: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of project_local: (latitude, longitude) of planar points"""
+    latitude = origin_lat + np.degrees(np.asarray(y) / EARTH_RADIUS_M)
+    longitude = origin_lon + np.degrees(np.asarray(x) / (EARTH_RADIUS_M * np.cos(np.radians(origin_lat))))
+    return latitude, longitude
+
+
+class ZoneGeometry:
+    """
+    A zone's node positions projected onto a local plane around the zone
+    center, with the pairwise distance matrix computed once on first use
+
+    Node positions are static, so the geometry stays valid until a node
+    joins, leaves or moves (the manager then drops it).
+    """
+
+    def __init__(self, node_ids: List[str], latitudes: List[float], longitudes: List[float],
+                 origin_lat: float, origin_lon: float, slots: Optional[np.ndarray] = None):
+        self.node_ids = list(node_ids)
+        self.slots = slots  # Positions of the nodes in the caller's node store, if any
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.origin = (origin_lat, origin_lon)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        x, y = project_local(self.latitudes, self.longitudes, origin_lat, origin_lon)
+        self.xy = np.column_stack([x, y]) if len(self.node_ids) else np.empty((0, 2))
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def distances(self) -> Optional[np.ndarray]:
+        """Pairwise distances in meters (n x n), or None for zones too large to hold one"""
+        if self._matrix is None and len(self) <= MATRIX_MAX_NODES:
+            x, y = self.xy[:, 0], self.xy[:, 1]
+            self._matrix = np.hypot(x[:, None] - x, y[:, None] - y)
+        return self._matrix
+
+    def row(self, node_id: str) -> np.ndarray:
+        """Distances in meters from one node to every node of the zone"""
+        i = self.index[node_id]
+        matrix = self.distances
+        if matrix is not None:
+            return matrix[i]
+        return np.hypot(*(self.xy - self.xy[i]).T)
@@ -0,0 +1,145 @@
+"""
+Node Heartbeat Tracker
+Deadline min-heap of online sensor nodes that fires offline events as
+deadlines pass, instead of scanning every node's last heartbeat
+"""
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class HeartbeatTracker:
+    """
+    Online nodes and the time each must be heard from again
+
+    A heartbeat only moves the node's deadline in a dict (O(1)); the heap
+    holds one live entry per node, pushed when the node comes online. When
+    an entry comes due and the node's deadline has since moved, it is
+    pushed back at the new deadline; otherwise the node is dropped and its
+    offline listeners called. The set of tracked nodes is the set of online nodes, so the
+    online count is just its size.
+
+    A process only sees the heartbeats routed to it. With several worker
+    processes, set `last_seen` to look up the latest heartbeats any of
+    them recorded; overdue nodes are checked against it before they are
+    expired.
+    """
+
+    def __init__(self, timeout_seconds: float = 300):
+        self.timeout_seconds = timeout_seconds
+        self.deadlines: Dict[str, float] = {}  # Online node -> deadline (epoch seconds)
+        self._heap: List[Tuple[float, str, int]] = []  # (deadline, node_id, generation)
+        self._generation: Dict[str, int] = {}  # Entries of older generations are stale
+        self.offline_listeners: List[Callable[[str, float], None]] = []
+        # node_ids -> {node_id: last heartbeat epoch} recorded by any process
+        self.last_seen: Optional[Callable[[List[str]], Awaitable[Dict[str, float]]]] = None
+        self.went_offline = 0  # Offline events fired since start
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def online_count(self) -> int:
+        return len(self.deadlines)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.deadlines
+
+    def subscribe(self, listener: Callable[[str, float], None]):
+        """Call listener(node_id, last_heartbeat_epoch) whenever a node goes offline"""
+        self.offline_listeners.append(listener)
+
+    def beat(self, node_id: str, t: Optional[float] = None):
+        """Record that a node was heard from at epoch time t (now by default)"""
+        deadline = (time.time() if t is None else t) + self.timeout_seconds
+        previous = self.deadlines.get(node_id)
+        if previous is not None:
+            if deadline > previous:
+                self.deadlines[node_id] = deadline
+            return
+
+        self.deadlines[node_id] = deadline
+        generation = self._generation[node_id] = self._generation.get(node_id, 0) + 1
+        heapq.heappush(self._heap, (deadline, node_id, generation))
+        if self._wakeup is not None and self._heap[0][1] == node_id:
+            self._wakeup.set()  # Now the earliest deadline; let the loop re-arm
+
+    def remove(self, node_id: str):
+        """Stop tracking a node without an offline event (its heap entry goes stale)"""
+        self.deadlines.pop(node_id, None)
+
+    def overdue(self, now: Optional[float] = None) -> List[str]:
+        """Nodes whose deadline has passed by now, without expiring them"""
+        now = time.time() if now is None else now
+        heap, due, keep = self._heap, [], []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            _, node_id, generation = entry
+            deadline = self.deadlines.get(node_id)
+            if deadline is None or generation != self._generation[node_id]:
+                continue
+            if deadline > now:
+                keep.append((deadline, node_id, generation))
+            else:
+                due.append(node_id)
+                keep.append(entry)
+        for entry in keep:
+            heapq.heappush(heap, entry)
+        return due
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Fire offline events for every deadline passed by now; returns those nodes"""
+        now = time.time() if now is None else now
+        heap, expired = self._heap, []
+        while heap and heap[0][0] <= now:
+            _, node_id, generation = heapq.heappop(heap)
+            deadline = self.deadlines.get(node_id)
+            if deadline is None or generation != self._generation[node_id]:
+                continue
+            if deadline > now:
+                heapq.heappush(heap, (deadline, node_id, generation))
+            else:
+                del self.deadlines[node_id]
+                expired.append((node_id, deadline - self.timeout_seconds))
+
+        for node_id, last_heartbeat in expired:
+            self.went_offline += 1
+            for listener in self.offline_listeners:
+                try:
+                    listener(node_id, last_heartbeat)
+                except Exception as e:
+                    print(f"⚠️ Offline listener failed for {node_id}: {e}")
+        return [node_id for node_id, _ in expired]
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def start(self) -> asyncio.Task:
+        """Expire deadlines in the background as they come due"""
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self):
+        while True:
+            deadline = self.next_deadline()
+            delay = self.timeout_seconds if deadline is None else max(0.0, deadline - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+            if self.last_seen is not None:
+                due = self.overdue()
+                if due:
+                    try:
+                        seen = await self.last_seen(due)
+                    except Exception as e:
+                        # Expiring blind would mark nodes other processes still hear from offline
+                        print(f"⚠️ Heartbeat lookup failed, retrying: {e}")
+                        await asyncio.sleep(min(self.timeout_seconds, 30))
+                        continue
+                    for node_id, t in seen.items():
+                        self.beat(node_id, t)
+            self.expire()
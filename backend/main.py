@@ -17,7 +17,12 @@ from routes_sms import router as sms_router
 from routes_alert_monitor import router as alert_monitor_router
 from config import settings
 from ml_predictor import predictor
+from training_sampler import train_predictor_from_database
 from alert_monitor import alert_monitor
+from analytics_loader import analytics_warm_start, save_baselines
+from analytics_engine import analytics_engine
+from zone_store import zone_store
+from multi_zone_manager import zone_manager
 import asyncio
 
 
@@ -60,10 +65,23 @@ async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
     
+    # Load zones and registered sensor nodes, then keep them in sync across workers
+    try:
+        zones, nodes = await zone_store.load(get_database())
+        print(f"✅ Loaded {zones} zones and {nodes} sensor nodes")
+    except Exception as e:
+        print(f"❌ Failed to load zones and nodes: {e}")
+    zone_store.start(get_database())
+    zone_manager.heartbeats.start()
+    
     # Start the database alert monitor in background
     monitor_task = asyncio.create_task(alert_monitor.start())
     print("✅ Database Alert Monitor started in background")
     
+    # Refill analytics buffers in background (snapshot, then recent sensor_data)
+    analytics_warm_start.start(get_database())
+    print("✅ Analytics warm start started in background")
+    
     # Auto-train ML model if data exists
     try:
         print("\n" + "="*60)
@@ -78,29 +96,12 @@ async def lifespan(app: FastAPI):
             if sensor_count >= 100:
                 print(f"📊 Found {sensor_count} sensor readings. Training model...")
                 
-                # Get training data
-                sensor_data = await db.sensor_data.find().sort("timestamp", -1).limit(10000).to_list(10000)
-                
-                sensor_history = [
-                    {
-                        'temperature': s.get('temperature', 25),
-                        'humidity': s.get('humidity', 50),
-                        'smoke_level': s.get('smoke_level', 0),
-                        'rain_level': s.get('rain_level', 0),
-                        'timestamp': s.get('timestamp')
-                    }
-                    for s in sensor_data
-                ]
-                
-                risk_scores = [s.get('fire_risk_score', 30) for s in sensor_data]
-                risk_levels = [s.get('risk_level', 'low') for s in sensor_data]
-                
                 # Train the model
-                success = predictor.train(sensor_history, risk_scores, risk_levels)
+                success, sample_count = await train_predictor_from_database(db)
                 
                 if success:
                     print("✅ ML model trained successfully on startup!")
-                    print(f"   Training samples: {len(sensor_history)}")
+                    print(f"   Training samples: {sample_count}")
                 else:
                     print("❌ ML model training failed")
             else:
@@ -121,6 +122,17 @@ async def lifespan(app: FastAPI):
     print("\n🛑 Shutting down services...")
     await alert_monitor.stop()
     monitor_task.cancel()
+    if zone_store.task:
+        zone_store.task.cancel()
+    zone_manager.heartbeats.task.cancel()
+    if analytics_warm_start.task and not analytics_warm_start.task.done():
+        analytics_warm_start.task.cancel()
+    else:
+        try:
+            analytics_warm_start.save()
+            await save_baselines(get_database(), analytics_engine)
+        except Exception as e:
+            print(f"⚠️ Could not save analytics state: {e}")
     await close_mongo_connection()
     print("👋 All services stopped")
 
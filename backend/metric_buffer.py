@@ -0,0 +1,109 @@
+"""
+Columnar Metric Buffer
+Fixed-capacity ring buffer of timestamped rows held in NumPy columns, one
+value column per metric, kept in timestamp order so time windows are
+found by binary search
+"""
+import numpy as np
+from typing import Dict
+from datetime import datetime, timedelta
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(timestamp: datetime) -> float:
+    """Naive UTC datetime -> seconds since the epoch"""
+    return (timestamp - EPOCH).total_seconds()
+
+
+def from_epoch(seconds: float) -> datetime:
+    """Seconds since the epoch -> naive UTC datetime"""
+    return EPOCH + timedelta(seconds=float(seconds))
+
+
+class MetricRingBuffer:
+    """
+    Ring buffer of float64 rows: one timestamp column (epoch seconds)
+    shared by a value column per metric
+
+    Every row is written twice, at i and i + capacity, so the newest
+    `size` rows are always one contiguous, chronological slice of the
+    backing arrays. Appends are O(1) and windows are zero-copy views.
+    A metric missing from a row is NaN there.
+    """
+
+    late_dropped = 0  # Rows rejected for being older than the newest (class default for old snapshots)
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._next = 0  # Write position in [0, capacity)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add_column(self, metric: str):
+        """Start storing a metric; rows written before it are NaN"""
+        if metric not in self._columns:
+            self._columns[metric] = np.full(2 * self.capacity, np.nan)
+
+    def append(self, timestamp: float, values: Dict[str, float]) -> bool:
+        """
+        Add a row, overwriting the oldest once full
+        Columns without a value in `values` get NaN. Rows older than the
+        newest are dropped (and counted) so the buffer stays sorted for
+        binary search; returns False for those
+        """
+        if self.size and timestamp < self.last_timestamp:
+            self.late_dropped += 1
+            return False
+        i = self._next
+        self._timestamps[i] = self._timestamps[i + self.capacity] = timestamp
+        for metric, column in self._columns.items():
+            column[i] = column[i + self.capacity] = values.get(metric, np.nan)
+        self._next = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        return True
+
+    def _slice(self, n: int) -> slice:
+        end = self._next + self.capacity
+        return slice(end - n, end)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """All buffered timestamps, oldest first (view)"""
+        return self._timestamps[self._slice(self.size)]
+
+    def values(self, metric: str) -> np.ndarray:
+        """All buffered values of a metric, oldest first (view)"""
+        return self._columns[metric][self._slice(self.size)]
+
+    def tail(self, metric: str, n: int):
+        """(timestamps, values) views of the newest n rows"""
+        window = self._slice(min(n, self.size))
+        return self._timestamps[window], self._columns[metric][window]
+
+    def window(self, metric: str, start: float, end: float):
+        """(timestamps, values) views of rows with start <= timestamp <= end, O(log n)"""
+        timestamps = self.timestamps
+        lo = np.searchsorted(timestamps, start, side='left')
+        hi = np.searchsorted(timestamps, end, side='right')
+        base = self._next + self.capacity - self.size
+        return self._timestamps[base + lo:base + hi], self._columns[metric][base + lo:base + hi]
+
+    def point(self, metric: str, k: int):
+        """(timestamp, value) of the k-th buffered row, oldest first"""
+        i = self._next + self.capacity - self.size + k
+        return self._timestamps[i], self._columns[metric][i]
+
+    @property
+    def last_timestamp(self) -> float:
+        return self._timestamps[self._next + self.capacity - 1]
+
+    @property
+    def nbytes(self) -> int:
+        return self._timestamps.nbytes + sum(column.nbytes for column in self._columns.values())
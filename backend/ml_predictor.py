@@ -9,7 +9,74 @@ import joblib
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import json
+import os
+import shutil
 from pathlib import Path
+from config import settings
+from training_data import TrainingData, RISK_LEVEL_CODES
+from online_learner import OnlineRiskLearner
+from tree_engine import (
+    CompiledTreeEnsemble, compile_forest_regressor,
+    compile_gradient_boosting_classifier, max_deviation
+)
+
+
+MODEL_VERSION = "1.0"
+COMPILED_MAX_BATCH_ROWS = 512
+ROLLING_WINDOW = 60  # Readings in the 1h rolling features (1 reading per minute)
+PREDICTION_MODES = ('batch', 'online', 'blend')
+
+DEFAULT_MODEL_PARAMS = {
+    'regression': {
+        'n_estimators': 100,
+        'max_depth': 15,
+        'min_samples_split': 5,
+        'random_state': 42
+    },
+    'classification': {
+        'n_estimators': 100,
+        'max_depth': 5,
+        'learning_rate': 0.1,
+        'random_state': 42
+    }
+}
+
+
+def build_models(params: Optional[Dict] = None) -> Tuple[RandomForestRegressor, GradientBoostingClassifier]:
+    """
+    Unfitted regression and classification models
+    `params` overrides DEFAULT_MODEL_PARAMS per model, e.g. {'regression': {'n_estimators': 50}}
+    """
+    params = params or {}
+    return (
+        RandomForestRegressor(**{**DEFAULT_MODEL_PARAMS['regression'], **params.get('regression', {})}),
+        GradientBoostingClassifier(**{**DEFAULT_MODEL_PARAMS['classification'], **params.get('classification', {})})
+    )
+
+
+def _rolling_stats(values: np.ndarray, window: int, chunk_rows: int = 65536) -> Tuple[np.ndarray, ...]:
+    """
+    Trailing mean, std and max over up to `window` values ending at each row
+    Evaluated in chunks so temporaries stay bounded on large arrays
+    """
+    n = len(values)
+    mean, std, maximum = np.empty(n), np.empty(n), np.empty(n)
+    
+    # Rows before the first full window use a growing window
+    for i in range(min(window - 1, n)):
+        head = values[:i + 1]
+        mean[i], std[i], maximum[i] = np.mean(head), np.std(head), np.max(head)
+    
+    if n >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        for start in range(0, len(windows), chunk_rows):
+            block = windows[start:start + chunk_rows]
+            rows = slice(window - 1 + start, window - 1 + start + len(block))
+            mean[rows] = block.mean(axis=1)
+            std[rows] = block.std(axis=1)
+            maximum[rows] = block.max(axis=1)
+    
+    return mean, std, maximum
 
 
 class FireWeatherIndexPredictor:
@@ -18,8 +85,13 @@ class FireWeatherIndexPredictor:
     Trains on historical sensor data to predict future fire risk
     """
     
-    def __init__(self, model_path: str = "models/fwi_model.pkl"):
+    def __init__(self, model_path: str = "models/fwi_model.pkl", mmap_mode: Optional[str] = None,
+                 use_compiled: bool = True, prediction_mode: str = 'batch',
+                 online_blend_weight: float = 0.3, online_forgetting: float = 0.999):
         self.model_path = Path(model_path)
+        self.metadata_path = self.model_path.with_suffix('.meta.json')
+        self.mmap_mode = mmap_mode  # 'r' maps the compiled node arrays, shared across worker processes
+        self.use_compiled = use_compiled
         self.regression_model = None
         self.classification_model = None
         self.scaler = StandardScaler()
@@ -30,32 +102,281 @@ class FireWeatherIndexPredictor:
             'temp_ma_1h', 'humidity_ma_1h',  # Moving averages
             'temp_std_1h', 'smoke_max_1h'
         ]
-        self.is_trained = False
-        self._load_model()
+        # Model is loaded lazily on first use; only the sidecar is read here
+        self._models_loaded = False
+        self.compiled_regression: Optional[CompiledTreeEnsemble] = None
+        self.compiled_classification: Optional[CompiledTreeEnsemble] = None
+        self._compiled_scaler: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # node_id -> (last reading timestamp, model version, (score, level, confidence))
+        self._node_score_cache: Dict[str, Tuple[datetime, str, Tuple[float, str, float]]] = {}
+        self.metadata = self._load_metadata()
+        self.is_trained = self.model_path.exists()
+        self.model_params: Optional[Dict] = None  # Overrides for DEFAULT_MODEL_PARAMS
+        # Incrementally updated model running next to the batch forest
+        self.online_model = OnlineRiskLearner(
+            len(self.feature_columns),
+            hour_index=self.feature_columns.index('hour_of_day'),
+            forgetting=online_forgetting
+        )
+        self.prediction_mode = prediction_mode
+        self.online_blend_weight = online_blend_weight
     
-    def _load_model(self):
+    def _load_model(self) -> bool:
         """Load pre-trained model if exists"""
-        if self.model_path.exists():
-            try:
-                data = joblib.load(self.model_path)
-                self.regression_model = data['regression']
-                self.classification_model = data['classification']
-                self.scaler = data['scaler']
-                self.is_trained = True
-                print("✅ FWI model loaded successfully")
-            except Exception as e:
-                print(f"⚠️ Failed to load model: {e}")
+        if not self.model_path.exists():
+            return False
+        
+        try:
+            data = joblib.load(self.model_path)
+            self.regression_model = data['regression']
+            self.classification_model = data['classification']
+            self.scaler = data['scaler']
+            self._models_loaded = True
+            self.is_trained = True
+            print("✅ FWI model loaded successfully")
+            
+            # Backfill the sidecar for models saved before it existed
+            if self.metadata is None:
+                trained_at = datetime.utcfromtimestamp(self.model_path.stat().st_mtime)
+                self.metadata = self._build_metadata(trained_at)
+                self._save_metadata()
+            return True
+        except Exception as e:
+            self.is_trained = False
+            print(f"⚠️ Failed to load model: {e}")
+            return False
+    
+    def _ensure_loaded(self) -> bool:
+        """Load the model on first use"""
+        if self._models_loaded:
+            return True
+        return self._load_model()
     
     def _save_model(self):
         """Save trained model"""
         self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Write to a temp file and rename so other workers never read a
+        # half-written model
+        tmp_path = self.model_path.with_suffix('.pkl.tmp')
         joblib.dump({
             'regression': self.regression_model,
             'classification': self.classification_model,
             'scaler': self.scaler
-        }, self.model_path)
+        }, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self._save_metadata()
         print("✅ FWI model saved successfully")
     
+    def _ensure_engine(self) -> bool:
+        """Load (or build) the compiled flat-array engine on first use"""
+        if not self.use_compiled:
+            return False
+        if self.compiled_regression is not None:
+            return True
+        if not self.model_path.exists():
+            return False
+        
+        # Reuse the arrays exported from this exact pickle
+        compiled_dir = self._compiled_dir()
+        if compiled_dir.exists():
+            try:
+                arrays = {
+                    path.stem: np.load(path, mmap_mode=self.mmap_mode)
+                    for path in compiled_dir.glob('*.npy')
+                }
+                self.compiled_regression = CompiledTreeEnsemble.from_arrays(arrays, 'regression')
+                self.compiled_classification = CompiledTreeEnsemble.from_arrays(arrays, 'classification')
+                self._compiled_scaler = (arrays['scaler_mean'], arrays['scaler_scale'])
+                return True
+            except Exception as e:
+                print(f"⚠️ Failed to load compiled model: {e}")
+        
+        return self._ensure_loaded() and self._compile_engine()
+    
+    def _compile_engine(self, X_validation: Optional[np.ndarray] = None) -> bool:
+        """
+        Export the sklearn models to flat node arrays and validate them
+        against sklearn before they are used for inference
+        """
+        try:
+            regression = compile_forest_regressor(self.regression_model)
+            classification = compile_gradient_boosting_classifier(self.classification_model)
+            
+            if X_validation is None:
+                # Scaled feature space is roughly standard normal
+                X_validation = np.random.default_rng(42).normal(size=(256, len(self.feature_columns)))
+            
+            deviation = max(
+                max_deviation(regression, self.regression_model, X_validation),
+                max_deviation(classification, self.classification_model, X_validation)
+            )
+            if deviation > 1e-6:
+                print(f"⚠️ Compiled model deviates from sklearn ({deviation:.2e}), using sklearn")
+                return False
+            
+            self.compiled_regression = regression
+            self.compiled_classification = classification
+            self._compiled_scaler = (
+                np.asarray(self.scaler.mean_, dtype=np.float64),
+                np.asarray(self.scaler.scale_, dtype=np.float64)
+            )
+            
+            self._save_compiled({
+                'scaler_mean': self._compiled_scaler[0],
+                'scaler_scale': self._compiled_scaler[1],
+                **regression.to_arrays('regression'),
+                **classification.to_arrays('classification')
+            })
+            print(f"✅ Compiled FWI model exported ({regression.n_nodes + classification.n_nodes} nodes)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Failed to compile model: {e}")
+            return False
+    
+    def _compiled_dir(self) -> Path:
+        """Directory of the compiled arrays, named after the pickle they came from"""
+        return self.model_path.with_name(
+            f"{self.model_path.stem}.compiled-{self.model_path.stat().st_mtime_ns}"
+        )
+    
+    def _save_compiled(self, arrays: Dict[str, np.ndarray]):
+        """
+        Write the compiled arrays as raw .npy files (which, unlike .npz,
+        can be memory-mapped) into a directory that appears atomically
+        """
+        compiled_dir = self._compiled_dir()
+        tmp_dir = compiled_dir.with_name(f"{compiled_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array)
+        try:
+            os.rename(tmp_dir, compiled_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Another worker exported it first
+        
+        # Drop exports of older models; workers still mapping them keep valid mappings
+        for stale in self.model_path.parent.glob(f"{self.model_path.stem}.compiled*"):
+            if stale != compiled_dir and '.tmp-' not in stale.name:
+                if stale.is_dir():
+                    shutil.rmtree(stale, ignore_errors=True)
+                else:
+                    stale.unlink(missing_ok=True)  # .npz from before the .npy layout
+    
+    def _score_features(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Risk score, risk level index and confidence for each feature row
+        Uses the compiled engine when available, sklearn otherwise
+        """
+        # sklearn's per-call overhead only pays off on large batches
+        use_sklearn = self._models_loaded and len(X) > COMPILED_MAX_BATCH_ROWS
+        
+        if self.compiled_regression is not None and not use_sklearn:
+            mean, scale = self._compiled_scaler
+            X_scaled = (X - mean) / scale
+            proba = self.compiled_classification.predict_proba(X_scaled)
+            levels = self.compiled_classification.classes[np.argmax(proba, axis=1)]
+            return self.compiled_regression.predict(X_scaled), levels, proba.max(axis=1)
+        
+        X_scaled = self.scaler.transform(X)
+        proba = self.classification_model.predict_proba(X_scaled)
+        levels = self.classification_model.classes_[np.argmax(proba, axis=1)]
+        return self.regression_model.predict(X_scaled), levels, proba.max(axis=1)
+    
+    def effective_prediction_mode(self, mode: Optional[str] = None) -> str:
+        """Requested prediction mode, falling back to batch until the online model is ready"""
+        mode = mode or self.prediction_mode
+        if mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode '{mode}', expected one of {PREDICTION_MODES}")
+        return mode if mode == 'batch' or self.online_model.is_ready else 'batch'
+    
+    def _apply_online(self, X: np.ndarray, scores: np.ndarray, levels: np.ndarray,
+                      mode: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Replace or blend batch risk scores with the online model's
+        In online mode the risk level follows the online score (same
+        thresholds as the rule-based analyzer); otherwise the classifier's
+        level is kept
+        """
+        if mode == 'batch':
+            return scores, levels
+        
+        online_scores = self.online_model.predict(X)
+        if mode == 'online':
+            levels = np.searchsorted([26, 51, 76], np.clip(online_scores, 0, 100), side='right')
+            return online_scores, levels
+        
+        w = self.online_blend_weight
+        return (1 - w) * scores + w * online_scores, levels
+    
+    def learn_online(self, features: np.ndarray, risk_score: float):
+        """Update the online model with one labelled feature row"""
+        self.online_model.partial_fit(features, [risk_score])
+    
+    def _load_metadata(self) -> Optional[Dict]:
+        """Read model metadata sidecar without touching the model itself"""
+        if not self.metadata_path.exists():
+            return None
+        
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Failed to read model metadata: {e}")
+            return None
+    
+    def _save_metadata(self):
+        """Write model metadata sidecar"""
+        if self.metadata is None:
+            return
+        
+        tmp_path = self.metadata_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.replace(tmp_path, self.metadata_path)
+    
+    def _build_metadata(self, trained_at: datetime, training_stats: Optional[Dict] = None) -> Dict:
+        """Describe the currently loaded models"""
+        return {
+            'model_version': MODEL_VERSION,
+            'trained_at': trained_at.isoformat(),
+            'feature_columns': self.feature_columns,
+            'training_stats': training_stats or {},
+            'feature_importance': {
+                col: float(imp) for col, imp in zip(
+                    self.feature_columns,
+                    self.regression_model.feature_importances_
+                )
+            },
+            'model_params': {
+                'regression': {
+                    'n_estimators': self.regression_model.n_estimators,
+                    'max_depth': self.regression_model.max_depth
+                },
+                'classification': {
+                    'n_estimators': self.classification_model.n_estimators,
+                    'max_depth': self.classification_model.max_depth
+                }
+            }
+        }
+    
+    def get_model_info(self) -> Dict:
+        """Model status and metadata, answered from the sidecar without loading the model"""
+        metadata = self.metadata or {}
+        return {
+            'is_trained': self.is_trained,
+            'model_loaded': self._models_loaded,
+            'model_version': metadata.get('model_version'),
+            'trained_at': metadata.get('trained_at'),
+            'features': metadata.get('feature_columns', self.feature_columns),
+            'training_stats': metadata.get('training_stats', {}),
+            'model_params': metadata.get('model_params', {}),
+            'prediction_mode': self.prediction_mode,
+            'online_blend_weight': self.online_blend_weight,
+            'online_model': self.online_model.get_info()
+        }
+    
     def _extract_features(self, sensor_history: List[Dict]) -> np.ndarray:
         """
         Extract features from sensor history
@@ -107,6 +428,103 @@ class FireWeatherIndexPredictor:
         
         return np.array(features)
     
+    def extract_latest_features(self, sensor_history: List[Dict]) -> np.ndarray:
+        """
+        Feature row for the most recent reading only
+        Matches the last row of _extract_features without building the others
+        """
+        data = sensor_history[-1]
+        timestamp = data.get('timestamp', datetime.utcnow())
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        
+        prev = sensor_history[-2] if len(sensor_history) > 1 else data
+        recent_data = sensor_history[-60:]
+        temps = [d.get('temperature', 0) for d in recent_data]
+        
+        feature_dict = {
+            'temperature': data.get('temperature', 0),
+            'humidity': data.get('humidity', 0),
+            'smoke_level': data.get('smoke_level', 0),
+            'rain_level': data.get('rain_level', 0),
+            'hour_of_day': timestamp.hour,
+            'day_of_week': timestamp.weekday(),
+            'month': timestamp.month,
+            'temp_change_rate': data.get('temperature', 0) - prev.get('temperature', 0),
+            'humidity_change_rate': data.get('humidity', 0) - prev.get('humidity', 0),
+            'temp_ma_1h': np.mean(temps),
+            'humidity_ma_1h': np.mean([d.get('humidity', 0) for d in recent_data]),
+            'temp_std_1h': np.std(temps),
+            'smoke_max_1h': np.max([d.get('smoke_level', 0) for d in recent_data])
+        }
+        
+        return np.array([feature_dict[col] for col in self.feature_columns])
+    
+    def extract_features_columnar(self, data: TrainingData) -> np.ndarray:
+        """
+        Vectorized _extract_features over chronological columnar readings
+        """
+        temps, humids = data['temperature'], data['humidity']
+        days = data.timestamp.astype('datetime64[D]')
+        
+        temp_ma, temp_std, _ = _rolling_stats(temps, ROLLING_WINDOW)
+        humidity_ma, _, _ = _rolling_stats(humids, ROLLING_WINDOW)
+        _, _, smoke_max = _rolling_stats(data['smoke_level'], ROLLING_WINDOW)
+        
+        columns = {
+            'temperature': temps,
+            'humidity': humids,
+            'smoke_level': data['smoke_level'],
+            'rain_level': data['rain_level'],
+            'hour_of_day': (data.timestamp.astype('datetime64[h]') - days).astype(np.int64),
+            'day_of_week': (days.astype(np.int64) + 3) % 7,  # 1970-01-01 was a Thursday
+            'month': data.timestamp.astype('datetime64[M]').astype(np.int64) % 12 + 1,
+            'temp_change_rate': np.diff(temps, prepend=temps[:1]),
+            'humidity_change_rate': np.diff(humids, prepend=humids[:1]),
+            'temp_ma_1h': temp_ma,
+            'humidity_ma_1h': humidity_ma,
+            'temp_std_1h': temp_std,
+            'smoke_max_1h': smoke_max
+        }
+        
+        return np.column_stack([columns[col] for col in self.feature_columns]).astype(np.float64)
+    
+    def extract_node_features_columnar(self, data: TrainingData) -> np.ndarray:
+        """
+        extract_features_columnar per node, so rolling and change-rate
+        features only see each node's own readings; rows stay in data order
+        """
+        X = np.empty((len(data), len(self.feature_columns)))
+        for rows in data.node_rows().values():
+            X[rows] = self.extract_features_columnar(data.select(rows))
+        return X
+    
+    def train_from_columns(self, data: TrainingData) -> bool:
+        """
+        Train from columnar data produced by training_data.load_training_data
+        """
+        if len(data) < 100:
+            print("⚠️ Insufficient training data. Need at least 100 samples.")
+            return False
+        
+        try:
+            X = self.extract_node_features_columnar(data)
+        except Exception as e:
+            print(f"❌ Training failed: {e}")
+            return False
+        
+        return self._fit(X, data['fire_risk_score'], data.risk_level.astype(np.int64))
+    
+    def train_from_features(self, X: np.ndarray, risk_scores: np.ndarray, risk_level_codes: np.ndarray) -> bool:
+        """
+        Train from precomputed feature rows (e.g. the stratified training reservoir)
+        """
+        if len(X) < 100:
+            print("⚠️ Insufficient training data. Need at least 100 samples.")
+            return False
+        
+        return self._fit(np.asarray(X, dtype=np.float64), np.asarray(risk_scores), np.asarray(risk_level_codes))
+    
     def train(self, sensor_history: List[Dict], risk_scores: List[float], risk_levels: List[str]):
         """
         Train the FWI prediction models
@@ -123,36 +541,47 @@ class FireWeatherIndexPredictor:
         try:
             # Extract features
             X = self._extract_features(sensor_history)
-            y_regression = np.array(risk_scores)
             
             # Convert risk levels to numeric
             level_map = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
             y_classification = np.array([level_map.get(level, 0) for level in risk_levels])
-            
+        except Exception as e:
+            print(f"❌ Training failed: {e}")
+            return False
+        
+        return self._fit(X, np.array(risk_scores), y_classification)
+    
+    def _fit(self, X: np.ndarray, y_regression: np.ndarray, y_classification: np.ndarray) -> bool:
+        """Fit both models on a prepared feature matrix and persist them"""
+        try:
             # Scale features
             X_scaled = self.scaler.fit_transform(X)
             
-            # Train regression model (for risk score prediction)
-            self.regression_model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=15,
-                min_samples_split=5,
-                random_state=42
-            )
+            # Regression model predicts risk score, classification predicts risk level
+            self.regression_model, self.classification_model = build_models(self.model_params)
             self.regression_model.fit(X_scaled, y_regression)
-            
-            # Train classification model (for risk level prediction)
-            self.classification_model = GradientBoostingClassifier(
-                n_estimators=100,
-                max_depth=5,
-                learning_rate=0.1,
-                random_state=42
-            )
             self.classification_model.fit(X_scaled, y_classification)
             
+            self._models_loaded = True
             self.is_trained = True
+            self._node_score_cache.clear()
+            self.metadata = self._build_metadata(datetime.utcnow(), {
+                'num_samples': len(y_regression),
+                'risk_score_mean': float(np.mean(y_regression)),
+                'risk_score_std': float(np.std(y_regression)),
+                'risk_level_counts': {
+                    level: int(np.sum(y_classification == idx))
+                    for level, idx in RISK_LEVEL_CODES.items()
+                }
+            })
             self._save_model()
             
+            # Export the flat-array engine, validated on the training rows
+            self.compiled_regression = None
+            self.compiled_classification = None
+            if self.use_compiled:
+                self._compile_engine(X_scaled[:1000])
+            
             # Print feature importance
             feature_importance = dict(zip(
                 self.feature_columns,
@@ -168,18 +597,19 @@ class FireWeatherIndexPredictor:
             print(f"❌ Training failed: {e}")
             return False
     
-    def predict(self, sensor_history: List[Dict], hours_ahead: int = 1) -> Dict:
+    def predict(self, sensor_history: List[Dict], hours_ahead: int = 1, mode: Optional[str] = None) -> Dict:
         """
         Predict fire risk for future time periods
         
         Args:
             sensor_history: Recent sensor readings (at least last hour)
             hours_ahead: How many hours ahead to predict (1-24)
+            mode: 'batch', 'online' or 'blend' (defaults to prediction_mode)
         
         Returns:
             Dict with predictions including risk_score, risk_level, confidence
         """
-        if not self.is_trained:
+        if not self.is_trained or not (self._ensure_engine() or self._ensure_loaded()):
             print("⚠️ Model not trained, returning error")
             return {
                 'error': 'Model not trained yet. Please train the model first or use mock data.',
@@ -197,31 +627,15 @@ class FireWeatherIndexPredictor:
                     'is_trained': self.is_trained
                 }
             
-            X_scaled = self.scaler.transform(X[-1:])  # Use most recent
-            
-            predictions = []
-            
-            # For simplicity, make same prediction for each hour
-            # In production, you'd simulate forward in time
-            for h in range(1, min(hours_ahead + 1, 25)):
-                risk_score = self.regression_model.predict(X_scaled)[0]
-                risk_level_idx = self.classification_model.predict(X_scaled)[0]
-                confidence = np.max(self.classification_model.predict_proba(X_scaled)[0])
-                
-                level_map = {0: 'low', 1: 'medium', 2: 'high', 3: 'critical'}
-                risk_level = level_map.get(risk_level_idx, 'medium')
-                
-                predictions.append({
-                    'hours_ahead': h,
-                    'timestamp': (datetime.utcnow() + timedelta(hours=h)).isoformat(),
-                    'risk_score': float(np.clip(risk_score, 0, 100)),
-                    'risk_level': risk_level,
-                    'confidence': float(confidence)
-                })
+            mode = self.effective_prediction_mode(mode)
+            scores, level_idx, confidence = self._score_features(X[-1:])  # Use most recent
+            scores, level_idx = self._apply_online(X[-1:], scores, level_idx, mode)
+            score = self._to_node_score(scores[0], level_idx[0], confidence[0])
             
             return {
-                'predictions': predictions,
-                'model_version': '1.0',
+                'predictions': self.build_horizon_predictions(score, hours_ahead),
+                'model_version': (self.metadata or {}).get('model_version', MODEL_VERSION),
+                'prediction_mode': mode,
                 'features_used': self.feature_columns
             }
             
@@ -231,11 +645,98 @@ class FireWeatherIndexPredictor:
                 'predictions': []
             }
     
+    def _to_node_score(self, risk_score: float, level_idx: int, confidence: float) -> Tuple[float, str, float]:
+        """Convert raw model outputs into (risk_score, risk_level, confidence)"""
+        level_map = {0: 'low', 1: 'medium', 2: 'high', 3: 'critical'}
+        return (
+            float(np.clip(risk_score, 0, 100)),
+            level_map.get(int(level_idx), 'medium'),
+            float(confidence)
+        )
+    
+    def build_horizon_predictions(self, score: Tuple[float, str, float], hours_ahead: int) -> List[Dict]:
+        """Expand a node score into per-hour predictions"""
+        risk_score, risk_level, confidence = score
+        now = datetime.utcnow()
+        
+        # For simplicity, make same prediction for each hour
+        # In production, you'd simulate forward in time
+        return [
+            {
+                'hours_ahead': h,
+                'timestamp': (now + timedelta(hours=h)).isoformat(),
+                'risk_score': risk_score,
+                'risk_level': risk_level,
+                'confidence': confidence
+            }
+            for h in range(1, min(hours_ahead + 1, 25))
+        ]
+    
+    def _score_version(self) -> str:
+        """Identifies the models behind a cached score (batch training time, online updates)"""
+        trained_at = (self.metadata or {}).get('trained_at')
+        mode = self.effective_prediction_mode()
+        return f"{trained_at}:{mode}:{self.online_model.n_updates if mode != 'batch' else 0}"
+    
+    def get_cached_node_scores(self, latest_readings: Dict[str, datetime]) -> Dict[str, Tuple[float, str, float]]:
+        """
+        Cached scores for nodes whose latest reading has not changed
+        
+        Args:
+            latest_readings: node_id -> timestamp of the node's newest reading
+        """
+        version = self._score_version()
+        cached = {}
+        
+        for node_id, last_reading in latest_readings.items():
+            entry = self._node_score_cache.get(node_id)
+            if entry and entry[0] == last_reading and entry[1] == version:
+                cached[node_id] = entry[2]
+        
+        return cached
+    
+    def score_node_batch(self, node_histories: Dict[str, List[Dict]]) -> Dict[str, Tuple[float, str, float]]:
+        """
+        Score many nodes with a single model invocation
+        
+        Args:
+            node_histories: node_id -> chronological readings (last hour is enough)
+        
+        Returns:
+            node_id -> (risk_score, risk_level, confidence); results are cached
+            until the node's next reading
+        """
+        node_histories = {n: h for n, h in node_histories.items() if h}
+        if not node_histories or not self.is_trained or \
+                not (self._ensure_engine() or self._ensure_loaded()):
+            return {}
+        
+        node_ids = list(node_histories)
+        X = np.vstack([self.extract_latest_features(node_histories[n]) for n in node_ids])
+        scores, level_idx, confidence = self._score_features(X)
+        scores, level_idx = self._apply_online(X, scores, level_idx, self.effective_prediction_mode())
+        
+        version = self._score_version()
+        results = {}
+        for i, node_id in enumerate(node_ids):
+            results[node_id] = self._to_node_score(scores[i], level_idx[i], confidence[i])
+            self._node_score_cache[node_id] = (
+                node_histories[node_id][-1].get('timestamp'), version, results[node_id]
+            )
+        
+        return results
+    
     def get_feature_importance(self) -> Dict[str, float]:
         """Get feature importance from trained model"""
         if not self.is_trained:
             return {}
         
+        if self.metadata and self.metadata.get('feature_importance'):
+            return self.metadata['feature_importance']
+        
+        if not self._ensure_loaded():
+            return {}
+        
         return dict(zip(
             self.feature_columns,
             self.regression_model.feature_importances_
@@ -243,7 +744,7 @@ class FireWeatherIndexPredictor:
     
     def evaluate(self, test_data: List[Dict], test_scores: List[float]) -> Dict:
         """Evaluate model performance"""
-        if not self.is_trained:
+        if not self.is_trained or not self._ensure_loaded():
             return {'error': 'Model not trained'}
         
         try:
@@ -268,4 +769,10 @@ class FireWeatherIndexPredictor:
 
 
 # Global predictor instance
-predictor = FireWeatherIndexPredictor()
+predictor = FireWeatherIndexPredictor(
+    mmap_mode=settings.ml_model_mmap_mode,
+    use_compiled=settings.ml_use_compiled_engine,
+    prediction_mode=settings.ml_prediction_mode,
+    online_blend_weight=settings.ml_online_blend_weight,
+    online_forgetting=settings.ml_online_forgetting
+)
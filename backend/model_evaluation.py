@@ -0,0 +1,244 @@
+"""
+FWI Model Evaluation Harness
+Rolling-origin cross-validation over stored history, with accuracy per
+forecast horizon and cost (fit time, latency, throughput, size) per
+candidate model configuration
+"""
+import io
+import time
+import joblib
+import numpy as np
+from typing import Dict, List, Optional
+from sklearn.preprocessing import StandardScaler
+from ml_predictor import predictor, build_models
+from training_data import TrainingData
+from tree_engine import compile_forest_regressor, compile_gradient_boosting_classifier
+
+
+DEFAULT_HORIZONS_HOURS = [0, 1, 6, 24]
+
+DEFAULT_CANDIDATES = [
+    {'name': 'rf25_d8', 'regression': {'n_estimators': 25, 'max_depth': 8},
+     'classification': {'n_estimators': 25, 'max_depth': 3}},
+    {'name': 'rf50_d12', 'regression': {'n_estimators': 50, 'max_depth': 12},
+     'classification': {'n_estimators': 50, 'max_depth': 4}},
+    {'name': 'rf100_d15 (production)', 'regression': {}, 'classification': {}},
+    {'name': 'rf200_d20', 'regression': {'n_estimators': 200, 'max_depth': 20},
+     'classification': {'n_estimators': 150, 'max_depth': 5}},
+]
+
+
+def rolling_origin_folds(n_rows: int, n_folds: int, min_train_fraction: float = 0.5) -> List[tuple]:
+    """
+    (train_end, test_end) row indices for expanding-window folds
+    Each fold trains on rows [0, train_end) and tests on [train_end, test_end)
+    """
+    min_train = int(n_rows * min_train_fraction)
+    test_size = (n_rows - min_train) // n_folds
+    return [
+        (min_train + k * test_size, min_train + (k + 1) * test_size)
+        for k in range(n_folds) if test_size > 0
+    ]
+
+
+def horizon_targets(data: TrainingData, hours: float, tolerance_minutes: float = 10,
+                    node_rows: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """
+    Index of the same node's reading `hours` after each row, or -1 when
+    none lies within the tolerance
+    """
+    targets = np.full(len(data), -1, dtype=np.int64)
+    for rows in (node_rows or data.node_rows()).values():
+        timestamps = data.timestamp[rows].astype(np.int64)  # milliseconds
+        target_times = timestamps + int(hours * 3600 * 1000)
+        idx = np.searchsorted(timestamps, target_times)
+        idx_clipped = np.minimum(idx, len(timestamps) - 1)
+        close = np.abs(timestamps[idx_clipped] - target_times) <= tolerance_minutes * 60 * 1000
+        targets[rows] = np.where((idx < len(timestamps)) & close, rows[idx_clipped], -1)
+    return targets
+
+
+def _median_latency_us(fn, repeats: int = 200) -> float:
+    """Median wall time of fn() in microseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1e6)
+
+
+def _throughput_rows_per_s(fn, rows: int, repeats: int = 3) -> float:
+    """Best-of-n rows per second for a batch call"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return float(rows / best) if best > 0 else float('inf')
+
+
+def _regression_metrics(predicted: np.ndarray, actual: np.ndarray) -> Dict:
+    """MAE, RMSE and R² (same definitions as predictor.evaluate)"""
+    if len(actual) == 0:
+        return {'mae': None, 'rmse': None, 'r2_score': None, 'num_samples': 0}
+
+    errors = predicted - actual
+    variance = np.sum((actual - np.mean(actual)) ** 2)
+    return {
+        'mae': float(np.mean(np.abs(errors))),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'r2_score': float(1 - np.sum(errors ** 2) / variance) if variance > 0 else None,
+        'num_samples': int(len(actual))
+    }
+
+
+def evaluate_candidate(data: TrainingData, X: np.ndarray, candidate: Dict,
+                       horizons_hours: List[float], n_folds: int) -> Dict:
+    """Cross-validate one model configuration and measure its cost"""
+    scores = data['fire_risk_score']
+    levels = data.risk_level.astype(np.int64)
+    node_rows = data.node_rows()
+    targets = {h: horizon_targets(data, h, node_rows=node_rows) for h in horizons_hours}
+
+    per_horizon = {h: ([], []) for h in horizons_hours}
+    level_hits, level_total = 0, 0
+    fit_times = []
+    single_level_folds = 0
+    fitted_classification = None
+
+    for train_end, test_end in rolling_origin_folds(len(X), n_folds):
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[:train_end])
+        regression, classification = build_models(candidate)
+        train_levels = np.unique(levels[:train_end])
+
+        start = time.perf_counter()
+        regression.fit(X_train, scores[:train_end])
+        if len(train_levels) > 1:
+            classification.fit(X_train, levels[:train_end])
+            fitted_classification = classification
+        fit_times.append(time.perf_counter() - start)
+
+        X_test = scaler.transform(X[train_end:test_end])
+        predicted = regression.predict(X_test)
+        if len(train_levels) > 1:
+            predicted_levels = classification.predict(X_test)
+        else:
+            # Early history often holds one risk level, which boosting can't fit; predict it
+            single_level_folds += 1
+            predicted_levels = np.full(test_end - train_end, train_levels[0])
+        level_hits += int(np.sum(predicted_levels == levels[train_end:test_end]))
+        level_total += test_end - train_end
+
+        for h, target_idx in targets.items():
+            fold_targets = target_idx[train_end:test_end]
+            valid = fold_targets >= 0
+            per_horizon[h][0].append(predicted[valid])
+            per_horizon[h][1].append(scores[fold_targets[valid]])
+
+    if fitted_classification is None:
+        return {
+            'name': candidate.get('name', 'candidate'),
+            'error': 'Every training fold holds a single risk level',
+            'folds': len(fit_times)
+        }
+
+    # Cost is measured on the models from the last (largest) fold that fitted both
+    classification = fitted_classification
+    compiled_regression = compile_forest_regressor(regression)
+    compiled_classification = compile_gradient_boosting_classifier(classification)
+    mean, scale = scaler.mean_, scaler.scale_
+    batch = X[train_end:test_end][:5000]
+    row = batch[:1]
+
+    def sklearn_score(rows):
+        scaled = scaler.transform(rows)
+        return regression.predict(scaled), classification.predict_proba(scaled)
+
+    def compiled_score(rows):
+        scaled = (rows - mean) / scale
+        return compiled_regression.predict(scaled), compiled_classification.predict_proba(scaled)
+
+    buffer = io.BytesIO()
+    joblib.dump({'regression': regression, 'classification': classification, 'scaler': scaler}, buffer)
+    compiled_bytes = sum(
+        getattr(engine, name).nbytes
+        for engine in (compiled_regression, compiled_classification)
+        for name in ('feature', 'threshold', 'left', 'right', 'value')
+    )
+
+    return {
+        'name': candidate.get('name', 'candidate'),
+        'params': {k: v for k, v in candidate.items() if k != 'name'},
+        'folds': len(fit_times),
+        'single_level_folds': single_level_folds,
+        'accuracy_by_horizon': {
+            f"{h}h": _regression_metrics(
+                np.concatenate(per_horizon[h][0]) if per_horizon[h][0] else np.array([]),
+                np.concatenate(per_horizon[h][1]) if per_horizon[h][1] else np.array([])
+            )
+            for h in horizons_hours
+        },
+        'risk_level_accuracy': level_hits / level_total if level_total else None,
+        'fit_time_s': float(np.mean(fit_times)) if fit_times else None,
+        'single_row_latency_us': {
+            'sklearn': _median_latency_us(lambda: sklearn_score(row), repeats=50),
+            'compiled': _median_latency_us(lambda: compiled_score(row))
+        },
+        'batch_throughput_rows_per_s': {
+            'sklearn': _throughput_rows_per_s(lambda: sklearn_score(batch), len(batch)),
+            'compiled': _throughput_rows_per_s(lambda: compiled_score(batch), len(batch))
+        },
+        'model_size_bytes': {
+            'pickle': buffer.getbuffer().nbytes,
+            'compiled': int(compiled_bytes)
+        },
+        'tree_nodes': compiled_regression.n_nodes + compiled_classification.n_nodes
+    }
+
+
+def speed_accuracy_frontier(results: List[Dict], horizon: str = '1h') -> List[str]:
+    """
+    Names of candidates not dominated on (compiled single-row latency, MAE at horizon)
+    """
+    points = [
+        (r['single_row_latency_us']['compiled'], r['accuracy_by_horizon'][horizon]['mae'], r['name'])
+        for r in results if r.get('accuracy_by_horizon', {}).get(horizon, {}).get('mae') is not None
+    ]
+    return [
+        name for latency, mae, name in points
+        if not any(
+            (l <= latency and m <= mae) and (l < latency or m < mae)
+            for l, m, _ in points
+        )
+    ]
+
+
+def run_benchmark(data: TrainingData, candidates: Optional[List[Dict]] = None,
+                  horizons_hours: Optional[List[float]] = None, n_folds: int = 4) -> Dict:
+    """
+    Evaluate every candidate configuration on chronological training data
+
+    Returns per-candidate results plus the speed/accuracy frontier
+    """
+    candidates = candidates or DEFAULT_CANDIDATES
+    horizons_hours = horizons_hours or DEFAULT_HORIZONS_HOURS
+
+    if len(data) < 200:
+        return {'error': 'Need at least 200 readings for cross-validation', 'results': []}
+
+    # Features only look backwards, so they are computed once for all folds
+    X = predictor.extract_node_features_columnar(data)
+    results = [
+        evaluate_candidate(data, X, candidate, horizons_hours, n_folds)
+        for candidate in candidates
+    ]
+
+    return {
+        'num_samples': len(data),
+        'folds': n_folds,
+        'horizons_hours': horizons_hours,
+        'results': results,
+        'frontier_1h': speed_accuracy_frontier(results, '1h')
+    }
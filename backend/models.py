@@ -23,8 +23,13 @@ class SprinklerStatus(str, Enum):
     AUTO = "auto"
 
 
+# Readings from the single serial-attached ESP32 are attributed to this node
+DEFAULT_NODE_ID = "NODE_001"
+
+
 # Sensor Data Models
 class SensorData(BaseModel):
+    node_id: str = DEFAULT_NODE_ID
     temperature: float
     humidity: float
     smoke_level: float
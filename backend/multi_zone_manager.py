@@ -2,11 +2,21 @@
 Multi-Zone Sensor Network Manager
 Manages multiple ESP32 sensor nodes across different forest zones
 """
+import math
+import time
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
 import numpy as np
+from spatial_index import NodeSpatialIndex
+from geo import ZoneGeometry, project_local, unproject_local
+import fire_spread
+from zone_aggregates import ZoneRiskAggregate
+from node_registry import NodeRegistry
+from heartbeat_tracker import HeartbeatTracker
+from metric_buffer import to_epoch, from_epoch
+from config import settings
 
 
 class ZoneStatus(str, Enum):
@@ -48,6 +58,20 @@ class SensorNode(BaseModel):
     risk_score: float = 0.0
     battery_level: Optional[float] = None  # For solar-powered nodes
     signal_strength: Optional[int] = None  # RSSI
+    elevation_m: Optional[float] = None  # Above sea level; adds slope to fire spread
+
+
+# Zone fields set by configuration (the rest is runtime state)
+ZONE_CONFIG_FIELDS = ('zone_name', 'latitude', 'longitude', 'area_hectares', 'total_sprinklers')
+# Node fields that come from readings rather than registration
+NODE_LIVE_FIELDS = (
+    'is_online', 'last_heartbeat', 'current_temperature', 'current_humidity',
+    'current_smoke', 'current_rain', 'risk_score'
+)
+# Fire spread simulation
+MAX_IGNITION_NODES = 3
+IGNITION_RISK_MARGIN = 10  # Risk points below the zone maximum that still ignite
+MAX_SPREAD_MARGIN_M = 3000  # Raster extends at most this far past the nodes
 
 
 class MultiZoneManager:
@@ -56,9 +80,15 @@ class MultiZoneManager:
     across the entire forest network
     """
     
-    def __init__(self):
+    def __init__(self, offline_timeout_seconds: float = 300):
         self.zones: Dict[str, SensorZone] = {}
-        self.nodes: Dict[str, SensorNode] = {}
+        self.nodes = NodeRegistry(SensorNode)  # Reads as Dict[str, SensorNode]
+        self.spatial_index = NodeSpatialIndex()
+        self._geometry: Dict[str, ZoneGeometry] = {}  # Cached per zone until its nodes change
+        self._risk: Dict[str, ZoneRiskAggregate] = {}  # Online node risk scores per zone
+        self.heartbeats = HeartbeatTracker(offline_timeout_seconds)
+        self.heartbeats.subscribe(self._on_node_offline)
+        self.offline_listeners = []  # Called with (node_id, zone_id, last_heartbeat)
         self._init_default_zones()
     
     def _init_default_zones(self):
@@ -105,69 +135,129 @@ class MultiZoneManager:
         
         for zone_data in default_zones:
             zone_data['last_update'] = datetime.utcnow()
-            self.zones[zone_data['zone_id']] = SensorZone(**zone_data)
+            self.upsert_zone(SensorZone(**zone_data))
+    
+    def upsert_zone(self, zone: SensorZone):
+        """Add a zone, or update an existing zone's configuration (keeping its nodes and stats)"""
+        current = self.zones.get(zone.zone_id)
+        if current is None:
+            self.zones[zone.zone_id] = zone
+            self._risk[zone.zone_id] = ZoneRiskAggregate()
+            return
+        for field in ZONE_CONFIG_FIELDS:
+            setattr(current, field, getattr(zone, field))
+        self._geometry.pop(zone.zone_id, None)  # Origin may have moved
     
     def register_node(self, node: SensorNode) -> bool:
         """Register a new sensor node"""
         try:
-            self.nodes[node.node_id] = node
-            
-            # Add node to zone
-            if node.zone_id in self.zones:
-                if node.node_id not in self.zones[node.zone_id].sensor_nodes:
-                    self.zones[node.zone_id].sensor_nodes.append(node.node_id)
-            
+            self._register(node)
             print(f"✅ Node {node.node_id} registered in {node.zone_id}")
             return True
         except Exception as e:
             print(f"❌ Failed to register node {node.node_id}: {e}")
             return False
     
+    def register_nodes(self, nodes: List[SensorNode], keep_live_state: bool = True) -> int:
+        """
+        Register many nodes at once; returns how many were registered
+        Nodes already known keep their readings and online state unless
+        keep_live_state is False
+        """
+        registered = 0
+        for node in nodes:
+            try:
+                if keep_live_state and node.node_id in self.nodes:
+                    current = self.nodes[node.node_id]
+                    node = node.copy(update={field: getattr(current, field) for field in NODE_LIVE_FIELDS})
+                self._register(node)
+                registered += 1
+            except Exception as e:
+                print(f"❌ Failed to register node {node.node_id}: {e}")
+        return registered
+    
+    def _register(self, node: SensorNode):
+        previous_zone = self.nodes.zone_of(node.node_id) if node.node_id in self.nodes else None
+        if previous_zone and previous_zone != node.zone_id and previous_zone in self.zones:
+            members = self.zones[previous_zone].sensor_nodes
+            if node.node_id in members:
+                members.remove(node.node_id)
+            self._risk[previous_zone].discard(node.node_id)
+            self._update_zone_stats(previous_zone)
+        
+        self.nodes.add(node)
+        if node.is_online:
+            self.heartbeats.beat(node.node_id, to_epoch(node.last_heartbeat))
+        else:
+            self.heartbeats.remove(node.node_id)
+        self.spatial_index.insert(node.node_id, node.latitude, node.longitude)
+        self._geometry.pop(node.zone_id, None)
+        if previous_zone:
+            self._geometry.pop(previous_zone, None)
+        
+        # Add node to zone
+        if node.zone_id in self.zones:
+            if previous_zone != node.zone_id:
+                self.zones[node.zone_id].sensor_nodes.append(node.node_id)
+            if node.is_online:
+                self._risk[node.zone_id].set(node.node_id, node.risk_score)
+            else:
+                self._risk[node.zone_id].discard(node.node_id)
+            self._update_zone_stats(node.zone_id)
+    
     def update_node_data(self, node_id: str, sensor_data: Dict) -> bool:
         """Update sensor data for a specific node"""
-        if node_id not in self.nodes:
+        slot = self.nodes.slots.get(node_id)
+        if slot is None:
             print(f"⚠️ Unknown node: {node_id}")
             return False
         
         try:
-            node = self.nodes[node_id]
-            node.last_heartbeat = datetime.utcnow()
-            node.is_online = True
-            node.current_temperature = sensor_data.get('temperature', 0)
-            node.current_humidity = sensor_data.get('humidity', 0)
-            node.current_smoke = sensor_data.get('smoke_level', 0)
-            node.current_rain = sensor_data.get('rain_level', 0)
-            node.risk_score = sensor_data.get('fire_risk_score', 0)
+            now = time.time()
+            self.nodes.update_reading(slot, sensor_data, now)
+            self.heartbeats.beat(node_id, now)
             
             # Update zone statistics
-            self._update_zone_stats(node.zone_id)
+            zone_id = self.nodes.zone_ids[self.nodes.zone[slot]]
+            if zone_id in self._risk:
+                self._risk[zone_id].set(node_id, self.nodes.columns['risk_score'][slot])
+            self._update_zone_stats(zone_id)
             
             return True
         except Exception as e:
             print(f"❌ Failed to update node {node_id}: {e}")
             return False
     
+    def zone_geometry(self, zone_id: str) -> ZoneGeometry:
+        """Projected node positions and pairwise distances of a zone (cached)"""
+        geometry = self._geometry.get(zone_id)
+        if geometry is None:
+            zone = self.zones[zone_id]
+            members = [nid for nid in zone.sensor_nodes if nid in self.nodes]
+            slots = self.nodes.slots_of(members)
+            geometry = self._geometry[zone_id] = ZoneGeometry(
+                members,
+                self.nodes.columns['latitude'][slots],
+                self.nodes.columns['longitude'][slots],
+                zone.latitude, zone.longitude,
+                slots=slots
+            )
+        return geometry
+    
     def _update_zone_stats(self, zone_id: str):
-        """Recalculate zone statistics based on active nodes"""
+        """Refresh zone statistics from its online nodes' running aggregates"""
         if zone_id not in self.zones:
             return
         
         zone = self.zones[zone_id]
-        zone_nodes = [self.nodes[nid] for nid in zone.sensor_nodes if nid in self.nodes]
-        
-        if not zone_nodes:
-            zone.status = ZoneStatus.OFFLINE
-            return
+        risk = self._risk[zone_id]
         
-        # Calculate average and max risk scores
-        online_nodes = [n for n in zone_nodes if n.is_online]
-        if not online_nodes:
+        if not risk:  # No nodes, or none online
             zone.status = ZoneStatus.OFFLINE
             return
         
-        risk_scores = [n.risk_score for n in online_nodes]
-        zone.average_risk_score = np.mean(risk_scores)
-        zone.max_risk_score = np.max(risk_scores)
+        zone.average_risk_score = risk.mean
+        zone.max_risk_score = risk.max
         zone.last_update = datetime.utcnow()
         
         # Determine zone status
@@ -185,6 +275,7 @@ class MultiZoneManager:
     def get_zone_heatmap_data(self) -> List[Dict]:
         """Generate heatmap data for all zones"""
         heatmap_data = []
+        online_counts = self.nodes.count_by_zone(online_only=True)
         
         for zone_id, zone in self.zones.items():
             heatmap_data.append({
@@ -197,65 +288,131 @@ class MultiZoneManager:
                 'status': zone.status.value,
                 'area': zone.area_hectares,
                 'nodes': len(zone.sensor_nodes),
-                'online_nodes': len([nid for nid in zone.sensor_nodes 
-                                    if nid in self.nodes and self.nodes[nid].is_online])
+                'online_nodes': online_counts.get(zone_id, 0)
             })
         
         return heatmap_data
     
     def get_node_positions(self) -> List[Dict]:
         """Get all sensor node positions for mapping"""
-        positions = []
-        
-        for node_id, node in self.nodes.items():
-            positions.append({
-                'node_id': node_id,
-                'name': node.name,
-                'zone_id': node.zone_id,
-                'latitude': node.latitude,
-                'longitude': node.longitude,
-                'is_online': node.is_online,
-                'risk_score': node.risk_score,
-                'temperature': node.current_temperature,
-                'humidity': node.current_humidity,
-                'smoke': node.current_smoke,
-                'battery': node.battery_level,
-                'signal': node.signal_strength
-            })
-        
-        return positions
+        registry = self.nodes
+        slots = registry.active_slots()
+        columns = {name: registry.columns[name][slots].tolist() for name in (
+            'latitude', 'longitude', 'risk_score', 'current_temperature',
+            'current_humidity', 'current_smoke'
+        )}
+        battery = registry.columns['battery_level'][slots]
+        signal = registry.columns['signal_strength'][slots]
+        battery = np.where(np.isnan(battery), None, battery).tolist()
+        signal = [None if np.isnan(v) else int(v) for v in signal.tolist()]
+        online = registry.online[slots].tolist()
+        
+        return [
+            {
+                'node_id': registry.node_ids[slot],
+                'name': registry.names[slot],
+                'zone_id': registry.zone_ids[registry.zone[slot]],
+                'latitude': columns['latitude'][i],
+                'longitude': columns['longitude'][i],
+                'is_online': online[i],
+                'risk_score': columns['risk_score'][i],
+                'temperature': columns['current_temperature'][i],
+                'humidity': columns['current_humidity'][i],
+                'smoke': columns['current_smoke'][i],
+                'battery': battery[i],
+                'signal': signal[i]
+            }
+            for i, slot in enumerate(slots.tolist())
+        ]
     
-    def get_fire_spread_prediction(self, zone_id: str) -> Dict:
+    def get_fire_spread_prediction(self, zone_id: str, wind_speed: float = 0.0,
+                                   wind_direction: Optional[float] = None,
+                                   cell_size_m: float = 10) -> Dict:
         """
-        Predict fire spread pattern based on current conditions
-        Uses simplified fire spread model
+        Predict fire spread over a raster of the zone
+        Ignites at the highest-risk nodes and propagates with local
+        temperature/humidity, wind (m/s, direction it blows from) and slope;
+        returns 15/30/60 minute isochrones and per-node arrival times
         """
         if zone_id not in self.zones:
             return {'error': 'Zone not found'}
         
         zone = self.zones[zone_id]
-        zone_nodes = [self.nodes[nid] for nid in zone.sensor_nodes 
-                     if nid in self.nodes and self.nodes[nid].is_online]
+        geometry = self.zone_geometry(zone_id)
+        columns = self.nodes.columns
+        online = self.nodes.online[geometry.slots]
+        zone_slots = geometry.slots[online]
         
-        if not zone_nodes:
+        if not len(zone_slots):
             return {'error': 'No active nodes in zone'}
         
-        # Find highest risk node (fire origin)
-        origin_node = max(zone_nodes, key=lambda n: n.risk_score)
-        
-        # Calculate wind direction (simplified - from temperature gradients)
-        avg_temp = np.mean([n.current_temperature for n in zone_nodes])
-        avg_humidity = np.mean([n.current_humidity for n in zone_nodes])
-        
-        # Spread rate (meters per minute) based on conditions
-        base_spread_rate = 0.5  # meters/min
-        temp_factor = max(0, (avg_temp - 25) / 10)  # Increases with temp
-        humidity_factor = max(0, (50 - avg_humidity) / 50)  # Increases with dryness
-        
-        spread_rate = base_spread_rate * (1 + temp_factor) * (1 + humidity_factor)
-        
-        # Predict affected area in next 30 minutes
-        spread_radius_30min = spread_rate * 30  # meters
+        xs, ys = geometry.xy[online, 0], geometry.xy[online, 1]
+        temperature = columns['current_temperature'][zone_slots]
+        humidity = columns['current_humidity'][zone_slots]
+        risk = columns['risk_score'][zone_slots]
+        
+        # Fire starts at the riskiest nodes (those close to the zone maximum)
+        order = np.argsort(-risk, kind='stable')[:MAX_IGNITION_NODES]
+        ignition = order[risk[order] >= risk[order[0]] - IGNITION_RISK_MARGIN]
+        origin_node = self.nodes.view(zone_slots[ignition[0]])
+        
+        # Raster covering the zone and all its nodes (offline ones get arrival
+        # times too), plus room for the fire to leave it within the horizon
+        all_xs, all_ys = geometry.xy[:, 0], geometry.xy[:, 1]
+        zone_radius = math.sqrt(zone.area_hectares * 10000 / math.pi)
+        max_rate = float(fire_spread.spread_rate(temperature, humidity).max())
+        margin = min(max_rate * fire_spread.wind_factor(180, wind_speed, 0) * fire_spread.HORIZON_MINUTES,
+                     MAX_SPREAD_MARGIN_M)
+        bounds = (
+            min(all_xs.min(), -zone_radius) - margin, max(all_xs.max(), zone_radius) + margin,
+            min(all_ys.min(), -zone_radius) - margin, max(all_ys.max(), zone_radius) + margin
+        )
+        grid, arrival = fire_spread.simulate_spread(
+            xs, ys, temperature, humidity, ignition, bounds,
+            cell_size_m=cell_size_m, wind_speed=wind_speed, wind_direction=wind_direction,
+            elevation=columns['elevation_m'][zone_slots]
+        )
+        
+        def arrival_at(x, y) -> np.ndarray:
+            return arrival[grid.cell_of(x, y)]
+        
+        # Every zone node, plus other zones' nodes on the raster (fire ignores borders)
+        zone_arrival = arrival_at(all_xs, all_ys)
+        arrival_times = {
+            node_id: round(float(t), 1) if np.isfinite(t) else None
+            for node_id, t in zip(geometry.node_ids, zone_arrival.tolist())
+        }
+        half_diagonal = math.hypot(bounds[1] - bounds[0], bounds[3] - bounds[2]) / 2
+        center_lat, center_lon = unproject_local((bounds[0] + bounds[1]) / 2, (bounds[2] + bounds[3]) / 2,
+                                                 *geometry.origin)
+        others = [
+            node_id for node_id, _ in self.nodes_within_radius(float(center_lat), float(center_lon), half_diagonal)
+            if self.nodes.zone_of(node_id) != zone_id
+        ]
+        other_zones = []
+        if others:
+            slots = self.nodes.slots_of(others)
+            x, y = project_local(columns['latitude'][slots], columns['longitude'][slots], *geometry.origin)
+            inside = (x >= bounds[0]) & (x <= bounds[1]) & (y >= bounds[2]) & (y <= bounds[3])
+            other_arrival = np.where(inside, arrival_at(x, y), np.inf)
+            reached = np.flatnonzero(other_arrival <= 30)
+            other_zones = [others[i] for i in reached[np.argsort(other_arrival[reached], kind='stable')]]
+        
+        reached = np.flatnonzero(online & (zone_arrival <= 30))
+        in_zone = [geometry.node_ids[i] for i in reached[np.argsort(zone_arrival[reached], kind='stable')]]
+        
+        isochrones = []
+        for contour in fire_spread.isochrones(grid, arrival):
+            rings = []
+            for x, y in contour['rings']:
+                latitudes, longitudes = unproject_local(x, y, *geometry.origin)
+                rings.append(np.column_stack([latitudes, longitudes]).round(6).tolist())
+            isochrones.append({
+                'minutes': contour['minutes'],
+                'area_hectares': round(contour['area_hectares'], 2),
+                'rings': rings  # [[latitude, longitude], ...]
+            })
+        area_30min = next(c['area_hectares'] for c in isochrones if c['minutes'] == 30)
         
         return {
             'origin_node': origin_node.node_id,
@@ -263,35 +420,47 @@ class MultiZoneManager:
                 'latitude': origin_node.latitude,
                 'longitude': origin_node.longitude
             },
-            'spread_rate_m_per_min': round(spread_rate, 2),
-            'predicted_radius_30min': round(spread_radius_30min, 2),
-            'affected_area_hectares': round((spread_radius_30min ** 2 * 3.14159) / 10000, 2),
-            'wind_direction': 'N/A',  # Can be enhanced with actual wind data
+            'ignition_nodes': [geometry.node_ids[i] for i in np.flatnonzero(online)[ignition]],
+            'spread_rate_m_per_min': round(max_rate, 2),
+            'predicted_radius_30min': round(math.sqrt(area_30min * 10000 / math.pi), 2),  # Circle of equal area
+            'affected_area_hectares': area_30min,
+            'wind_speed': wind_speed,
+            'wind_direction': 'N/A' if wind_direction is None else wind_direction,
             'confidence': 0.7,
-            'at_risk_nodes': [
-                n.node_id for n in zone_nodes 
-                if self._calculate_distance(origin_node, n) <= spread_radius_30min
-            ]
+            'grid': {
+                'rows': grid.height,
+                'cols': grid.width,
+                'cell_size_m': round(grid.cell_size, 2)
+            },
+            'isochrones': isochrones,
+            'arrival_times': arrival_times,  # Minutes; None if not reached within the horizon
+            'at_risk_nodes': in_zone,  # Reached within 30 minutes, soonest first
+            'at_risk_nodes_other_zones': other_zones
         }
     
-    def _calculate_distance(self, node1: SensorNode, node2: SensorNode) -> float:
-        """Calculate distance between two nodes in meters (Haversine formula)"""
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371000  # Earth radius in meters
-        
-        lat1, lon1 = radians(node1.latitude), radians(node1.longitude)
-        lat2, lon2 = radians(node2.latitude), radians(node2.longitude)
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return R * c
+    def nodes_within_radius(self, latitude: float, longitude: float, radius_m: float,
+                            online_only: bool = True) -> List[Tuple[str, float]]:
+        """(node_id, distance in meters) of nodes within radius_m of a point, nearest first"""
+        return [
+            (node_id, distance)
+            for node_id, distance in self.spatial_index.within_radius(latitude, longitude, radius_m)
+            if not online_only or self.nodes.is_online(node_id)
+        ]
+    
+    def nearest_nodes(self, latitude: float, longitude: float, k: int = 5,
+                      online_only: bool = True) -> List[Tuple[str, float]]:
+        """(node_id, distance in meters) of the k nodes nearest a point, from any zone"""
+        fetch = k
+        while True:
+            found = self.spatial_index.nearest(latitude, longitude, fetch)
+            matches = [(n, d) for n, d in found if not online_only or self.nodes.is_online(n)]
+            # Widen the search while offline nodes crowd out online ones
+            if len(matches) >= k or len(found) < fetch:
+                return matches[:k]
+            fetch *= 2
     
-    def coordinate_sprinkler_activation(self, zone_id: str) -> Dict:
+    def coordinate_sprinkler_activation(self, zone_id: str, wind_speed: float = 0.0,
+                                        wind_direction: Optional[float] = None) -> Dict:
         """
         Coordinate sprinkler activation across a zone
         Smart activation based on fire spread prediction
@@ -299,12 +468,15 @@ class MultiZoneManager:
         if zone_id not in self.zones:
             return {'error': 'Zone not found'}
         
-        spread_prediction = self.get_fire_spread_prediction(zone_id)
+        spread_prediction = self.get_fire_spread_prediction(zone_id, wind_speed, wind_direction)
         if 'error' in spread_prediction:
             return spread_prediction
         
-        zone = self.zones[zone_id]
+        # Already in the order the fire reaches nodes
         at_risk_nodes = spread_prediction.get('at_risk_nodes', [])
+        arrival_times = spread_prediction['arrival_times']
+        geometry = self.zone_geometry(zone_id)
+        origin_distances = geometry.row(spread_prediction['origin_node'])
         
         # Calculate optimal sprinkler deployment
         # Priority: nodes in predicted fire path
@@ -315,6 +487,8 @@ class MultiZoneManager:
             'activation_sequence': [
                 {
                     'node_id': node_id,
+                    'arrival_minutes': arrival_times[node_id],
+                    'distance_m': round(float(origin_distances[geometry.index[node_id]]), 1),
                     'priority': 1 if node_id in at_risk_nodes[:3] else 2,
                     'delay_seconds': i * 5  # Staggered activation
                 }
@@ -326,13 +500,49 @@ class MultiZoneManager:
         
         return activation_plan
     
+    def interpolate_offline_nodes(self, zone_id: str, neighbors: int = 4, power: float = 2) -> List[Dict]:
+        """
+        Estimate current readings at a zone's offline nodes by inverse
+        distance weighting of their nearest online neighbors in the zone
+        """
+        if zone_id not in self.zones:
+            return []
+        
+        geometry = self.zone_geometry(zone_id)
+        online = self.nodes.online[geometry.slots]
+        if not online.any():
+            return []
+        
+        columns = self.nodes.columns
+        values = np.column_stack([
+            columns[name][geometry.slots]
+            for name in ('current_temperature', 'current_humidity', 'current_smoke', 'risk_score')
+        ])
+        online_idx = np.flatnonzero(online)
+        
+        estimates = []
+        for i in np.flatnonzero(~online):
+            distances = geometry.row(geometry.node_ids[i])[online_idx]
+            nearest = np.argsort(distances)[:neighbors]
+            weights = 1.0 / np.maximum(distances[nearest], 1.0) ** power
+            estimate = weights @ values[online_idx[nearest]] / weights.sum()
+            estimates.append({
+                'node_id': geometry.node_ids[i],
+                'temperature': round(float(estimate[0]), 2),
+                'humidity': round(float(estimate[1]), 2),
+                'smoke': round(float(estimate[2]), 2),
+                'risk_score': round(float(estimate[3]), 2),
+                'neighbors': [geometry.node_ids[j] for j in online_idx[nearest]]
+            })
+        
+        return estimates
+    
     def get_zone_comparison(self) -> List[Dict]:
         """Compare all zones side by side"""
         comparison = []
+        online_counts = self.nodes.count_by_zone(online_only=True)
         
         for zone_id, zone in self.zones.items():
-            online_nodes = [nid for nid in zone.sensor_nodes 
-                           if nid in self.nodes and self.nodes[nid].is_online]
             
             comparison.append({
                 'zone_id': zone_id,
@@ -340,7 +550,7 @@ class MultiZoneManager:
                 'status': zone.status.value,
                 'avg_risk': round(zone.average_risk_score, 2),
                 'max_risk': round(zone.max_risk_score, 2),
-                'online_nodes': len(online_nodes),
+                'online_nodes': online_counts.get(zone_id, 0),
                 'total_nodes': len(zone.sensor_nodes),
                 'active_sprinklers': zone.active_sprinklers,
                 'area_hectares': zone.area_hectares,
@@ -352,18 +562,37 @@ class MultiZoneManager:
         
         return comparison
     
-    def detect_offline_nodes(self, timeout_minutes: int = 5) -> List[str]:
-        """Detect nodes that haven't sent data recently"""
-        offline_threshold = datetime.utcnow() - timedelta(minutes=timeout_minutes)
-        offline_nodes = []
-        
-        for node_id, node in self.nodes.items():
-            if node.last_heartbeat < offline_threshold:
-                node.is_online = False
-                offline_nodes.append(node_id)
-        
-        return offline_nodes
+    @property
+    def online_count(self) -> int:
+        """Nodes currently online (maintained by the heartbeat tracker)"""
+        return self.heartbeats.online_count
+    
+    def get_offline_nodes(self) -> List[str]:
+        """IDs of registered nodes currently offline"""
+        registry = self.nodes
+        return [registry.node_ids[slot] for slot in np.flatnonzero(registry.used & ~registry.online).tolist()]
+    
+    def subscribe_offline(self, listener):
+        """Call listener(node_id, zone_id, last_heartbeat) when a node goes offline"""
+        self.offline_listeners.append(listener)
+    
+    def _on_node_offline(self, node_id: str, last_heartbeat: float):
+        """Heartbeat deadline passed: mark the node offline and update its zone"""
+        slot = self.nodes.slots.get(node_id)
+        if slot is None:
+            return
+        self.nodes.online[slot] = False
+        zone_id = self.nodes.zone_ids[self.nodes.zone[slot]]
+        if zone_id in self._risk:
+            self._risk[zone_id].discard(node_id)
+            self._update_zone_stats(zone_id)
+        
+        for listener in self.offline_listeners:
+            try:
+                listener(node_id, zone_id, from_epoch(last_heartbeat))
+            except Exception as e:
+                print(f"⚠️ Offline listener failed for {node_id}: {e}")
 
 
 # Global multi-zone manager instance
-zone_manager = MultiZoneManager()
+zone_manager = MultiZoneManager(offline_timeout_seconds=settings.node_offline_timeout_seconds)
@@ -0,0 +1,152 @@
+"""
+Sensor Node Registry
+Struct-of-arrays store for sensor node state: one NumPy column per field,
+indexed by an integer slot per node
+"""
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+from metric_buffer import to_epoch, from_epoch
+
+
+# Reading key (as sent by ingestion) -> column
+READING_COLUMNS = {
+    'temperature': 'current_temperature',
+    'humidity': 'current_humidity',
+    'smoke_level': 'current_smoke',
+    'rain_level': 'current_rain',
+    'fire_risk_score': 'risk_score'
+}
+FLOAT_COLUMNS = (
+    'latitude', 'longitude', 'current_temperature', 'current_humidity', 'current_smoke',
+    'current_rain', 'risk_score', 'battery_level', 'signal_strength', 'elevation_m', 'last_heartbeat'
+)
+OPTIONAL_COLUMNS = ('battery_level', 'signal_strength', 'elevation_m')  # NaN when unknown
+
+
+class NodeRegistry:
+    """
+    Node state held column-wise so a reading is a handful of array stores
+    and fleet-wide questions (who is online, who went silent, how many
+    nodes per zone) are vectorized scans
+
+    Reads like a read-only mapping of node_id -> node model; models are
+    built from the columns on access and are snapshots, so changes go
+    through the registry (or the manager), never through a view.
+    """
+
+    def __init__(self, model, capacity: int = 1024):
+        self.model = model  # Pydantic model the views are built as
+        self.capacity = capacity
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(capacity) for name in FLOAT_COLUMNS}
+        self.online = np.zeros(capacity, dtype=bool)
+        self.used = np.zeros(capacity, dtype=bool)
+        self.zone = np.full(capacity, -1, dtype=np.int32)  # Index into zone_ids
+        self.slots: Dict[str, int] = {}
+        self.node_ids: List[str] = []
+        self.names: List[str] = []
+        self.zone_ids: List[str] = []
+        self.zone_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.slots
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.slots)
+
+    def __getitem__(self, node_id: str):
+        return self.view(self.slots[node_id])
+
+    def get(self, node_id: str, default=None):
+        slot = self.slots.get(node_id)
+        return default if slot is None else self.view(slot)
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        for node_id, slot in list(self.slots.items()):
+            yield node_id, self.view(slot)
+
+    def values(self) -> Iterator[object]:
+        for _, node in self.items():
+            yield node
+
+    def zone_slot(self, zone_id: str) -> int:
+        index = self.zone_index.get(zone_id)
+        if index is None:
+            index = self.zone_index[zone_id] = len(self.zone_ids)
+            self.zone_ids.append(zone_id)
+        return index
+
+    def zone_of(self, node_id: str) -> str:
+        return self.zone_ids[self.zone[self.slots[node_id]]]
+
+    def is_online(self, node_id: str) -> bool:
+        return bool(self.online[self.slots[node_id]])
+
+    def _grow(self):
+        extra = self.capacity
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate([column, np.zeros(extra)])
+        self.online = np.concatenate([self.online, np.zeros(extra, dtype=bool)])
+        self.used = np.concatenate([self.used, np.zeros(extra, dtype=bool)])
+        self.zone = np.concatenate([self.zone, np.full(extra, -1, dtype=np.int32)])
+        self.capacity += extra
+
+    def add(self, node) -> int:
+        """Store a node model (replacing the node's previous state); returns its slot"""
+        slot = self.slots.get(node.node_id)
+        if slot is None:
+            slot = len(self.node_ids)
+            if slot >= self.capacity:
+                self._grow()
+            self.node_ids.append(node.node_id)
+            self.names.append("")
+            self.slots[node.node_id] = slot
+
+        self.names[slot] = node.name
+        self.used[slot] = True
+        self.online[slot] = node.is_online
+        self.zone[slot] = self.zone_slot(node.zone_id)
+        for name in FLOAT_COLUMNS:
+            value = getattr(node, name)
+            if name == 'last_heartbeat':
+                value = to_epoch(value)
+            self.columns[name][slot] = np.nan if value is None else value
+        return slot
+
+    def update_reading(self, slot: int, data: Dict, t: float):
+        """Store a reading's values at a slot and mark the node heard from at t"""
+        columns = self.columns
+        for key, name in READING_COLUMNS.items():
+            columns[name][slot] = data.get(key, 0)
+        columns['last_heartbeat'][slot] = t
+        self.online[slot] = True
+
+    def view(self, slot: int):
+        """Node model of a slot"""
+        fields = {name: float(self.columns[name][slot]) for name in FLOAT_COLUMNS}
+        for name in OPTIONAL_COLUMNS:
+            if np.isnan(fields[name]):
+                fields[name] = None
+        if fields['signal_strength'] is not None:
+            fields['signal_strength'] = int(fields['signal_strength'])
+        fields['last_heartbeat'] = from_epoch(fields['last_heartbeat'])
+        return self.model(
+            node_id=self.node_ids[slot],
+            zone_id=self.zone_ids[self.zone[slot]],
+            name=self.names[slot],
+            is_online=bool(self.online[slot]),
+            **fields
+        )
+
+    def active_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.used)
+
+    def slots_of(self, node_ids: List[str]) -> np.ndarray:
+        return np.fromiter((self.slots[n] for n in node_ids), dtype=np.intp, count=len(node_ids))
+
+    def count_by_zone(self, online_only: bool = False) -> Dict[str, int]:
+        mask = self.used & self.online if online_only else self.used
+        counts = np.bincount(self.zone[mask], minlength=len(self.zone_ids))
+        return dict(zip(self.zone_ids, counts.tolist()))
@@ -0,0 +1,147 @@
+"""
+Online Incremental Risk Learner
+Recursive least squares with exponential forgetting, updated per reading,
+running alongside the batch RandomForest to track diurnal/seasonal drift
+"""
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class OnlineRiskLearner:
+    """
+    Linear risk-score model updated one reading at a time
+
+    Inputs are the predictor's feature rows, standardized with running
+    (Welford) statistics and extended with a bias and hour-of-day sin/cos
+    terms so the linear model can follow the daily cycle. Weights are
+    fitted by recursive least squares with forgetting factor `forgetting`,
+    which keeps an effective memory of 1 / (1 - forgetting) readings.
+    Each update is a handful of small vector operations (microseconds).
+    """
+
+    def __init__(self, n_features: int, hour_index: Optional[int] = None,
+                 forgetting: float = 0.999, initial_covariance: float = 100.0):
+        self.n_features = n_features
+        self.hour_index = hour_index
+        self.forgetting = forgetting
+        self.initial_covariance = initial_covariance
+        self.reset()
+
+    def reset(self):
+        """Forget everything learned so far"""
+        n_inputs = self.n_features + 3  # bias, sin(hour), cos(hour)
+        self.weights = np.zeros(n_inputs)
+        self.covariance = np.eye(n_inputs) * self.initial_covariance
+        self.feature_mean = np.zeros(self.n_features)
+        self.feature_m2 = np.zeros(self.n_features)
+        self.n_updates = 0
+        self.ewm_abs_error = None
+        self.updated_at: Optional[datetime] = None
+
+    def _inputs(self, x: np.ndarray) -> np.ndarray:
+        """Standardized features plus bias and diurnal terms"""
+        std = np.sqrt(self.feature_m2 / self.n_updates) if self.n_updates > 1 else np.ones(self.n_features)
+        scaled = (x - self.feature_mean) / np.where(std > 0, std, 1.0)
+
+        if self.hour_index is not None:
+            angle = 2 * np.pi * x[self.hour_index] / 24
+            cyclic = (np.sin(angle), np.cos(angle))
+        else:
+            cyclic = (0.0, 0.0)
+        return np.concatenate((scaled, (1.0,), cyclic))
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> "OnlineRiskLearner":
+        """Update the model with rows of features X and risk scores y, in order"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+
+        for x, target in zip(X, y):
+            # Running feature statistics
+            self.n_updates += 1
+            delta = x - self.feature_mean
+            self.feature_mean += delta / self.n_updates
+            self.feature_m2 += delta * (x - self.feature_mean)
+
+            inputs = self._inputs(x)
+            error = target - self.weights @ inputs
+
+            # RLS gain and covariance update
+            p_x = self.covariance @ inputs
+            gain = p_x / (self.forgetting + inputs @ p_x)
+            self.weights += gain * error
+            self.covariance = (self.covariance - np.outer(gain, p_x)) / self.forgetting
+
+            # Forgetting inflates covariance along unexcited directions; cap it
+            if np.trace(self.covariance) > 1e6:
+                self.covariance *= 1e6 / np.trace(self.covariance)
+
+            abs_error = abs(error)
+            self.ewm_abs_error = abs_error if self.ewm_abs_error is None \
+                else 0.99 * self.ewm_abs_error + 0.01 * abs_error
+
+        self.updated_at = datetime.utcnow()
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Risk score for each feature row"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        return np.array([self.weights @ self._inputs(x) for x in X])
+
+    @property
+    def is_ready(self) -> bool:
+        """Enough updates for predictions to be meaningful"""
+        return self.n_updates >= 100
+
+    def get_state(self) -> Dict:
+        """Serializable model state"""
+        return {
+            'weights': self.weights.tolist(),
+            'covariance': self.covariance.tolist(),
+            'feature_mean': self.feature_mean.tolist(),
+            'feature_m2': self.feature_m2.tolist(),
+            'n_updates': self.n_updates,
+            'ewm_abs_error': self.ewm_abs_error,
+            'updated_at': self.updated_at
+        }
+
+    def set_state(self, state: Dict):
+        """Restore state written by get_state"""
+        if len(state['feature_mean']) != self.n_features:
+            return
+        self.weights = np.array(state['weights'])
+        self.covariance = np.array(state['covariance'])
+        self.feature_mean = np.array(state['feature_mean'])
+        self.feature_m2 = np.array(state['feature_m2'])
+        self.n_updates = state['n_updates']
+        self.ewm_abs_error = state.get('ewm_abs_error')
+        self.updated_at = state.get('updated_at')
+
+    def get_info(self) -> Dict:
+        """Status summary for the API"""
+        return {
+            'updates': self.n_updates,
+            'ready': self.is_ready,
+            'recent_mae': self.ewm_abs_error,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'effective_memory_readings': int(round(1 / (1 - self.forgetting)))
+        }
+
+
+async def save_online_state(db, learner: OnlineRiskLearner):
+    """Persist learner state so other processes can serve it"""
+    await db.ml_online_model.replace_one(
+        {"_id": "risk_score"}, {"_id": "risk_score", **learner.get_state()}, upsert=True
+    )
+
+
+async def load_online_state(db, learner: OnlineRiskLearner) -> bool:
+    """Load persisted state if it is newer than the learner's own"""
+    state = await db.ml_online_model.find_one({"_id": "risk_score"})
+    if not state:
+        return False
+    if learner.updated_at and state.get('updated_at') and state['updated_at'] <= learner.updated_at:
+        return False
+
+    learner.set_state(state)
+    return True
@@ -0,0 +1,249 @@
+"""
+Incremental Pattern Engine
+Fire risk patterns declared as specs (metric windows and thresholds) and
+tracked per node by state machines that advance with every reading,
+emitting start and end events as patterns appear and clear
+"""
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from metric_buffer import from_epoch
+from diurnal_baseline import DiurnalBaseline
+
+
+class PatternCondition(BaseModel):
+    name: str  # Value name available to the description template
+    metric: str
+    stat: str  # mean, change, value or ratio
+    op: str  # > or <
+    threshold: float
+    window_seconds: float = 3600  # Window averaged by mean and change
+    baseline_seconds: float = 0  # Window before it, compared by change and ratio
+    min_coverage_seconds: float = 0  # Data span required before the condition can hold
+
+
+class PatternSpec(BaseModel):
+    pattern_type: str
+    description: str  # Formatted with the conditions' values by name
+    severity: str
+    confidence: float
+    conditions: List[PatternCondition]
+    hours_utc: Optional[Tuple[int, int]] = None  # Only between these hours (inclusive)
+    # Or only in the node's `peak_hours_count` highest hours of this metric's
+    # diurnal baseline, once it covers the whole day (hours_utc until then)
+    peak_hours_metric: Optional[str] = None
+    peak_hours_count: int = 5
+    enabled: bool = True
+
+
+class PatternEvent(BaseModel):
+    node_id: str
+    pattern_type: str
+    event: str  # start, end
+    severity: str
+    confidence: float
+    description: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    timestamp: datetime
+
+
+DEFAULT_PATTERNS = [
+    PatternSpec(
+        pattern_type="extreme_dryness",
+        description="Sustained high temperature with low humidity",
+        severity="high",
+        confidence=0.9,
+        conditions=[
+            PatternCondition(name="temperature", metric="temperature", stat="mean", op=">",
+                             threshold=35, window_seconds=3600, min_coverage_seconds=1800),
+            PatternCondition(name="humidity", metric="humidity", stat="mean", op="<",
+                             threshold=30, window_seconds=3600)
+        ]
+    ),
+    PatternSpec(
+        pattern_type="rapid_heating",
+        description="Temperature increased by {temp_increase:.1f}°C in 30 minutes",
+        severity="medium",
+        confidence=0.85,
+        conditions=[
+            PatternCondition(name="temp_increase", metric="temperature", stat="change", op=">",
+                             threshold=5, window_seconds=1800, baseline_seconds=1800,
+                             min_coverage_seconds=1800)
+        ]
+    ),
+    PatternSpec(
+        pattern_type="smoke_spike",
+        description="Sudden smoke increase: {smoke:.0f} (baseline: {smoke_ratio_baseline:.0f})",
+        severity="critical",
+        confidence=0.95,
+        conditions=[
+            PatternCondition(name="smoke", metric="smoke_level", stat="value", op=">", threshold=1500,
+                             window_seconds=0),
+            PatternCondition(name="smoke_ratio", metric="smoke_level", stat="ratio", op=">",
+                             threshold=2, window_seconds=600, baseline_seconds=3000,
+                             min_coverage_seconds=600)
+        ]
+    ),
+    PatternSpec(
+        pattern_type="peak_heat_hours",
+        description="High risk during peak heat hours",
+        severity="medium",
+        confidence=0.8,
+        hours_utc=(12, 16),
+        peak_hours_metric="temperature",
+        conditions=[
+            PatternCondition(name="temperature", metric="temperature", stat="mean", op=">",
+                             threshold=33, window_seconds=3600)
+        ]
+    )
+]
+
+
+class SplitWindow:
+    """
+    Running sums over a recent window and the baseline window before it
+    Points move from recent to baseline as they age and are dropped after
+    both spans; each point is touched a constant number of times
+    """
+
+    def __init__(self, window_seconds: float, baseline_seconds: float = 0):
+        self.window_seconds = window_seconds
+        self.baseline_seconds = baseline_seconds
+        self.recent: deque = deque()
+        self.baseline: deque = deque()
+        self.recent_sum = 0.0
+        self.baseline_sum = 0.0
+        self.last_value = 0.0
+
+    def add(self, t: float, value: float):
+        self.recent.append((t, value))
+        self.recent_sum += value
+        self.last_value = value
+
+        while self.recent[0][0] < t - self.window_seconds:
+            point = self.recent.popleft()
+            self.recent_sum -= point[1]
+            if self.baseline_seconds:
+                self.baseline.append(point)
+                self.baseline_sum += point[1]
+        while self.baseline and self.baseline[0][0] < t - self.window_seconds - self.baseline_seconds:
+            self.baseline_sum -= self.baseline.popleft()[1]
+
+        # Restart the sums whenever the window is down to this point, bounding drift
+        if not self.baseline and len(self.recent) == 1:
+            self.recent_sum, self.baseline_sum = value, 0.0
+
+    @property
+    def coverage(self) -> float:
+        """Time span of the points held"""
+        first = self.baseline[0][0] if self.baseline else self.recent[0][0]
+        return self.recent[-1][0] - first
+
+    @property
+    def recent_mean(self) -> float:
+        return self.recent_sum / len(self.recent)
+
+    @property
+    def baseline_mean(self) -> Optional[float]:
+        return self.baseline_sum / len(self.baseline) if self.baseline else None
+
+
+def _window_key(condition: PatternCondition) -> Tuple[str, float, float]:
+    return condition.metric, condition.window_seconds, condition.baseline_seconds
+
+
+class NodePatterns:
+    """
+    Pattern state machines of one node: the windows its specs need and
+    the patterns currently active (start event emitted, end not yet)
+    """
+
+    def __init__(self):
+        self.windows: Dict[Tuple[str, float, float], SplitWindow] = {}
+        self.active: Dict[str, PatternEvent] = {}  # pattern_type -> start event
+        self.last_t: Optional[float] = None
+
+    def _evaluate(self, condition: PatternCondition, values: Dict[str, float]) -> bool:
+        window = self.windows.get(_window_key(condition))
+        if window is None or not window.recent or window.coverage < condition.min_coverage_seconds:
+            return False
+
+        if condition.stat == 'mean':
+            value = window.recent_mean
+        elif condition.stat == 'change':
+            baseline = window.baseline_mean
+            value = window.recent_mean - baseline if baseline is not None else 0.0
+        elif condition.stat == 'value':
+            value = window.last_value
+        elif condition.stat == 'ratio':
+            baseline = window.baseline_mean or 0.0
+            values[f"{condition.name}_baseline"] = baseline
+            value = window.last_value / baseline if baseline > 0 else \
+                (float('inf') if window.last_value > 0 else 0.0)
+        else:
+            return False
+
+        values[condition.name] = window.last_value if condition.stat == 'ratio' else value
+        return value > condition.threshold if condition.op == '>' else value < condition.threshold
+
+    def _in_hours(self, spec: PatternSpec, t: float, hour: int,
+                  baselines: Dict[str, DiurnalBaseline]) -> bool:
+        baseline = baselines.get(spec.peak_hours_metric) if spec.peak_hours_metric else None
+        if baseline is not None:
+            peak = baseline.is_peak_hour(t, spec.peak_hours_count)
+            if peak is not None:
+                return peak
+        return spec.hours_utc is None or spec.hours_utc[0] <= hour <= spec.hours_utc[1]
+
+    def update(self, node_id: str, t: float, data: Dict, specs: List[PatternSpec],
+               baselines: Optional[Dict[str, DiurnalBaseline]] = None) -> List[PatternEvent]:
+        """Advance every window and state machine with a reading; returns transitions"""
+        if self.last_t is not None and t < self.last_t:
+            t = self.last_t  # Keep windows in time order
+        self.last_t = t
+
+        for spec in specs:
+            for condition in spec.conditions:
+                key = _window_key(condition)
+                if key not in self.windows:
+                    self.windows[key] = SplitWindow(condition.window_seconds, condition.baseline_seconds)
+        for (metric, _, _), window in self.windows.items():
+            value = data.get(metric)
+            if isinstance(value, (int, float)):
+                window.add(t, value)
+
+        events = []
+        hour = from_epoch(t).hour
+        for spec in specs:
+            if not spec.enabled:
+                continue
+            values: Dict[str, float] = {}
+            in_hours = self._in_hours(spec, t, hour, baselines or {})
+            matched = in_hours and all(self._evaluate(c, values) for c in spec.conditions)
+            started = self.active.get(spec.pattern_type)
+
+            if matched and started is None:
+                try:
+                    description = spec.description.format(**values)
+                except (KeyError, ValueError):
+                    description = spec.description
+                event = PatternEvent(
+                    node_id=node_id,
+                    pattern_type=spec.pattern_type,
+                    event="start",
+                    severity=spec.severity,
+                    confidence=spec.confidence,
+                    description=description,
+                    start_time=from_epoch(t),
+                    timestamp=from_epoch(t)
+                )
+                self.active[spec.pattern_type] = event
+                events.append(event)
+            elif not matched and started is not None:
+                del self.active[spec.pattern_type]
+                events.append(started.copy(update={
+                    'event': "end", 'end_time': from_epoch(t), 'timestamp': from_epoch(t)
+                }))
+        return events
@@ -0,0 +1,180 @@
+"""
+Streaming Quantile Sketches
+Mergeable t-digests for percentiles and percentile ranks without keeping
+or sorting raw data
+"""
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+
+class TDigest:
+    """
+    Merging t-digest (arcsine scale function)
+
+    Values are buffered (in an array allocated on demand and released by
+    each fold) and folded into weighted centroids in a single vectorized
+    pass, giving at most compression / 2 + 1 centroids with fine
+    resolution at the tails. Quantile and rank queries are binary
+    searches over the centroids. Digests merge by folding their centroids
+    together, so per-node digests combine into zone or fleet percentiles.
+    """
+
+    def __init__(self, compression: float = 200, buffer_size: int = 500):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer: Optional[np.ndarray] = None
+        self._buffered = 0
+        self._cumulative: Optional[np.ndarray] = None  # Centroid centers in cumulative weight
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value: float):
+        if self._buffer is None:
+            self._buffer = np.empty(self.buffer_size)
+        self._buffer[self._buffered] = value
+        self._buffered += 1
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self._buffered >= self.buffer_size:
+            self._compress()
+        else:
+            self._cumulative = None
+
+    def _compress(self, means: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None):
+        """Fold buffered values (and optional extra centroids) into the centroids"""
+        parts_m, parts_w = [self.means], [self.weights]
+        if self._buffered:
+            parts_m.append(self._buffer[:self._buffered])
+            parts_w.append(np.ones(self._buffered))
+        self._buffer, self._buffered = None, 0
+        if means is not None:
+            parts_m.append(means)
+            parts_w.append(weights)
+
+        m, w = np.concatenate(parts_m), np.concatenate(parts_w)
+        if len(m):
+            order = np.argsort(m, kind='mergesort')
+            m, w = m[order], w[order]
+
+            # Points whose left cumulative quantile falls in the same unit of
+            # k-space share a centroid
+            total = w.sum()
+            q_left = (np.cumsum(w) - w) / total
+            k = self.compression / (2 * np.pi) * np.arcsin(2 * q_left - 1)
+            groups = np.floor(k - k[0]).astype(np.int64)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(groups)) + 1))
+
+            w_merged = np.add.reduceat(w, starts)
+            m = np.add.reduceat(m * w, starts) / w_merged
+            w = w_merged
+
+        self.means, self.weights = m, w
+        self._cumulative = np.cumsum(w) - w / 2
+
+    def _ensure_compressed(self):
+        if self._buffered or self._cumulative is None:
+            self._compress()
+
+    @property
+    def max_bytes(self) -> int:
+        """Upper bound of the centroid and buffer arrays"""
+        return (int(self.compression // 2) + 1) * 16 + self.buffer_size * 8
+
+    def merge(self, other: "TDigest"):
+        """Fold another digest into this one"""
+        if not other.count:
+            return
+        other._ensure_compressed()
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(other.means, other.weights)
+
+    @classmethod
+    def merged(cls, digests: Iterable["TDigest"], compression: float = 200) -> "TDigest":
+        """New digest combining several (e.g. every node in a zone)"""
+        result = cls(compression)
+        for digest in digests:
+            result.merge(digest)
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value below which a fraction q of the data lies"""
+        if not self.count:
+            return None
+        self._ensure_compressed()
+        total = self.weights.sum()
+        xp = np.concatenate(([0.0], self._cumulative, [total]))
+        fp = np.concatenate(([self.min], self.means, [self.max]))
+        return float(np.interp(q * total, xp, fp))
+
+    def rank(self, value: float) -> Optional[float]:
+        """Fraction of the data at or below value"""
+        if not self.count:
+            return None
+        if value >= self.max:
+            return 1.0
+        if value < self.min:
+            return 0.0
+        self._ensure_compressed()
+        total = self.weights.sum()
+        xp = np.concatenate(([self.min], self.means, [self.max]))
+        fp = np.concatenate(([0.0], self._cumulative, [total]))
+        return float(np.interp(value, xp, fp) / total)
+
+
+class WindowedDigest:
+    """
+    One t-digest per time bucket over a fixed horizon
+    A window query merges the buckets it covers (bucket resolution);
+    merges are cached until the next value arrives. A bucket is folded
+    into its centroids once a newer one starts, so only the newest holds
+    a value buffer.
+    """
+
+    def __init__(self, bucket_seconds: float = 3600, num_buckets: int = 168, compression: float = 200):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.compression = compression
+        self.buckets: Dict[int, TDigest] = {}
+        self._merged_cache: Dict[int, TDigest] = {}
+
+    def add(self, t: float, value: float):
+        bucket_id = int(t // self.bucket_seconds)
+        digest = self.buckets.get(bucket_id)
+        if digest is None:
+            if self.buckets:
+                self.buckets[max(self.buckets)]._ensure_compressed()
+            digest = self.buckets[bucket_id] = TDigest(self.compression)
+            for old_id in [b for b in self.buckets if b <= bucket_id - self.num_buckets]:
+                del self.buckets[old_id]
+        digest.add(value)
+        self._merged_cache = {}
+
+    @property
+    def max_bytes(self) -> int:
+        """Upper bound of the buckets' arrays (only the newest has a buffer)"""
+        bound = TDigest(self.compression)
+        return self.num_buckets * (bound.max_bytes - bound.buffer_size * 8) + bound.buffer_size * 8
+
+    def digest(self, window_seconds: float) -> TDigest:
+        """Merged digest of the buckets within window_seconds of the newest one"""
+        span = max(1, min(self.num_buckets, int(np.ceil(window_seconds / self.bucket_seconds))))
+        if span not in self._merged_cache:
+            newest = max(self.buckets) if self.buckets else 0
+            self._merged_cache[span] = TDigest.merged(
+                (d for b, d in self.buckets.items() if b > newest - span), self.compression
+            )
+        return self._merged_cache[span]
+
+    def quantile(self, q: float, window_seconds: float) -> Optional[float]:
+        return self.digest(window_seconds).quantile(q)
+
+    def rank(self, value: float, window_seconds: float) -> Optional[float]:
+        return self.digest(window_seconds).rank(value)
@@ -0,0 +1,182 @@
+"""
+Multi-Resolution Rollups
+Downsampled min/max/mean/count/sum-of-squares buckets at 1 min, 15 min,
+1 h and 1 day, maintained incrementally for long-range analytics
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+# (bucket seconds, buckets retained): 6 hours, 7 days, 30 days, 1 year
+ROLLUP_TIERS = [(60, 360), (900, 672), (3600, 720), (86400, 366)]
+
+
+class RollupTier:
+    """
+    Fixed ring of time buckets at one resolution, shared by the metrics
+    of a node: one bucket time axis, with (count, sum, sum_sq) and
+    (min, -max) per bucket and metric column, 32 bytes per bucket and
+    metric, so a reading updates a bucket in two vector operations
+    A bucket's slot is its id modulo the ring size; a newer bucket
+    landing on a slot replaces the expired one for every metric
+    """
+
+    def __init__(self, resolution_seconds: int, num_buckets: int):
+        self.resolution_seconds = resolution_seconds
+        self.num_buckets = num_buckets
+        self.bucket_id = np.full(num_buckets, -1, dtype=np.int64)
+        self.sums = np.zeros((num_buckets, 3, 0))  # count, sum, sum of squares
+        self.extremes = np.zeros((num_buckets, 2, 0), dtype=np.float32)  # min, -max
+        self.first_bucket: Optional[int] = None
+        self.newest_bucket: Optional[int] = None
+
+    def add_column(self):
+        """Room for one more metric (rare: a node's metrics are fixed)"""
+        self.sums = np.concatenate([self.sums, np.zeros((self.num_buckets, 3, 1))], axis=2)
+        self.extremes = np.concatenate(
+            [self.extremes, np.full((self.num_buckets, 2, 1), np.inf, dtype=np.float32)], axis=2
+        )
+
+    def add(self, t: float, increment: np.ndarray, extremes: np.ndarray):
+        """
+        Add one reading: increment is (present, value, value²) and
+        extremes (value, -value) per metric column, 0 and NaN where missing
+        """
+        bucket = int(t // self.resolution_seconds)
+        slot = bucket % self.num_buckets
+
+        if self.bucket_id[slot] != bucket:
+            if self.bucket_id[slot] > bucket:
+                return  # Older than the retained history
+            self.bucket_id[slot] = bucket
+            self.sums[slot] = 0.0
+            self.extremes[slot] = np.inf
+            if self.first_bucket is None:
+                self.first_bucket = bucket
+            if self.newest_bucket is None or bucket > self.newest_bucket:
+                self.newest_bucket = bucket
+
+        self.sums[slot] += increment
+        np.fmin(self.extremes[slot], extremes, out=self.extremes[slot], casting='same_kind')
+
+    @property
+    def nbytes(self) -> int:
+        return self.bucket_id.nbytes + self.sums.nbytes + self.extremes.nbytes
+
+    def covers(self, start: float) -> bool:
+        """Whether every bucket from `start` onwards is still retained"""
+        if self.newest_bucket is None:
+            return True
+        oldest_retained = self.newest_bucket - self.num_buckets + 1
+        return self.first_bucket >= oldest_retained or start // self.resolution_seconds >= oldest_retained
+
+    def _mask(self, column: int, start: float, end: float) -> np.ndarray:
+        lo = int(start // self.resolution_seconds)
+        hi = int(end // self.resolution_seconds)
+        if self.newest_bucket is not None:
+            lo = max(lo, self.newest_bucket - self.num_buckets + 1)
+        return (self.bucket_id >= lo) & (self.bucket_id <= hi) & (self.sums[:, 0, column] > 0)
+
+    def aggregate(self, column: int, start: float, end: float) -> Dict:
+        """count, mean, std, min and max of a metric column over the buckets overlapping [start, end]"""
+        mask = self._mask(column, start, end)
+        count, total, total_sq = self.sums[mask, :, column].sum(axis=0)
+        if not count:
+            return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+
+        mean = total / count
+        variance = max(0.0, total_sq / count - mean ** 2)
+        low, negated_high = self.extremes[mask, :, column].min(axis=0)
+        return {
+            'count': int(count),
+            'mean': float(mean),
+            'std': float(np.sqrt(variance)),
+            'min': float(low),
+            'max': float(-negated_high)
+        }
+
+    def series(self, column: int, start: float, end: float) -> Dict[str, np.ndarray]:
+        """Per-bucket arrays (bucket start time, count, mean, min, max) of a metric column, oldest first"""
+        mask = self._mask(column, start, end)
+        order = np.argsort(self.bucket_id[mask])
+        sums = self.sums[mask, :, column][order]
+        extremes = self.extremes[mask, :, column][order].astype(np.float64)
+        return {
+            'timestamp': self.bucket_id[mask][order].astype(np.float64) * self.resolution_seconds,
+            'count': sums[:, 0].astype(np.int64),
+            'mean': sums[:, 1] / np.maximum(sums[:, 0], 1),
+            'min': extremes[:, 0],
+            'max': -extremes[:, 1]
+        }
+
+
+def combine_aggregates(aggregates: List[Dict]) -> Dict:
+    """Pool aggregate dicts (count/mean/std/min/max) from several series"""
+    aggregates = [a for a in aggregates if a.get('count')]
+    count = sum(a['count'] for a in aggregates)
+    if not count:
+        return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+
+    total = sum(a['count'] * a['mean'] for a in aggregates)
+    total_sq = sum(a['count'] * (a['std'] ** 2 + a['mean'] ** 2) for a in aggregates)
+    mean = total / count
+    combined = {
+        'count': count,
+        'mean': mean,
+        'std': float(np.sqrt(max(0.0, total_sq / count - mean ** 2))),
+        'min': min(a['min'] for a in aggregates),
+        'max': max(a['max'] for a in aggregates)
+    }
+    if 'resolution_seconds' in aggregates[0]:
+        combined['resolution_seconds'] = max(a['resolution_seconds'] for a in aggregates)
+    return combined
+
+
+class RollupPyramid:
+    """
+    All rollup tiers of a node's metrics, updated together on every reading
+    Queries use the coarsest tier that meets the requested resolution
+    and still retains the requested range
+    """
+
+    def __init__(self, tiers: List[Tuple[int, int]] = ROLLUP_TIERS):
+        self.tiers = [RollupTier(resolution, buckets) for resolution, buckets in tiers]
+        self.columns: Dict[str, int] = {}  # Metric -> column in every tier
+
+    def add_metric(self, metric: str):
+        if metric not in self.columns:
+            self.columns[metric] = len(self.columns)
+            for tier in self.tiers:
+                tier.add_column()
+
+    def add(self, t: float, values: Dict[str, float]):
+        n = len(self.columns)
+        present, filled, squared = [0.0] * n, [0.0] * n, [0.0] * n
+        low, negated_high = [np.nan] * n, [np.nan] * n
+        for metric, value in values.items():
+            i = self.columns[metric]
+            present[i], filled[i], squared[i] = 1.0, value, value * value
+            low[i], negated_high[i] = value, -value
+        increment = np.array([present, filled, squared])
+        extremes = np.array([low, negated_high])
+        for tier in self.tiers:
+            tier.add(t, increment, extremes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(tier.nbytes for tier in self.tiers)
+
+    def tier_for(self, start: float, resolution_seconds: float) -> RollupTier:
+        """Coarsest tier no coarser than resolution_seconds that covers start"""
+        covering = [tier for tier in self.tiers if tier.covers(start)]
+        if not covering:
+            return self.tiers[-1]
+        fine_enough = [tier for tier in covering if tier.resolution_seconds <= resolution_seconds]
+        return fine_enough[-1] if fine_enough else covering[0]
+
+    def aggregate(self, metric: str, start: float, end: float, resolution_seconds: float = 3600) -> Dict:
+        tier = self.tier_for(start, resolution_seconds)
+        return {**tier.aggregate(self.columns[metric], start, end), 'resolution_seconds': tier.resolution_seconds}
+
+    def series(self, metric: str, start: float, end: float, resolution_seconds: float) -> Dict[str, np.ndarray]:
+        return self.tier_for(start, resolution_seconds).series(self.columns[metric], start, end)
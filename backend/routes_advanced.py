@@ -2,25 +2,45 @@
 Advanced Features API Routes
 Exposes ML predictions, multi-zone management, analytics, and more
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import List, Optional
 from datetime import datetime, timedelta
+from pydantic import BaseModel
 import numpy as np
 import random
 
-from ml_predictor import predictor
+from ml_predictor import predictor, PREDICTION_MODES, ROLLING_WINDOW
+from training_sampler import training_sampler, train_predictor_from_database, refresh_online_model
 from multi_zone_manager import zone_manager, SensorNode, ZoneStatus
 from external_integrator import external_integrator
 from analytics_engine import analytics_engine
+from pattern_engine import PatternSpec
+from analytics_loader import analytics_warm_start
+from zone_store import save_nodes, parse_node_rows, parse_node_csv
 from smart_alerts import alert_system, AlertPriority
 from database import get_database
+from models import DEFAULT_NODE_ID
 from auth import get_current_user
 
 router = APIRouter()
 
 
+class BatchPredictionRequest(BaseModel):
+    node_ids: Optional[List[str]] = None  # Explicit nodes to predict
+    zone_id: Optional[str] = None  # Or every node in a zone
+    hours_ahead: int = 6
+
+
 # ============= Helper Functions =============
 
+def _node_filter(node_ids: List[str]) -> dict:
+    """sensor_data match for nodes, counting readings without a node_id as the default node's"""
+    query = {"node_id": {"$in": node_ids}}
+    if DEFAULT_NODE_ID in node_ids:
+        query = {"$or": [query, {"node_id": {"$exists": False}}]}
+    return query
+
+
 def generate_mock_predictions(hours_ahead: int = 6):
     """
     Generate realistic mock predictions for demo purposes
@@ -70,15 +90,21 @@ def generate_mock_predictions(hours_ahead: int = 6):
 @router.get("/api/predictions/fire-risk")
 async def get_fire_risk_prediction(
     hours_ahead: int = 6,
+    mode: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get ML-based fire risk predictions for next N hours
     Uses trained ML model if available, otherwise returns mock predictions
+    mode selects the batch model, the online model or a blend of both
     """
+    if mode and mode not in PREDICTION_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(PREDICTION_MODES)}")
+    
     try:
         # Get recent sensor history from database
         db = get_database()
+        await refresh_online_model(db)
         sensor_history = await db.sensor_data.find().sort("timestamp", -1).limit(500).to_list(500)
         
         if not sensor_history:
@@ -87,7 +113,7 @@ async def get_fire_risk_prediction(
         
         print(f"📊 Found {len(sensor_history)} sensor readings for prediction")
         
-        # Convert to list of dicts
+        # Convert to list of dicts, oldest first as the model was trained
         history = [
             {
                 'temperature': s.get('temperature', 0),
@@ -96,11 +122,11 @@ async def get_fire_risk_prediction(
                 'rain_level': s.get('rain_level', 0),
                 'timestamp': s.get('timestamp')
             }
-            for s in sensor_history
+            for s in reversed(sensor_history)
         ]
         
         # Get predictions from ML model
-        predictions = predictor.predict(history, hours_ahead)
+        predictions = predictor.predict(history, hours_ahead, mode)
         
         # If model not trained, return mock predictions
         if 'error' in predictions:
@@ -126,6 +152,101 @@ async def get_fire_risk_prediction(
         return generate_mock_predictions(hours_ahead)
 
 
+@router.post("/api/predictions/fire-risk/batch")
+async def get_batch_fire_risk_predictions(
+    request: BatchPredictionRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get ML fire risk predictions for many nodes at once
+    Features for all nodes are scored in one model invocation; a node's
+    result is cached until its next reading arrives
+    """
+    if request.node_ids:
+        node_ids = list(dict.fromkeys(request.node_ids))
+    elif request.zone_id:
+        if request.zone_id not in zone_manager.zones:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        node_ids = list(zone_manager.zones[request.zone_id].sensor_nodes)
+    else:
+        node_ids = list(zone_manager.nodes)
+    
+    if not predictor.is_trained:
+        return {
+            'predictions': {},
+            'missing_nodes': node_ids,
+            'error': 'Model not trained yet. Please train the model first.'
+        }
+    
+    try:
+        db = get_database()
+        await refresh_online_model(db)
+        
+        # Newest reading per node (index-backed via node_id + timestamp);
+        # readings stored before node_id existed belong to the default node
+        latest = await db.sensor_data.aggregate([
+            {"$match": _node_filter(node_ids)},
+            {"$sort": {"node_id": 1, "timestamp": -1}},
+            {"$group": {"_id": "$node_id", "timestamp": {"$first": "$timestamp"}}}
+        ]).to_list(None)
+        latest_readings = {}
+        for doc in latest:
+            node_id = doc['_id'] or DEFAULT_NODE_ID
+            latest_readings[node_id] = max(doc['timestamp'], latest_readings.get(node_id, doc['timestamp']))
+        
+        scores = predictor.get_cached_node_scores(latest_readings)
+        cached_nodes = len(scores)
+        stale = [n for n in latest_readings if n not in scores]
+        
+        if stale:
+            # Last hour of readings for every stale node in one round trip,
+            # each node bounded by its own cutoff and capped at the window size
+            window = []
+            for node_id in stale:
+                since = {"$gte": latest_readings[node_id] - timedelta(hours=1)}
+                window.append({"node_id": node_id, "timestamp": since})
+                if node_id == DEFAULT_NODE_ID:
+                    window.append({"node_id": {"$exists": False}, "timestamp": since})
+            windows = await db.sensor_data.aggregate([
+                {"$match": {"$or": window}},
+                {"$sort": {"timestamp": -1}},
+                {"$group": {"_id": "$node_id", "readings": {"$push": {
+                    "temperature": "$temperature",
+                    "humidity": "$humidity",
+                    "smoke_level": "$smoke_level",
+                    "rain_level": "$rain_level",
+                    "timestamp": "$timestamp"
+                }}}},
+                {"$project": {"readings": {"$slice": ["$readings", ROLLING_WINDOW]}}}
+            ]).to_list(None)
+            
+            histories = {}
+            for doc in windows:
+                histories.setdefault(doc['_id'] or DEFAULT_NODE_ID, []).extend(doc['readings'])
+            for readings in histories.values():
+                readings.sort(key=lambda r: r['timestamp'])
+            
+            scores.update(predictor.score_node_batch({
+                node_id: readings[-ROLLING_WINDOW:] for node_id, readings in histories.items()
+            }))
+        
+        return {
+            'predictions': {
+                node_id: predictor.build_horizon_predictions(score, request.hours_ahead)
+                for node_id, score in scores.items()
+            },
+            'missing_nodes': [n for n in node_ids if n not in scores],
+            'cached_nodes': cached_nodes,
+            'computed_nodes': len(scores) - cached_nodes,
+            'model_version': predictor.get_model_info()['model_version'],
+            'prediction_mode': predictor.effective_prediction_mode(),
+            'features_used': predictor.feature_columns
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/api/ml/train")
 async def train_ml_model(current_user: dict = Depends(get_current_user)):
     """
@@ -136,36 +257,18 @@ async def train_ml_model(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        db = await get_database()
+        db = get_database()
         
-        # Get historical sensor data
-        sensor_data = await db.sensor_data.find().sort("timestamp", -1).limit(10000).to_list(10000)
+        # Train model (balanced reservoir, or latest readings as fallback)
+        success, sample_count = await train_predictor_from_database(db)
         
-        if len(sensor_data) < 100:
+        if sample_count < 100:
             return {"error": "Insufficient training data. Need at least 100 samples."}
         
-        # Prepare training data
-        sensor_history = [
-            {
-                'temperature': s.get('temperature', 0),
-                'humidity': s.get('humidity', 0),
-                'smoke_level': s.get('smoke_level', 0),
-                'rain_level': s.get('rain_level', 0),
-                'timestamp': s.get('timestamp')
-            }
-            for s in sensor_data
-        ]
-        
-        risk_scores = [s.get('fire_risk_score', 0) for s in sensor_data]
-        risk_levels = [s.get('risk_level', 'low') for s in sensor_data]
-        
-        # Train model
-        success = predictor.train(sensor_history, risk_scores, risk_levels)
-        
         if success:
             return {
                 "message": "Model trained successfully",
-                "training_samples": len(sensor_data),
+                "training_samples": sample_count,
                 "model_version": "1.0"
             }
         else:
@@ -175,22 +278,55 @@ async def train_ml_model(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/ml/reservoir/rebuild")
+async def rebuild_training_reservoir(current_user: dict = Depends(get_current_user)):
+    """
+    Rebuild the stratified training reservoir from full sensor history
+    Requires admin role
+    """
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        sizes = await training_sampler.rebuild_from_history(get_database())
+        return {
+            "message": "Training reservoir rebuilt",
+            "samples_per_level": sizes,
+            "capacity_per_level": training_sampler.capacity_per_level
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/ml/status")
 async def get_ml_status(current_user: dict = Depends(get_current_user)):
     """Get ML model training status and info"""
     try:
         db = get_database()
         sensor_count = await db.sensor_data.count_documents({})
+        await refresh_online_model(db)
+        
+        # Served from the metadata sidecar, so this never loads the model
+        model_info = predictor.get_model_info()
         
         return {
-            "is_trained": predictor.is_trained,
+            "is_trained": model_info['is_trained'],
+            "model_loaded": model_info['model_loaded'],
             "model_path": str(predictor.model_path),
             "model_exists": predictor.model_path.exists(),
+            "model_version": model_info['model_version'],
+            "trained_at": model_info['trained_at'],
+            "training_stats": model_info['training_stats'],
+            "model_params": model_info['model_params'],
+            "prediction_mode": model_info['prediction_mode'],
+            "online_blend_weight": model_info['online_blend_weight'],
+            "online_model": model_info['online_model'],
             "available_data": sensor_count,
             "required_data": 100,
             "can_train": sensor_count >= 100,
-            "features": predictor.feature_columns,
-            "status": "ready" if predictor.is_trained else "not_trained"
+            "features": model_info['features'],
+            "status": "ready" if model_info['is_trained'] else "not_trained"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -254,16 +390,47 @@ async def get_zone_comparison(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _zone_wind(zone_id: str):
+    """(speed m/s, direction it blows from in degrees) at a zone's center"""
+    zone = zone_manager.zones.get(zone_id)
+    if zone is None:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    try:
+        weather = await external_integrator.get_weather_data(zone.latitude, zone.longitude)
+        return weather.wind_speed, weather.wind_direction
+    except Exception as e:
+        print(f"⚠️ Weather unavailable for {zone_id}, assuming still air: {e}")
+        return 0.0, None
+
+
 @router.get("/api/zones/{zone_id}/fire-spread")
 async def get_fire_spread_prediction(
     zone_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get fire spread prediction for a specific zone"""
+    """Get fire spread prediction for a specific zone under the current wind"""
     try:
-        prediction = zone_manager.get_fire_spread_prediction(zone_id)
+        wind_speed, wind_direction = await _zone_wind(zone_id)
+        prediction = zone_manager.get_fire_spread_prediction(zone_id, wind_speed, wind_direction)
         return prediction
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/zones/{zone_id}/interpolated")
+async def get_interpolated_readings(
+    zone_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Estimated readings at a zone's offline nodes from their online neighbors"""
+    if zone_id not in zone_manager.zones:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    try:
+        return {"zone_id": zone_id, "estimates": zone_manager.interpolate_offline_nodes(zone_id)}
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -275,7 +442,8 @@ async def activate_zone_sprinklers(
 ):
     """Activate sprinklers in a specific zone with smart coordination"""
     try:
-        activation_plan = zone_manager.coordinate_sprinkler_activation(zone_id)
+        wind_speed, wind_direction = await _zone_wind(zone_id)
+        activation_plan = zone_manager.coordinate_sprinkler_activation(zone_id, wind_speed, wind_direction)
         
         if 'error' in activation_plan:
             raise HTTPException(status_code=404, detail=activation_plan['error'])
@@ -285,6 +453,8 @@ async def activate_zone_sprinklers(
             "plan": activation_plan
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -300,6 +470,40 @@ async def get_all_nodes(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/nodes/nearby")
+async def get_nearby_nodes(
+    latitude: float,
+    longitude: float,
+    radius_m: Optional[float] = None,
+    k: int = 5,
+    online_only: bool = True,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Sensor nodes near a point, from any zone
+    Every node within radius_m if given, otherwise the k nearest
+    """
+    try:
+        if radius_m is not None:
+            found = zone_manager.nodes_within_radius(latitude, longitude, radius_m, online_only)
+        else:
+            found = zone_manager.nearest_nodes(latitude, longitude, k, online_only)
+        
+        return {
+            "nodes": [
+                {
+                    "node_id": node_id,
+                    "zone_id": zone_manager.nodes.zone_of(node_id),
+                    "distance_m": round(distance, 1)
+                }
+                for node_id, distance in found
+            ]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/api/nodes/register")
 async def register_sensor_node(
     node_data: dict,
@@ -313,9 +517,11 @@ async def register_sensor_node(
             name=node_data['name'],
             latitude=node_data['latitude'],
             longitude=node_data['longitude'],
+            elevation_m=node_data.get('elevation_m'),
             last_heartbeat=datetime.utcnow()
         )
         
+        await save_nodes(get_database(), [node])
         success = zone_manager.register_node(node)
         
         if success:
@@ -327,6 +533,52 @@ async def register_sensor_node(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/nodes/bulk-register")
+async def bulk_register_sensor_nodes(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Register many sensor nodes at once (admin only)
+    Body is a CSV with a header row (Content-Type: text/csv), or JSON: a
+    list of nodes or {"nodes": [...]}. Columns/fields: node_id, zone_id,
+    name, latitude, longitude, and optionally battery_level, signal_strength
+    and elevation_m.
+    All rows are validated first; nothing is written if any is invalid.
+    """
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        if 'csv' in request.headers.get('content-type', ''):
+            rows = parse_node_csv((await request.body()).decode('utf-8'))
+        else:
+            payload = await request.json()
+            rows = payload.get('nodes', []) if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("expected a list of node objects")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse nodes: {e}")
+    
+    nodes, errors = parse_node_rows(rows, zone_manager.zones)
+    if errors:
+        raise HTTPException(status_code=400, detail={"invalid_rows": len(errors), "errors": errors[:50]})
+    if not nodes:
+        raise HTTPException(status_code=400, detail="No nodes given")
+    
+    try:
+        written = await save_nodes(get_database(), nodes)
+        registered = zone_manager.register_nodes(nodes)
+        return {
+            "message": f"Registered {registered} nodes",
+            "written": written,
+            "registered": registered
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============= External Data Integration =============
 
 @router.get("/api/weather/current")
@@ -421,14 +673,31 @@ async def get_enhanced_risk_analysis(current_user: dict = Depends(get_current_us
 
 # ============= Advanced Analytics =============
 
+def _analytics_scope(node_id: Optional[str], zone_id: Optional[str]) -> Optional[List[str]]:
+    """
+    Nodes an analytics query covers: one node, a zone's nodes, or
+    None for the whole fleet
+    """
+    if node_id:
+        return [node_id]
+    if zone_id:
+        if zone_id not in zone_manager.zones:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        return list(zone_manager.zones[zone_id].sensor_nodes)
+    return None
+
+
 @router.get("/api/analytics/trends")
 async def get_trend_analysis(
     metric: str = "temperature",
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get trend analysis for a specific metric"""
+    """Get trend analysis for a specific metric (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
     try:
-        trend = analytics_engine.analyze_trends(metric)
+        trend = analytics_engine.analyze_trends(metric, node_ids=node_ids)
         
         if trend:
             return trend.dict()
@@ -440,21 +709,79 @@ async def get_trend_analysis(
 
 
 @router.get("/api/analytics/patterns")
-async def get_pattern_detection(current_user: dict = Depends(get_current_user)):
-    """Detect fire risk patterns in current data"""
+async def get_pattern_detection(
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Detect fire risk patterns in current data (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
     try:
-        patterns = analytics_engine.detect_patterns()
+        patterns = analytics_engine.detect_patterns(node_ids=node_ids)
         return {"patterns": [p.dict() for p in patterns]}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/analytics/pattern-events")
+async def get_pattern_events(
+    limit: int = 50,
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Recent pattern start and end events, newest first (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
+    try:
+        events = analytics_engine.get_pattern_events(node_ids=node_ids, limit=limit)
+        return {"events": [e.dict() for e in events], "total": len(events)}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/analytics/pattern-specs")
+async def get_pattern_specs(current_user: dict = Depends(get_current_user)):
+    """Pattern definitions evaluated on every reading"""
+    return {"specs": [spec.dict() for spec in analytics_engine.pattern_specs]}
+
+
+@router.put("/api/analytics/pattern-specs")
+async def update_pattern_specs(
+    specs: List[PatternSpec],
+    current_user: dict = Depends(get_current_user)
+):
+    """Replace the pattern definitions (admin only); pattern state restarts"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    for spec in specs:
+        for condition in spec.conditions:
+            if condition.stat not in ('mean', 'change', 'value', 'ratio') or condition.op not in ('>', '<'):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid condition '{condition.name}' in pattern '{spec.pattern_type}'"
+                )
+    
+    try:
+        analytics_engine.set_pattern_specs(specs)
+        return {"message": "Pattern specs updated", "total": len(specs)}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/analytics/insights")
-async def get_analytics_insights(current_user: dict = Depends(get_current_user)):
-    """Get comprehensive analytics insights"""
+async def get_analytics_insights(
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get comprehensive analytics insights (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
     try:
-        insights = analytics_engine.generate_insights()
+        insights = analytics_engine.generate_insights(node_ids=node_ids)
         return insights
     
     except Exception as e:
@@ -462,30 +789,126 @@ async def get_analytics_insights(current_user: dict = Depends(get_current_user))
 
 
 @router.get("/api/analytics/forecast")
-async def get_risk_forecast(current_user: dict = Depends(get_current_user)):
-    """Get fire risk forecast for next 24 hours"""
+async def get_risk_forecast(
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get fire risk forecast for next 24 hours (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
     try:
-        insights = analytics_engine.generate_insights()
+        insights = analytics_engine.generate_insights(node_ids=node_ids)
         return insights.get('risk_forecast', {})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/analytics/anomalies")
+async def get_analytics_anomalies(
+    limit: int = 50,
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Recent streaming anomaly events, newest first (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
+    try:
+        anomalies = analytics_engine.get_anomalies(node_ids=node_ids, limit=limit)
+        return {"anomalies": [a.dict() for a in anomalies], "total": len(anomalies)}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/analytics/historical-comparison")
 async def get_historical_comparison(
     days_back: int = 7,
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Compare current conditions with historical data"""
+    """Compare current conditions with historical data (node, zone or fleet)"""
+    node_ids = _analytics_scope(node_id, zone_id)
     try:
-        comparison = analytics_engine.get_historical_comparison(days_back)
+        comparison = analytics_engine.get_historical_comparison(days_back, node_ids=node_ids)
         return comparison
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/analytics/rollup")
+async def get_analytics_rollup(
+    metric: str = "temperature",
+    days_back: float = 30,
+    resolution_minutes: int = 60,
+    node_id: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Downsampled history of a metric (count/mean/min/max per bucket)
+    Served from the coarsest rollup tier that meets the resolution
+    """
+    node_ids = _analytics_scope(node_id, zone_id)
+    try:
+        start = datetime.utcnow() - timedelta(days=days_back)
+        resolution_seconds = resolution_minutes * 60
+        return {
+            "metric": metric,
+            "summary": analytics_engine.aggregate(
+                metric, start, resolution_seconds=resolution_seconds, node_ids=node_ids
+            ),
+            "buckets": analytics_engine.downsample(
+                metric, start, resolution_seconds=resolution_seconds, node_ids=node_ids
+            )
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/analytics/partitions")
+async def get_analytics_partitions(current_user: dict = Depends(get_current_user)):
+    """Nodes currently held in the analytics engine"""
+    try:
+        partitions = analytics_engine.get_partition_summary()
+        return {"partitions": partitions, "total": len(partitions)}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/analytics/warm-start")
+async def get_analytics_warm_start(current_user: dict = Depends(get_current_user)):
+    """Progress of the startup load of analytics history"""
+    return analytics_warm_start.get_progress()
+
+
+@router.post("/api/analytics/snapshot")
+async def save_analytics_snapshot(current_user: dict = Depends(get_current_user)):
+    """Save the analytics engine to its snapshot file for faster restarts (admin only)"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not analytics_warm_start.snapshot_path:
+        raise HTTPException(status_code=400, detail="Analytics snapshots are disabled")
+    if analytics_engine.bulk_loading:
+        raise HTTPException(status_code=409, detail="Analytics warm start still running")
+    
+    try:
+        size = analytics_warm_start.save()
+        return {
+            "message": "Analytics snapshot saved",
+            "path": analytics_warm_start.snapshot_path,
+            "size_bytes": size
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============= Smart Alerts =============
 
 @router.get("/api/alerts/active")
@@ -556,7 +979,8 @@ async def get_alert_statistics(current_user: dict = Depends(get_current_user)):
 async def get_system_health(current_user: dict = Depends(get_current_user)):
     """Get overall system health status"""
     try:
-        offline_nodes = zone_manager.detect_offline_nodes(timeout_minutes=5)
+        total_nodes = len(zone_manager.nodes)
+        online_nodes = zone_manager.online_count
         active_alerts = alert_system.get_active_alerts()
         critical_alerts = [a for a in active_alerts if a.priority == AlertPriority.CRITICAL]
         
@@ -568,9 +992,9 @@ async def get_system_health(current_user: dict = Depends(get_current_user)):
                 "ml_model": "trained" if predictor.is_trained else "not_trained",
                 "zones": len(zone_manager.zones),
                 "sensor_nodes": {
-                    "total": len(zone_manager.nodes),
-                    "online": len(zone_manager.nodes) - len(offline_nodes),
-                    "offline": len(offline_nodes)
+                    "total": total_nodes,
+                    "online": online_nodes,
+                    "offline": total_nodes - online_nodes
                 },
                 "alerts": {
                     "active": len(active_alerts),
@@ -582,7 +1006,7 @@ async def get_system_health(current_user: dict = Depends(get_current_user)):
         # Determine overall status
         if critical_alerts:
             health_status["status"] = "critical"
-        elif len(offline_nodes) > len(zone_manager.nodes) / 2:
+        elif total_nodes - online_nodes > total_nodes / 2:
             health_status["status"] = "degraded"
         elif not predictor.is_trained:
             health_status["status"] = "warning"
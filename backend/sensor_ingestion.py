@@ -15,8 +15,10 @@ from database import get_database, connect_to_mongo
 from models import SensorData, Alert, AlertStatus, RiskLevel, SprinklerStatus
 from ai_agent import fire_risk_agent
 from analytics_engine import analytics_engine
+from analytics_loader import maybe_save_baselines
 from smart_alerts import alert_system
 from multi_zone_manager import zone_manager
+from training_sampler import ingest_labelled_reading
 from bson import ObjectId
 
 
@@ -79,6 +81,11 @@ class SensorDataIngestion:
             analysis_dict["sensor_data_id"] = sensor_id
             await self.db.risk_analysis.insert_one(analysis_dict)
             
+            # Feed the labelled reading to the training reservoir and online model
+            await ingest_labelled_reading(
+                self.db, sensor_dict, analysis.risk_score, analysis.risk_level.value
+            )
+            
             # === NEW: Add to analytics engine ===
             analytics_engine.add_data_point(
                 sensor_data.timestamp,
@@ -88,13 +95,13 @@ class SensorDataIngestion:
                     'smoke_level': sensor_data.smoke_level,
                     'rain_level': sensor_data.rain_level,
                     'fire_risk_score': analysis.risk_score
-                }
+                },
+                node_id=sensor_data.node_id
             )
+            await maybe_save_baselines(self.db)
             
             # === NEW: Update multi-zone manager ===
-            # Assuming we're using a default node for now
-            node_id = "NODE_001"
-            zone_manager.update_node_data(node_id, {
+            zone_manager.update_node_data(sensor_data.node_id, {
                 'temperature': sensor_data.temperature,
                 'humidity': sensor_data.humidity,
                 'smoke_level': sensor_data.smoke_level,
@@ -147,6 +147,14 @@ class SmartAlertSystem:
                          NotificationChannel.DASHBOARD],
                 cooldown_minutes=0  # Always alert
             ),
+            AlertRule(
+                rule_id="metric_anomaly",
+                name="Sensor Reading Anomaly",
+                condition="anomaly_score >= 4",
+                priority=AlertPriority.MEDIUM,
+                channels=[NotificationChannel.DASHBOARD],
+                cooldown_minutes=10  # Per node and metric
+            ),
             AlertRule(
                 rule_id="nearby_fire_hotspot",
                 name="Nearby Fire Hotspot Detected",
@@ -211,6 +219,7 @@ class SmartAlertSystem:
                 'node_offline': data.get('node_offline', False),
                 'sprinkler_status': data.get('sprinkler_status', 'off'),
                 'hotspot_distance': data.get('hotspot_distance', 999),
+                'anomaly_score': data.get('anomaly_score', 0),
             }
             
             # Safely evaluate
@@ -269,12 +278,18 @@ class SmartAlertSystem:
                              f"+{data.get('temp_change_rate', 0):.1f}°C in recent period. "
                              f"Current: {data.get('temperature', 0):.1f}°C",
             
-            "sensor_offline": f"Sensor node '{data.get('node_id', 'Unknown')}' is offline. "
+            "sensor_offline": f"Sensor node '{data.get('node_id', 'Unknown')}' is offline"
+                            f"{' in zone ' + data['zone_id'] if data.get('zone_id') else ''}. "
                             f"Last seen: {data.get('last_heartbeat', 'Unknown')}",
             
             "sprinkler_activated": f"Sprinkler system ACTIVATED in zone {data.get('zone_id', 'Unknown')}. "
                                  f"Reason: {data.get('activation_reason', 'Automatic fire suppression')}",
             
+            "metric_anomaly": f"Unusual {data.get('metric', 'reading')} on node "
+                            f"'{data.get('node_id', 'Unknown')}': {data.get('value', 0):.1f} "
+                            f"(expected ~{data.get('expected', 0):.1f}, score {data.get('anomaly_score', 0):.1f}, "
+                            f"detectors: {', '.join(data.get('detectors', []))})",
+            
             "nearby_fire_hotspot": f"SATELLITE FIRE HOTSPOT DETECTED {data.get('hotspot_distance', 0):.1f}km away! "
                                  f"Confidence: {data.get('hotspot_confidence', 0)}%. "
                                  f"Increase monitoring immediately!"
@@ -530,6 +545,71 @@ class SmartAlertSystem:
             print(f"🚨 SIREN ACTIVATED: {alert.title}")
             # In production, control GPIO pin or send command to hardware
     
+    def publish_anomaly(self, event) -> Optional[AlertMessage]:
+        """
+        Raise an alert for a streaming anomaly event (analytics_engine.AnomalyEvent)
+        Called synchronously from ingestion; notifications are sent in the
+        background when an event loop is running
+        """
+        data = {
+            'node_id': event.node_id,
+            'metric': event.metric,
+            'value': event.value,
+            'expected': event.expected,
+            'anomaly_score': abs(event.score),
+            'detectors': event.detectors,
+            'direction': event.direction,
+            'timestamp': event.timestamp.isoformat()
+        }
+        # Cooldown per node and metric so one noisy sensor can't mute the rest
+        return self._publish("metric_anomaly", data, "anomaly_detector",
+                             f"metric_anomaly:{event.node_id}:{event.metric}")
+    
+    def publish_node_offline(self, node_id: str, zone_id: str, last_heartbeat: datetime) -> Optional[AlertMessage]:
+        """Raise an alert for a node whose heartbeat deadline passed (synchronous, like publish_anomaly)"""
+        data = {
+            'node_id': node_id,
+            'zone_id': zone_id,
+            'node_offline': True,
+            'last_heartbeat': last_heartbeat.isoformat()
+        }
+        return self._publish("sensor_offline", data, "heartbeat_tracker", f"sensor_offline:{node_id}")
+    
+    def _publish(self, rule_id: str, data: Dict, source: str, cooldown_key: str) -> Optional[AlertMessage]:
+        """Create and dispatch an alert for an event if its rule holds and is out of cooldown"""
+        rule = next((r for r in self.alert_rules if r.rule_id == rule_id), None)
+        if rule is None or not rule.enabled:
+            return None
+        if not self._evaluate_condition(rule.condition, data):
+            return None
+        
+        last = self.last_alert_time.get(cooldown_key)
+        if last and (datetime.utcnow() - last).total_seconds() < rule.cooldown_minutes * 60:
+            return None
+        self.last_alert_time[cooldown_key] = datetime.utcnow()
+        
+        import uuid
+        alert = AlertMessage(
+            alert_id=f"ALERT-{uuid.uuid4().hex[:8]}",
+            title=rule.name,
+            message=self._generate_alert_message(rule, data),
+            priority=rule.priority,
+            source=source,
+            data=data,
+            channels=rule.channels,
+            timestamp=datetime.utcnow()
+        )
+        self.active_alerts[alert.alert_id] = alert
+        self.alert_history.append(alert)
+        print(f"⚠️ {alert.message}")
+        
+        try:
+            asyncio.get_running_loop().create_task(self._send_notifications(alert))
+        except RuntimeError:
+            pass  # No event loop (e.g. offline replay); the alert is still recorded
+        
+        return alert
+    
     def acknowledge_alert(self, alert_id: str, acknowledged_by: str) -> bool:
         """Acknowledge an active alert"""
         if alert_id in self.active_alerts:
@@ -0,0 +1,142 @@
+"""
+Spatial Node Index
+Uniform lat/lon grid over sensor node positions for radius and
+k-nearest-neighbor queries across zone boundaries
+"""
+import heapq
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+from geo import METERS_PER_DEGREE, haversine_m
+
+
+class NodeSpatialIndex:
+    """
+    Grid of equal-angle cells (like a fixed-precision geohash) mapping
+    each cell to the nodes inside it
+
+    Inserts, moves and removals are O(1). A radius query visits only the
+    cells overlapping the circle's bounding box and checks exact distances
+    on their nodes; a k-nearest query searches outward ring by ring and
+    stops once no unvisited cell can hold a closer node.
+    """
+
+    def __init__(self, cell_size_m: float = 1000):
+        self.cell_deg = cell_size_m / METERS_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self.bounds: Optional[List[int]] = None  # Occupied rows/cols seen: [row_lo, row_hi, col_lo, col_hi]
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return int(np.floor(latitude / self.cell_deg)), int(np.floor(longitude / self.cell_deg))
+
+    def insert(self, node_id: str, latitude: float, longitude: float):
+        """Add a node, or move it if already indexed"""
+        if node_id in self.positions:
+            self.remove(node_id)
+        self.positions[node_id] = (latitude, longitude)
+        row, col = self._cell(latitude, longitude)
+        self.cells.setdefault((row, col), set()).add(node_id)
+        if self.bounds is None:
+            self.bounds = [row, row, col, col]
+        else:
+            b = self.bounds
+            b[0], b[1], b[2], b[3] = min(b[0], row), max(b[1], row), min(b[2], col), max(b[3], col)
+
+    def remove(self, node_id: str):
+        position = self.positions.pop(node_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(node_id)
+            if not members:
+                del self.cells[cell]
+
+    def _distances(self, node_ids: List[str], latitude: float, longitude: float) -> np.ndarray:
+        coords = np.array([self.positions[n] for n in node_ids], dtype=np.float64).reshape(-1, 2)
+        return haversine_m(latitude, longitude, coords[:, 0], coords[:, 1])
+
+    def within_radius(self, latitude: float, longitude: float, radius_m: float) -> List[Tuple[str, float]]:
+        """(node_id, distance_m) of nodes within radius_m, nearest first"""
+        dlat = radius_m / METERS_PER_DEGREE
+        # Widest longitude span of the circle is at its poleward edge
+        edge_lat = min(89.9, abs(latitude) + dlat)
+        dlon = dlat / max(np.cos(np.radians(edge_lat)), 1e-6)
+
+        row_lo, col_lo = self._cell(latitude - dlat, longitude - dlon)
+        row_hi, col_hi = self._cell(latitude + dlat, longitude + dlon)
+
+        candidates = []
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self.cells):
+            # Circle covers more cells than are occupied; walk the occupied ones
+            for (row, col), members in self.cells.items():
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi:
+                    candidates.extend(members)
+        else:
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    candidates.extend(self.cells.get((row, col), ()))
+        if not candidates:
+            return []
+
+        distances = self._distances(candidates, latitude, longitude)
+        inside = np.flatnonzero(distances <= radius_m)
+        inside = inside[np.argsort(distances[inside], kind='stable')]
+        return [(candidates[i], float(distances[i])) for i in inside]
+
+    def nearest(self, latitude: float, longitude: float, k: int,
+                exclude: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """(node_id, distance_m) of the k nearest nodes, nearest first"""
+        if k <= 0 or not self.positions:
+            return []
+        exclude = exclude or set()
+        row0, col0 = self._cell(latitude, longitude)
+
+        # Smallest ground distance a cell step can cover near the query
+        # (longitude cells shrink towards the poles); bounds ring distances
+        step_m = self.cell_deg * METERS_PER_DEGREE * \
+            max(np.cos(np.radians(min(89.9, abs(latitude) + self.cell_deg))), 1e-6)
+        row_lo, row_hi, col_lo, col_hi = self.bounds
+        # Rings before the occupied area can't hold nodes; rings past it are never needed
+        first_ring = max(0, row_lo - row0, row0 - row_hi, col_lo - col0, col0 - col_hi)
+        max_ring = max(abs(row0 - row_lo), abs(row0 - row_hi), abs(col0 - col_lo), abs(col0 - col_hi))
+
+        best: List[Tuple[float, str]] = []  # Max-heap of the k best as (-distance, node_id)
+
+        def offer(candidates: List[str]):
+            distances = self._distances(candidates, latitude, longitude)
+            if len(candidates) > k:
+                keep = np.argpartition(distances, k)[:k]
+                candidates, distances = [candidates[i] for i in keep], distances[keep]
+            for node_id, distance in zip(candidates, distances):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, node_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, node_id))
+
+        for ring in range(first_ring, max_ring + 1):
+            if len(best) == k and (ring - 1) * step_m > -best[0][0]:
+                break
+            if 8 * ring > len(self.cells):
+                # Sparse fleet: the ring has more cells than are occupied, so
+                # check every node at once
+                best.clear()
+                offer([n for n in self.positions if n not in exclude])
+                break
+
+            candidates = []
+            for row in range(max(row0 - ring, row_lo), min(row0 + ring, row_hi) + 1):
+                if abs(row - row0) == ring:
+                    cols_in_ring = range(max(col0 - ring, col_lo), min(col0 + ring, col_hi) + 1)
+                else:
+                    cols_in_ring = (col0 - ring, col0 + ring) if ring else (col0,)
+                for col in cols_in_ring:
+                    candidates.extend(n for n in self.cells.get((row, col), ()) if n not in exclude)
+            if candidates:
+                offer(candidates)
+
+        return [(node_id, float(-d)) for d, node_id in sorted(best, reverse=True)]
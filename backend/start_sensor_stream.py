@@ -13,6 +13,7 @@ from config import settings
 from database import get_database, connect_to_mongo, close_mongo_connection
 from models import SensorData, RiskLevel
 from ai_agent import fire_risk_agent
+from training_sampler import ingest_labelled_reading
 
 
 class SensorStreamer:
@@ -138,6 +139,11 @@ class SensorStreamer:
                     'recommendations': []
                 })
             
+            # Feed the labelled reading to the training reservoir and online model
+            await ingest_labelled_reading(
+                self.db, sensor_dict, analysis.risk_score, analysis.risk_level.value
+            )
+            
             # Prepare broadcast message
             broadcast_data = {
                 "type": "sensor_update",
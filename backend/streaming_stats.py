@@ -0,0 +1,198 @@
+"""
+Streaming Window Statistics
+Constant-time mean, standard deviation and linear trend over sliding
+time windows of a metric's ring buffer
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from metric_buffer import MetricRingBuffer
+from quantile_sketch import WindowedDigest
+from rollups import RollupPyramid
+
+
+# Window name -> span in seconds; longer ranges come from the rollups
+WINDOW_SPANS = {'24h': 86400}
+QUANTILE_HORIZON_SECONDS = 7 * 86400  # Percentile windows reach back this far
+QUANTILE_BUCKET_SECONDS = 6 * 3600  # ...in steps of this
+
+
+class WindowStats:
+    """
+    Running sums (n, Σx, Σy, Σxy, Σx², Σy²) over one sliding window
+
+    x is minutes since `origin`, so slopes are per minute (per reading
+    at the nominal 1 min cadence). Points are added as they arrive and
+    subtracted as they leave the window.
+    """
+
+    def __init__(self, span_seconds: float):
+        self.span_seconds = span_seconds
+        self.origin = None
+        self.removals = 0  # Since the last exact recompute
+        self.n = 0
+        self.sx = self.sy = self.sxy = self.sxx = self.syy = 0.0
+
+    def add(self, t: float, y: float):
+        if self.origin is None:
+            self.origin = t
+        x = (t - self.origin) / 60
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxy += x * y
+        self.sxx += x * x
+        self.syy += y * y
+
+    def remove(self, t: float, y: float):
+        x = (t - self.origin) / 60
+        self.n -= 1
+        self.sx -= x
+        self.sy -= y
+        self.sxy -= x * y
+        self.sxx -= x * x
+        self.syy -= y * y
+        self.removals += 1
+
+    def recompute(self, timestamps: np.ndarray, values: np.ndarray):
+        """Exact sums from the window's points, discarding accumulated rounding error"""
+        self.origin = float(timestamps[0]) if len(timestamps) else None
+        x = (timestamps - self.origin) / 60 if len(timestamps) else timestamps
+        self.n = len(values)
+        self.sx = float(np.sum(x))
+        self.sy = float(np.sum(values))
+        self.sxy = float(np.dot(x, values))
+        self.sxx = float(np.dot(x, x))
+        self.syy = float(np.dot(values, values))
+        self.removals = 0
+
+    @property
+    def mean(self) -> float:
+        return self.sy / self.n if self.n else 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation"""
+        if not self.n:
+            return 0.0
+        return float(np.sqrt(max(0.0, self.syy / self.n - self.mean ** 2)))
+
+    def regression(self) -> Tuple[float, float]:
+        """Least-squares (slope per minute, intercept at origin)"""
+        denominator = self.n * self.sxx - self.sx ** 2
+        if self.n < 2 or denominator <= 0:
+            return 0.0, self.mean
+        slope = (self.n * self.sxy - self.sx * self.sy) / denominator
+        return slope, (self.sy - slope * self.sx) / self.n
+
+    def predict(self, t: float) -> float:
+        """Trend-line value at epoch time t"""
+        slope, intercept = self.regression()
+        return intercept + slope * (t - (self.origin or t)) / 60
+
+    @classmethod
+    def merged(cls, windows: List["WindowStats"]) -> "WindowStats":
+        """
+        Pooled statistics of several windows (e.g. every node in a zone)
+        Sums are shifted to a common origin before adding
+        """
+        windows = [w for w in windows if w.n]
+        if len(windows) == 1:
+            return windows[0]
+
+        result = cls(max((w.span_seconds for w in windows), default=0))
+        if not windows:
+            return result
+
+        result.origin = min(w.origin for w in windows)
+        for w in windows:
+            d = (w.origin - result.origin) / 60
+            result.n += w.n
+            result.sx += w.sx + w.n * d
+            result.sy += w.sy
+            result.sxy += w.sxy + d * w.sy
+            result.sxx += w.sxx + 2 * d * w.sx + w.n * d * d
+            result.syy += w.syy
+        return result
+
+
+class MetricSeries:
+    """
+    One metric's column of a partition's shared ring buffer, plus running
+    statistics for each time window and quantile sketches covering
+    QUANTILE_HORIZON_SECONDS; `rollups` is the partition's pyramid, which
+    extends history to a year
+    Every row is O(1) amortized; windows evict rows as they age out of
+    the span or out of the buffer. Rows where the metric is missing (NaN)
+    take up space in the window but not in its statistics.
+    """
+
+    def __init__(self, buffer: MetricRingBuffer, rollups: RollupPyramid, metric: str,
+                 window_spans: Dict[str, float] = WINDOW_SPANS):
+        self.buffer = buffer
+        self.rollups = rollups
+        self.metric = metric
+        buffer.add_column(metric)
+        rollups.add_metric(metric)
+        self.windows = {name: WindowStats(span) for name, span in window_spans.items()}
+        self.window_rows = {name: 0 for name in window_spans}  # Newest buffer rows each window spans
+        self.quantiles = WindowedDigest(
+            QUANTILE_BUCKET_SECONDS, int(np.ceil(QUANTILE_HORIZON_SECONDS / QUANTILE_BUCKET_SECONDS)), 100
+        )
+        self.count = 0  # Buffered rows holding a value
+        self.last_timestamp = 0.0
+        self.last_value = float('nan')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def drop_oldest(self):
+        """Forget the buffer's oldest row; call before a row is appended to a full buffer"""
+        t, value = self.buffer.point(self.metric, 0)
+        present = not np.isnan(value)
+        for name, window in self.windows.items():
+            if self.window_rows[name] == len(self.buffer):
+                self.window_rows[name] -= 1
+                if present:
+                    window.remove(t, value)
+        if present:
+            self.count -= 1
+
+    def add(self, t: float, value: Optional[float]):
+        """
+        Account for the row just appended to the buffer at t, holding
+        value for this metric (None if the row lacks it); the partition
+        adds it to the rollups
+        """
+        buffer = self.buffer
+        if value is not None:
+            self.count += 1
+            self.last_timestamp, self.last_value = t, value
+            self.quantiles.add(t, value)
+
+        for name, window in self.windows.items():
+            rows = self.window_rows[name] + 1
+            if value is not None:
+                window.add(t, value)
+            while rows > 1:
+                start_t, start_value = buffer.point(self.metric, len(buffer) - rows)
+                if t - start_t <= window.span_seconds:
+                    break
+                if not np.isnan(start_value):
+                    window.remove(start_t, start_value)
+                rows -= 1
+            self.window_rows[name] = rows
+
+            # Re-sum once per buffer's worth of evictions to bound drift
+            if window.removals >= buffer.capacity:
+                window.recompute(*self.recent(name))
+
+    def recent(self, name: str):
+        """(timestamps, values) of the points in a window, oldest first"""
+        timestamps, values = self.buffer.tail(self.metric, self.window_rows[name])
+        present = ~np.isnan(values)
+        return timestamps[present], values[present]
+
+    @property
+    def nbytes(self) -> int:
+        """Upper bound of the quantile sketches (buffer and rollups are the partition's)"""
+        return self.quantiles.max_bytes
@@ -4,6 +4,8 @@ Auto-train ML model using existing sensor data
 import asyncio
 from database import connect_to_mongo, close_mongo_connection, get_database
 from ml_predictor import predictor
+from training_data import load_training_data
+from training_sampler import train_predictor_from_database
 
 async def auto_train_model():
     """Automatically train the ML model with existing data"""
@@ -18,48 +20,30 @@ async def auto_train_model():
         
         # Get all sensor data
         print("\n📊 Fetching sensor data from database...")
-        sensor_data = await db.sensor_data.find().sort("timestamp", -1).limit(10000).to_list(10000)
+        sensor_count = await db.sensor_data.count_documents({})
         
-        print(f"   Found {len(sensor_data)} sensor readings")
+        print(f"   Found {sensor_count} sensor readings")
         
-        if len(sensor_data) < 100:
+        if sensor_count < 100:
             print("\n⚠️ Insufficient data for training")
             print(f"   Need: 100 samples minimum")
-            print(f"   Have: {len(sensor_data)} samples")
+            print(f"   Have: {sensor_count} samples")
             print("\n💡 Solution: Run the sensor stream for a while to collect data")
             return False
         
-        # Prepare training data
-        print("\n🔧 Preparing training data...")
-        sensor_history = []
-        risk_scores = []
-        risk_levels = []
-        
-        for s in sensor_data:
-            sensor_history.append({
-                'temperature': s.get('temperature', 25),
-                'humidity': s.get('humidity', 50),
-                'smoke_level': s.get('smoke_level', 0),
-                'rain_level': s.get('rain_level', 0),
-                'timestamp': s.get('timestamp')
-            })
-            risk_scores.append(s.get('fire_risk_score', 30))
-            risk_levels.append(s.get('risk_level', 'low'))
-        
-        print(f"   Prepared {len(sensor_history)} training samples")
-        
         # Train the model
         print("\n🤖 Training ML models...")
-        success = predictor.train(sensor_history, risk_scores, risk_levels)
+        success, sample_count = await train_predictor_from_database(db)
         
         if success:
             print("\n✅ Model training completed successfully!")
-            print(f"   Training samples: {len(sensor_history)}")
+            print(f"   Training samples: {sample_count}")
             print(f"   Model saved to: {predictor.model_path}")
             
             # Test prediction
             print("\n🧪 Testing predictions...")
-            test_prediction = predictor.predict(sensor_history[-100:], hours_ahead=6)
+            recent_data = await load_training_data(db, limit=100)
+            test_prediction = predictor.predict(recent_data.tail_records(100), hours_ahead=6)
             
             if 'predictions' in test_prediction and test_prediction['predictions']:
                 print("✅ Model can make predictions!")
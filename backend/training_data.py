@@ -0,0 +1,182 @@
+"""
+Columnar Training Data Loader
+Streams projected sensor readings from MongoDB straight into NumPy arrays
+"""
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+from models import DEFAULT_NODE_ID
+
+
+RISK_LEVEL_CODES = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+RISK_LEVEL_NAMES = {code: name for name, code in RISK_LEVEL_CODES.items()}
+
+# Field -> default used when a reading is missing it
+NUMERIC_FIELDS = {
+    'temperature': 25.0,
+    'humidity': 50.0,
+    'smoke_level': 0.0,
+    'rain_level': 0.0,
+    'fire_risk_score': 30.0
+}
+
+
+class TrainingData:
+    """
+    Sensor readings held as one array per field, oldest first
+    Readings of all nodes are interleaved; `node` holds each row's index
+    into `node_ids` (readings without a node_id belong to the default node)
+    """
+
+    def __init__(self, capacity: int):
+        self.timestamp = np.empty(capacity, dtype='datetime64[ms]')
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.empty(capacity, dtype=np.float64) for field in NUMERIC_FIELDS
+        }
+        self.risk_level = np.empty(capacity, dtype=np.int8)
+        self.node = np.empty(capacity, dtype=np.int32)
+        self.node_ids: List[str] = []
+        self._node_index: Dict[str, int] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_documents(cls, docs: List[Dict]) -> 'TrainingData':
+        """Columnar copy of reading documents given oldest first"""
+        data = cls(len(docs))
+        data._prepend_batch(docs[::-1])
+        return data
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def _prepend_batch(self, batch: List[Dict]):
+        """
+        Copy a batch of newest-first documents in front of the rows loaded so far
+        Arrays fill from the back, so the result is chronological without a copy
+        """
+        end = len(self.timestamp) - self.size
+        start = end - len(batch)
+        batch = batch[::-1]
+
+        self.timestamp[start:end] = [doc.get('timestamp') or datetime.utcnow() for doc in batch]
+        for field, default in NUMERIC_FIELDS.items():
+            self.columns[field][start:end] = [
+                default if doc.get(field) is None else doc[field] for doc in batch
+            ]
+        self.risk_level[start:end] = [
+            RISK_LEVEL_CODES.get(doc.get('risk_level'), 0) for doc in batch
+        ]
+        self.node[start:end] = [self._node_code(doc.get('node_id') or DEFAULT_NODE_ID) for doc in batch]
+        self.size += len(batch)
+
+    def _node_code(self, node_id: str) -> int:
+        code = self._node_index.get(node_id)
+        if code is None:
+            code = self._node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+        return code
+
+    def _trim(self):
+        """Drop unused capacity (rows deleted between count and fetch)"""
+        start = len(self.timestamp) - self.size
+        self.timestamp = self.timestamp[start:]
+        self.columns = {field: col[start:] for field, col in self.columns.items()}
+        self.risk_level = self.risk_level[start:]
+        self.node = self.node[start:]
+
+    def node_rows(self) -> Dict[str, np.ndarray]:
+        """Row indices of each node's readings, oldest first"""
+        order = np.argsort(self.node, kind='stable')
+        bounds = np.searchsorted(self.node[order], np.arange(len(self.node_ids) + 1))
+        return {
+            node_id: order[bounds[code]:bounds[code + 1]]
+            for code, node_id in enumerate(self.node_ids)
+            if bounds[code + 1] > bounds[code]
+        }
+
+    def select(self, rows: np.ndarray) -> 'TrainingData':
+        """Copy of the given rows (e.g. one node's readings from node_rows)"""
+        subset = TrainingData(0)
+        subset.timestamp = self.timestamp[rows]
+        subset.columns = {field: col[rows] for field, col in self.columns.items()}
+        subset.risk_level = self.risk_level[rows]
+        subset.node = self.node[rows]
+        subset.node_ids, subset._node_index = self.node_ids, self._node_index
+        subset.size = len(rows)
+        return subset
+
+    def tail_records(self, n: int) -> List[Dict]:
+        """Most recent n readings as dicts, for predictor.predict"""
+        start = max(0, self.size - n)
+        return [
+            {
+                'temperature': float(self.columns['temperature'][i]),
+                'humidity': float(self.columns['humidity'][i]),
+                'smoke_level': float(self.columns['smoke_level'][i]),
+                'rain_level': float(self.columns['rain_level'][i]),
+                'timestamp': self.timestamp[i].astype(datetime)
+            }
+            for i in range(start, self.size)
+        ]
+
+
+async def load_training_data(
+    db,
+    limit: Optional[int] = 10000,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    node_ids: Optional[List[str]] = None,
+    batch_size: int = 5000
+) -> TrainingData:
+    """
+    Load the most recent readings matching the filters
+
+    Only the fields the model needs are fetched, and the cursor is consumed
+    in batches that are copied into preallocated arrays, so memory stays at
+    the arrays plus one batch even for multi-million-row training sets.
+
+    Args:
+        db: Motor database
+        limit: Maximum number of readings (None for all matching)
+        start_time / end_time: Optional timestamp range
+        node_ids: Optional list of nodes to include
+        batch_size: Documents fetched per round trip
+    """
+    query: Dict = {}
+    if start_time or end_time:
+        query['timestamp'] = {}
+        if start_time:
+            query['timestamp']['$gte'] = start_time
+        if end_time:
+            query['timestamp']['$lte'] = end_time
+    if node_ids:
+        query['node_id'] = {'$in': node_ids}
+
+    count = await db.sensor_data.count_documents(query)
+    size = min(count, limit) if limit else count
+    data = TrainingData(size)
+    if size == 0:
+        return data
+
+    projection = {field: 1 for field in NUMERIC_FIELDS}
+    projection.update({'_id': 0, 'timestamp': 1, 'risk_level': 1, 'node_id': 1})
+
+    # Newest first so the limit keeps the latest readings; the limit also
+    # guards the preallocated arrays against rows inserted after the count
+    cursor = db.sensor_data.find(query, projection).sort('timestamp', -1) \
+        .limit(size).batch_size(batch_size)
+
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            data._prepend_batch(batch)
+            batch = []
+    if batch:
+        data._prepend_batch(batch)
+
+    data._trim()
+    return data
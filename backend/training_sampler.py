@@ -0,0 +1,315 @@
+"""
+Stratified Training-Set Sampler
+Keeps a bounded, balanced reservoir of feature rows per risk level
+so training cost stays fixed and rare critical events stay represented,
+and feeds every labelled reading to the online model
+"""
+import random
+import numpy as np
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from config import settings
+from ml_predictor import predictor, ROLLING_WINDOW
+from training_data import RISK_LEVEL_CODES, NUMERIC_FIELDS, TrainingData, load_training_data
+from online_learner import save_online_state, load_online_state
+
+
+ONLINE_SAVE_EVERY = 60  # Online model updates between saves (~1 min of fleet readings)
+ONLINE_REFRESH_SECONDS = 30  # Minimum interval between API-side reloads
+
+_online_checked_at: Optional[datetime] = None
+
+
+class StratifiedReservoirSampler:
+    """
+    Reservoir sampling (Algorithm R) run separately for each risk level
+
+    Every labelled reading is offered to the reservoir of its risk level,
+    which keeps a uniform sample of at most `capacity_per_level` readings
+    of that level. Slots and seen-counters live in MongoDB, so the
+    ingestion process fills the reservoir and the API process trains
+    from it.
+    """
+
+    def __init__(self, capacity_per_level: int = 2500):
+        self.capacity_per_level = capacity_per_level
+        self.recent_readings: Dict[str, deque] = {}  # Rolling feature window per node
+
+    async def _node_window(self, db, node_id: str) -> deque:
+        """Last hour of readings for a node, seeded from the database on first use"""
+        if node_id not in self.recent_readings:
+            cursor = db.sensor_data.find(
+                {"node_id": node_id},
+                {"_id": 0, "temperature": 1, "humidity": 1, "smoke_level": 1,
+                 "rain_level": 1, "timestamp": 1}
+            ).sort("timestamp", -1).limit(ROLLING_WINDOW - 1)
+            history = await cursor.to_list(ROLLING_WINDOW - 1)
+            self.recent_readings[node_id] = deque(reversed(history), maxlen=ROLLING_WINDOW)
+
+        return self.recent_readings[node_id]
+
+    async def window_features(self, db, reading: Dict) -> np.ndarray:
+        """Append a reading to its node's window and return the reading's feature row"""
+        window = await self._node_window(db, reading.get('node_id'))
+        window.append({
+            'temperature': reading.get('temperature', 0),
+            'humidity': reading.get('humidity', 0),
+            'smoke_level': reading.get('smoke_level', 0),
+            'rain_level': reading.get('rain_level', 0),
+            'timestamp': reading.get('timestamp') or datetime.utcnow()
+        })
+        return predictor.extract_latest_features(list(window))
+
+    async def add_reading(self, db, reading: Dict, risk_score: float, risk_level: str,
+                          features: Optional[np.ndarray] = None) -> bool:
+        """
+        Offer a labelled reading to its risk level's reservoir
+
+        `features` is the row from window_features, computed here when omitted.
+        Returns True if the reading took a reservoir slot
+        """
+        try:
+            if features is None:
+                features = await self.window_features(db, reading)
+
+            if risk_level not in RISK_LEVEL_CODES:
+                return False
+
+            counter = await db.training_reservoir_meta.find_one_and_update(
+                {"_id": risk_level},
+                {"$inc": {"seen": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            seen = counter['seen']
+
+            # Fill the first slots, then replace with probability capacity/seen
+            if seen <= self.capacity_per_level:
+                slot = seen - 1
+            else:
+                slot = random.randrange(seen)
+                if slot >= self.capacity_per_level:
+                    return False
+
+            await db.training_reservoir.update_one(
+                {"risk_level": risk_level, "slot": slot},
+                {"$set": {
+                    "features": features.tolist(),
+                    "risk_score": float(risk_score),
+                    "node_id": reading.get('node_id'),
+                    "timestamp": reading.get('timestamp') or datetime.utcnow()
+                }},
+                upsert=True
+            )
+            return True
+
+        except Exception as e:
+            print(f"⚠️ Training sampler update failed: {e}")
+            return False
+
+    async def load_sample(self, db) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Balanced training sample as (features, risk_scores, risk_level_codes)
+
+        Returns None when the reservoir is empty or was built for a
+        different feature set
+        """
+        docs = await db.training_reservoir.find(
+            {"slot": {"$lt": self.capacity_per_level}},
+            {"_id": 0, "features": 1, "risk_score": 1, "risk_level": 1}
+        ).to_list(None)
+
+        n_features = len(predictor.feature_columns)
+        docs = [d for d in docs if len(d.get('features', [])) == n_features]
+        if not docs:
+            return None
+
+        X = np.array([d['features'] for d in docs], dtype=np.float64)
+        risk_scores = np.array([d['risk_score'] for d in docs], dtype=np.float64)
+        level_codes = np.array([RISK_LEVEL_CODES[d['risk_level']] for d in docs], dtype=np.int64)
+        return X, risk_scores, level_codes
+
+    async def rebuild_from_history(self, db, batch_size: int = 5000) -> Dict[str, int]:
+        """
+        Rebuild every reservoir from the full sensor history
+
+        Equivalent to streaming all readings through add_reading: readings
+        are read node by node in time order (legacy readings without a
+        node_id form one more series) and offered in batches to in-memory
+        reservoirs, so memory stays at the reservoirs plus one batch. The
+        result is written to staging collections and renamed over the live
+        ones, so trainers never see a half-built reservoir.
+        """
+        rng = np.random.default_rng()
+        n_features = len(predictor.feature_columns)
+        capacity = self.capacity_per_level
+        # Per level: features, risk scores, node ids and timestamps, as add_reading stores them
+        reservoirs = {
+            code: (np.empty((capacity, n_features)), np.empty(capacity),
+                   np.empty(capacity, dtype=object), np.empty(capacity, dtype='datetime64[ms]'))
+            for code in RISK_LEVEL_CODES.values()
+        }
+        seen = dict.fromkeys(RISK_LEVEL_CODES.values(), 0)
+
+        def offer_batch(docs: List[Dict], context: List[Dict]):
+            # Preceding readings of the same node give the batch its rolling features
+            data = TrainingData.from_documents(context + docs)
+            batch = (
+                predictor.extract_features_columnar(data)[len(context):],
+                data['fire_risk_score'][len(context):],
+                np.full(len(docs), docs[0].get('node_id'), dtype=object),
+                data.timestamp[len(context):]
+            )
+            levels = data.risk_level[len(context):]
+            for code, reservoir in reservoirs.items():
+                rows = np.flatnonzero(levels == code)
+                if len(rows):
+                    seen[code] = _reservoir_offer(reservoir, tuple(column[rows] for column in batch),
+                                                  seen[code], rng)
+
+        projection = {field: 1 for field in NUMERIC_FIELDS}
+        projection.update({'_id': 0, 'node_id': 1, 'timestamp': 1, 'risk_level': 1})
+        cursor = db.sensor_data.find({}, projection) \
+            .sort([('node_id', -1), ('timestamp', 1)]).batch_size(batch_size)
+
+        batch, context, node_id = [], [], None
+        async for doc in cursor:
+            if batch and doc.get('node_id') != node_id:
+                offer_batch(batch, context)
+                batch, context = [], []
+            node_id = doc.get('node_id')
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                offer_batch(batch, context)
+                context = batch[-(ROLLING_WINDOW - 1):]
+                batch = []
+        if batch:
+            offer_batch(batch, context)
+
+        staging, staging_meta = db.training_reservoir_staging, db.training_reservoir_meta_staging
+        await staging.drop()
+        await staging_meta.drop()
+        await staging.create_index([("risk_level", 1), ("slot", 1)], unique=True)
+
+        sizes = {}
+        for level, code in RISK_LEVEL_CODES.items():
+            if not seen[code]:
+                continue
+            X, y, nodes, timestamps = reservoirs[code]
+            size = min(seen[code], self.capacity_per_level)
+            await staging.insert_many([
+                {
+                    "risk_level": level,
+                    "slot": slot,
+                    "features": X[slot].tolist(),
+                    "risk_score": float(y[slot]),
+                    "node_id": nodes[slot],
+                    "timestamp": timestamps[slot].astype(datetime)
+                }
+                for slot in range(size)
+            ])
+            await staging_meta.insert_one({"_id": level, "seen": seen[code]})
+            sizes[level] = size
+
+        await staging.rename("training_reservoir", dropTarget=True)
+        if sizes:
+            await staging_meta.rename("training_reservoir_meta", dropTarget=True)
+        else:
+            await db.training_reservoir_meta.delete_many({})
+
+        print(f"✅ Training reservoir rebuilt: {sizes}")
+        return sizes
+
+
+def _reservoir_offer(reservoir: Tuple[np.ndarray, ...], batch: Tuple[np.ndarray, ...],
+                     seen: int, rng: np.random.Generator) -> int:
+    """
+    Algorithm R over a batch of rows for one in-memory reservoir
+    `reservoir` and `batch` hold matching columns (features, scores, ...);
+    returns the new seen-count
+    """
+    capacity = len(reservoir[0])
+    positions = seen + np.arange(len(batch[0]))  # Index of each row among all rows seen
+
+    fill = np.flatnonzero(positions < capacity)
+    for column, values in zip(reservoir, batch):
+        column[positions[fill]] = values[fill]
+
+    # Row i replaces a uniform slot in [0, i] if that slot exists; when
+    # several rows pick the same slot the last one wins, as in sequence
+    slots = rng.integers(0, positions + 1)
+    rows = np.flatnonzero((positions >= capacity) & (slots < capacity))[::-1]
+    _, last = np.unique(slots[rows], return_index=True)
+    rows = rows[last]
+    for column, values in zip(reservoir, batch):
+        column[slots[rows]] = values[rows]
+    return seen + len(batch[0])
+
+
+async def train_predictor_from_database(db, limit: int = 10000) -> Tuple[bool, int]:
+    """
+    Train the global predictor from the balanced reservoir, falling back
+    to the latest `limit` readings while the reservoir is still small
+
+    Returns (success, number of training samples)
+    """
+    sample = await training_sampler.load_sample(db) if settings.training_use_reservoir else None
+
+    if sample is not None and len(sample[0]) >= 100:
+        print(f"📊 Training from stratified reservoir ({len(sample[0])} samples)")
+        return predictor.train_from_features(*sample), len(sample[0])
+
+    training_data = await load_training_data(db, limit=limit)
+    return predictor.train_from_columns(training_data), len(training_data)
+
+
+async def ingest_labelled_reading(db, reading: Dict, risk_score: float, risk_level: str):
+    """
+    Feed a labelled reading to the training reservoir and the online model
+
+    The online model's state is saved every ONLINE_SAVE_EVERY updates so
+    the API process can serve it (see refresh_online_model)
+    """
+    try:
+        features = await training_sampler.window_features(db, reading)
+    except Exception as e:
+        print(f"⚠️ Feature extraction for training failed: {e}")
+        return
+
+    await training_sampler.add_reading(db, reading, risk_score, risk_level, features)
+
+    if not settings.ml_online_learning:
+        return
+    try:
+        if predictor.online_model.n_updates == 0:
+            await load_online_state(db, predictor.online_model)  # Resume after restart
+        predictor.learn_online(features, risk_score)
+        if predictor.online_model.n_updates % ONLINE_SAVE_EVERY == 0:
+            await save_online_state(db, predictor.online_model)
+    except Exception as e:
+        print(f"⚠️ Online model update failed: {e}")
+
+
+async def refresh_online_model(db) -> bool:
+    """
+    Pick up the online model state saved by the ingestion process
+    Checks the database at most once every ONLINE_REFRESH_SECONDS
+    """
+    global _online_checked_at
+    now = datetime.utcnow()
+    if not settings.ml_online_learning or \
+            (_online_checked_at and (now - _online_checked_at).total_seconds() < ONLINE_REFRESH_SECONDS):
+        return False
+
+    _online_checked_at = now
+    try:
+        return await load_online_state(db, predictor.online_model)
+    except Exception as e:
+        print(f"⚠️ Online model refresh failed: {e}")
+        return False
+
+
+# Global sampler instance
+training_sampler = StratifiedReservoirSampler(settings.training_reservoir_size_per_level)
@@ -0,0 +1,198 @@
+"""
+Compiled Tree Inference Engine
+Flattens trained tree ensembles into contiguous NumPy node arrays
+and evaluates all trees for many rows in one vectorized traversal
+"""
+import numpy as np
+from typing import Dict, Tuple
+
+
+FOREST_REGRESSOR = "forest_regressor"
+GRADIENT_BOOSTING_CLASSIFIER = "gradient_boosting_classifier"
+
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes', 'base_score')
+
+CHUNK_ROWS = 256  # Keeps the (rows x trees) index arrays cache resident
+
+
+class CompiledTreeEnsemble:
+    """
+    Tree ensemble stored as flat node arrays
+
+    Every tree is concatenated into one set of arrays with siblings stored
+    next to each other (right == left + 1), so a step needs one child
+    lookup. Leaves point to themselves with an infinite threshold, so
+    stepping all (row, tree) pairs down one level per iteration for
+    max_depth iterations lands every pair on its leaf.
+    """
+
+    def __init__(self, kind: str, feature: np.ndarray, threshold: np.ndarray,
+                 left: np.ndarray, right: np.ndarray, value: np.ndarray,
+                 roots: np.ndarray, max_depth: int, learning_rate: float = 1.0,
+                 base_score: np.ndarray = None, classes: np.ndarray = None):
+        self.kind = kind
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.learning_rate = float(learning_rate)
+        self.base_score = np.zeros(1) if base_score is None else np.asarray(base_score, dtype=np.float64)
+        self.classes = np.arange(len(self.base_score)) if classes is None else np.asarray(classes)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Leaf value reached by every row in every tree, shape (n_rows, n_trees)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[0] > CHUNK_ROWS:
+            return np.concatenate([
+                self.leaf_values(X[start:start + CHUNK_ROWS])
+                for start in range(0, X.shape[0], CHUNK_ROWS)
+            ])
+
+        flat_X = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.int32) * X.shape[1])[:, None]
+        idx = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            go_right = flat_X[row_offsets + self.feature[idx]] > self.threshold[idx]
+            idx = self.left[idx] + go_right
+
+        return self.value[idx]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Regression output (forest) or class labels (boosting)"""
+        if self.kind == FOREST_REGRESSOR:
+            return self.leaf_values(X).mean(axis=1)
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Raw boosting scores, shape (n_rows, n_tree_outputs)"""
+        n_outputs = len(self.base_score)
+        leaves = self.leaf_values(X)
+        stage_sums = leaves.reshape(leaves.shape[0], -1, n_outputs).sum(axis=1)
+        return self.base_score + self.learning_rate * stage_sums
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for boosting classifiers"""
+        raw = self.decision_function(X)
+
+        if raw.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Flatten into named arrays, saved one .npy file each and memory-mapped on load"""
+        arrays = {f"{prefix}_{name}": getattr(self, name) for name in ARRAY_FIELDS}
+        arrays[f"{prefix}_kind"] = np.array(self.kind)
+        arrays[f"{prefix}_max_depth"] = np.array(self.max_depth)
+        arrays[f"{prefix}_learning_rate"] = np.array(self.learning_rate)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str) -> "CompiledTreeEnsemble":
+        """Rebuild from arrays written by to_arrays"""
+        fields = {name: arrays[f"{prefix}_{name}"] for name in ARRAY_FIELDS}
+        return cls(
+            kind=str(arrays[f"{prefix}_kind"]),
+            max_depth=int(arrays[f"{prefix}_max_depth"]),
+            learning_rate=float(arrays[f"{prefix}_learning_rate"]),
+            **fields
+        )
+
+
+def _sibling_order(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+    """Breadth-first node order that places every right child right after its left sibling"""
+    order = [0]
+    for node in order:
+        if children_left[node] != -1:
+            order.append(children_left[node])
+            order.append(children_right[node])
+    return np.array(order)
+
+
+def _flatten_trees(trees) -> Tuple[np.ndarray, ...]:
+    """Concatenate sklearn Tree objects into global node arrays"""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for tree in trees:
+        n = tree.node_count
+        order = _sibling_order(tree.children_left, tree.children_right)
+        new_id = np.empty(n, dtype=np.int64)
+        new_id[order] = np.arange(n) + offset
+
+        children_left = tree.children_left[order]
+        is_leaf = children_left == -1
+        left_ids = np.where(is_leaf, new_id[order], new_id[np.where(is_leaf, 0, children_left)])
+
+        feature.append(np.where(is_leaf, 0, tree.feature[order]))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+        left.append(left_ids)
+        right.append(np.where(is_leaf, left_ids, left_ids + 1))
+        value.append(tree.value[order, 0, 0])
+        roots.append(offset)
+
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return (np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+            np.concatenate(right), np.concatenate(value), np.array(roots), max_depth)
+
+
+def compile_forest_regressor(model) -> CompiledTreeEnsemble:
+    """Compile a fitted single-output RandomForestRegressor"""
+    feature, threshold, left, right, value, roots, max_depth = _flatten_trees(
+        est.tree_ for est in model.estimators_
+    )
+    return CompiledTreeEnsemble(
+        FOREST_REGRESSOR, feature, threshold, left, right, value, roots, max_depth
+    )
+
+
+def compile_gradient_boosting_classifier(model) -> CompiledTreeEnsemble:
+    """Compile a fitted GradientBoostingClassifier"""
+    n_stages, n_outputs = model.estimators_.shape
+
+    # Stage-major order so leaf values reshape to (rows, stages, outputs)
+    feature, threshold, left, right, value, roots, max_depth = _flatten_trees(
+        model.estimators_[stage, k].tree_
+        for stage in range(n_stages) for k in range(n_outputs)
+    )
+    compiled = CompiledTreeEnsemble(
+        GRADIENT_BOOSTING_CLASSIFIER, feature, threshold, left, right, value, roots,
+        max_depth, learning_rate=model.learning_rate,
+        base_score=np.zeros(n_outputs), classes=model.classes_
+    )
+
+    # The init estimator is a constant prior, so its raw score is recovered
+    # from any single row as sklearn's decision minus the tree contribution
+    probe = np.zeros((1, model.n_features_in_))
+    raw = np.asarray(model.decision_function(probe), dtype=np.float64).reshape(1, n_outputs)
+    compiled.base_score = (raw - compiled.decision_function(probe))[0]
+    return compiled
+
+
+def max_deviation(compiled: CompiledTreeEnsemble, model, X: np.ndarray) -> float:
+    """Largest absolute difference from the sklearn model on X"""
+    if compiled.kind == FOREST_REGRESSOR:
+        return float(np.max(np.abs(compiled.predict(X) - model.predict(X))))
+
+    proba_diff = np.max(np.abs(compiled.predict_proba(X) - model.predict_proba(X)))
+    label_mismatch = np.any(compiled.predict(X) != model.predict(X))
+    return float('inf') if label_mismatch else float(proba_diff)
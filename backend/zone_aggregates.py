@@ -0,0 +1,73 @@
+"""
+Incremental Zone Aggregates
+Running sum, count and max of the risk scores of a zone's online nodes,
+updated per node instead of recomputed over the whole zone
+"""
+import heapq
+import math
+from typing import Dict, List, Tuple
+
+
+class ZoneRiskAggregate:
+    """
+    Risk scores of a zone's online nodes with their running sum and a
+    lazy max-heap
+
+    Setting or removing one node's score is O(log n): the sum is adjusted
+    and the new score pushed; superseded heap entries are discarded when
+    they surface at the top. The heap is rebuilt (and the sum recomputed
+    exactly, bounding float drift) once stale entries outnumber live ones.
+    """
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.total = 0.0
+        self._heap: List[Tuple[float, str]] = []  # (-score, node_id)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.scores
+
+    def set(self, node_id: str, score: float):
+        """Add a node or change its score"""
+        score = float(score)
+        previous = self.scores.get(node_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self.total -= previous
+        self.scores[node_id] = score
+        self.total += score
+        heapq.heappush(self._heap, (-score, node_id))
+        self._maybe_compact()
+
+    def discard(self, node_id: str):
+        """Remove a node (e.g. gone offline); no-op if absent"""
+        previous = self.scores.pop(node_id, None)
+        if previous is None:
+            return
+        if not self.scores:
+            self.total = 0.0
+            self._heap.clear()
+            return
+        self.total -= previous
+        self._maybe_compact()
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.scores) if self.scores else 0.0
+
+    @property
+    def max(self) -> float:
+        heap = self._heap
+        while heap and self.scores.get(heap[0][1]) != -heap[0][0]:
+            heapq.heappop(heap)
+        return -heap[0][0] if heap else 0.0
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self.scores) + 32:
+            self._heap = [(-score, node_id) for node_id, score in self.scores.items()]
+            heapq.heapify(self._heap)
+            self.total = math.fsum(self.scores.values())
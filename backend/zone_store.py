@@ -0,0 +1,239 @@
+"""
+Zone and Node Persistence
+Keeps the sensor network's configuration (zones and registered nodes) in
+MongoDB: bulk loaded at startup, written through on registration, and
+re-synced periodically so every worker shares one view
+"""
+import asyncio
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import ValidationError
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from config import settings
+from metric_buffer import to_epoch
+from multi_zone_manager import MultiZoneManager, SensorZone, SensorNode, ZONE_CONFIG_FIELDS, zone_manager
+from smart_alerts import alert_system
+
+
+NODE_CONFIG_FIELDS = ('zone_id', 'name', 'latitude', 'longitude', 'battery_level', 'signal_strength', 'elevation_m')
+SYNC_OVERLAP = timedelta(seconds=5)  # Re-read this much before the last sync to cover clock skew between workers
+
+
+def zone_document(zone: SensorZone) -> Dict:
+    doc = {field: getattr(zone, field) for field in ZONE_CONFIG_FIELDS}
+    doc.update(_id=zone.zone_id, updated_at=datetime.utcnow())
+    return doc
+
+
+def node_document(node: SensorNode) -> Dict:
+    doc = {field: getattr(node, field) for field in NODE_CONFIG_FIELDS}
+    doc.update(_id=node.node_id, updated_at=datetime.utcnow())
+    return doc
+
+
+def node_from_document(doc: Dict) -> SensorNode:
+    """Node of a stored registration; offline until it reports"""
+    fields = {field: doc.get(field) for field in NODE_CONFIG_FIELDS}
+    return SensorNode(node_id=doc['_id'], is_online=False, last_heartbeat=doc['updated_at'], **fields)
+
+
+async def save_zones(db, zones: Iterable[SensorZone]) -> int:
+    requests = [ReplaceOne({'_id': zone.zone_id}, zone_document(zone), upsert=True) for zone in zones]
+    if not requests:
+        return 0
+    await db.zones.bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+async def save_nodes(db, nodes: Iterable[SensorNode]) -> int:
+    """Upsert node registrations in one bulk_write; returns how many were written"""
+    requests = [ReplaceOne({'_id': node.node_id}, node_document(node), upsert=True) for node in nodes]
+    if not requests:
+        return 0
+    await db.sensor_nodes.bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+async def latest_heartbeats(db, node_ids: List[str]) -> Dict[str, float]:
+    """Epoch time of each node's newest stored reading, whichever worker received it"""
+    docs = await db.sensor_data.aggregate([
+        {"$match": {"node_id": {"$in": node_ids}}},
+        {"$sort": {"node_id": 1, "timestamp": -1}},
+        {"$group": {"_id": "$node_id", "timestamp": {"$first": "$timestamp"}}}
+    ]).to_list(None)
+    return {doc['_id']: to_epoch(doc['timestamp']) for doc in docs}
+
+
+def parse_node_rows(rows: Iterable[Dict], known_zones: Iterable[str]) -> Tuple[List[SensorNode], List[str]]:
+    """
+    Validate registration rows (dicts from JSON or CSV)
+    Returns the nodes and one error message per rejected row
+    """
+    known_zones = set(known_zones)
+    now = datetime.utcnow()
+    nodes, errors, seen = [], [], set()
+    for i, row in enumerate(rows, start=1):
+        row = {k.strip(): v for k, v in row.items() if k and v not in (None, '')}
+        try:
+            node = SensorNode(
+                node_id=str(row['node_id']).strip(),
+                zone_id=str(row['zone_id']).strip(),
+                name=str(row.get('name', row['node_id'])).strip(),
+                latitude=row['latitude'],
+                longitude=row['longitude'],
+                battery_level=row.get('battery_level'),
+                signal_strength=row.get('signal_strength'),
+                elevation_m=row.get('elevation_m'),
+                last_heartbeat=now
+            )
+        except KeyError as e:
+            errors.append(f"row {i}: missing {e.args[0]}")
+            continue
+        except ValidationError as e:
+            errors.append(f"row {i}: " + "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+        except Exception as e:
+            errors.append(f"row {i}: {e}")
+            continue
+        if node.zone_id not in known_zones:
+            errors.append(f"row {i}: unknown zone {node.zone_id}")
+        elif not (-90 <= node.latitude <= 90 and -180 <= node.longitude <= 180):
+            errors.append(f"row {i}: coordinates out of range")
+        elif node.node_id in seen:
+            errors.append(f"row {i}: duplicate node_id {node.node_id}")
+        else:
+            seen.add(node.node_id)
+            nodes.append(node)
+    return nodes, errors
+
+
+def parse_node_csv(text: str) -> List[Dict]:
+    """Rows of a CSV with a header line (node_id, zone_id, name, latitude, longitude, ...)"""
+    return list(csv.DictReader(io.StringIO(text.lstrip('\ufeff'))))
+
+
+class ZoneStore:
+    """
+    Loads the network into a zone manager and keeps it in step with MongoDB
+
+    The first start seeds the collections with the manager's default
+    zones. Later starts upsert the stored zones and bulk register the
+    stored nodes; a background loop then picks up registrations made by
+    other workers from `updated_at`. Heartbeat deadlines are checked
+    against readings any worker stored, and each offline alert is sent by
+    the one worker that claims it.
+    """
+
+    def __init__(self, manager: MultiZoneManager, sync_seconds: float = 30, batch_size: int = 1000):
+        self.manager = manager
+        self.sync_seconds = sync_seconds
+        self.batch_size = batch_size
+        self.synced_through: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def load(self, db) -> Tuple[int, int]:
+        """Bulk load zones and nodes; returns (zones, nodes) loaded"""
+        zone_docs = await db.zones.find({}).to_list(None)
+        if not zone_docs:
+            seeded = await save_zones(db, self.manager.zones.values())
+            print(f"✅ Seeded {seeded} default zones")
+        for doc in zone_docs:
+            self.manager.upsert_zone(SensorZone(
+                zone_id=doc['_id'], sensor_nodes=[], last_update=datetime.utcnow(),
+                **{field: doc[field] for field in ZONE_CONFIG_FIELDS}
+            ))
+
+        self.synced_through = None
+        loaded = await self._load_nodes(db, {})
+        return len(zone_docs), loaded
+
+    async def _load_nodes(self, db, query: Dict) -> int:
+        cursor = db.sensor_nodes.find(query).sort('updated_at', 1).batch_size(self.batch_size)
+        batch, loaded = [], 0
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                loaded += self._apply(batch)
+                batch = []
+        if batch:
+            loaded += self._apply(batch)
+        return loaded
+
+    def _apply(self, docs: List[Dict]) -> int:
+        nodes = []
+        for doc in docs:
+            try:
+                node = node_from_document(doc)
+            except Exception as e:
+                print(f"⚠️ Skipping stored node {doc.get('_id')}: {e}")
+                continue
+            current = self.manager.nodes.get(node.node_id)
+            if current is None or any(getattr(current, f) != getattr(node, f) for f in NODE_CONFIG_FIELDS):
+                nodes.append(node)
+        if docs:
+            newest = docs[-1]['updated_at']
+            if self.synced_through is None or newest > self.synced_through:
+                self.synced_through = newest
+        return self.manager.register_nodes(nodes)
+
+    async def sync(self, db) -> int:
+        """Apply nodes registered or changed since the last load or sync"""
+        query = {}
+        if self.synced_through is not None:
+            query = {'updated_at': {'$gt': self.synced_through - SYNC_OVERLAP}}
+        return await self._load_nodes(db, query)
+
+    def share_heartbeats(self, db):
+        """Expire nodes only when no worker heard from them; alert once per outage"""
+        registry = self.manager.nodes
+
+        async def last_seen(node_ids: List[str]) -> Dict[str, float]:
+            seen = await latest_heartbeats(db, node_ids)
+            for node_id, t in seen.items():
+                slot = registry.slots.get(node_id)
+                if slot is not None and t > registry.columns['last_heartbeat'][slot]:
+                    registry.columns['last_heartbeat'][slot] = t
+            return seen
+
+        def on_offline(node_id: str, zone_id: str, last_heartbeat: datetime):
+            asyncio.create_task(self._alert_offline(db, node_id, zone_id, last_heartbeat))
+
+        self.manager.heartbeats.last_seen = last_seen
+        self.manager.subscribe_offline(on_offline)
+
+    async def _alert_offline(self, db, node_id: str, zone_id: str, last_heartbeat: datetime):
+        # Every worker sees the same last stored reading, so the first insert wins
+        try:
+            await db.node_offline_alerts.insert_one({
+                '_id': f"{node_id}@{last_heartbeat.isoformat()}",
+                'created_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return
+        except Exception as e:
+            print(f"⚠️ Offline alert claim failed for {node_id}, alerting anyway: {e}")
+        alert_system.publish_node_offline(node_id, zone_id, last_heartbeat)
+
+    def start(self, db) -> Optional[asyncio.Task]:
+        """Keep syncing in the background (after load) and share heartbeats between workers"""
+        self.share_heartbeats(db)
+        if self.sync_seconds:
+            self.task = asyncio.create_task(self.run(db))
+        return self.task
+
+    async def run(self, db):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync(db)
+            except Exception as e:
+                print(f"⚠️ Zone sync failed: {e}")
+
+
+# Global zone store instance
+zone_store = ZoneStore(zone_manager, sync_seconds=settings.zone_sync_seconds)
@@ -269,11 +269,21 @@ export class WebSocketClient {
 
 // ML Predictions API
 export const mlAPI = {
-  getPredictions: async (hoursAhead: number = 12) => {
-    const response = await api.get(`/api/predictions/fire-risk?hours_ahead=${hoursAhead}`);
+  getPredictions: async (hoursAhead: number = 12, mode?: 'batch' | 'online' | 'blend') => {
+    const modeParam = mode ? `&mode=${mode}` : '';
+    const response = await api.get(`/api/predictions/fire-risk?hours_ahead=${hoursAhead}${modeParam}`);
     return response.data;
   },
-  
+
+  getBatchPredictions: async (options: { nodeIds?: string[]; zoneId?: string; hoursAhead?: number } = {}) => {
+    const response = await api.post('/api/predictions/fire-risk/batch', {
+      node_ids: options.nodeIds,
+      zone_id: options.zoneId,
+      hours_ahead: options.hoursAhead ?? 6,
+    });
+    return response.data;
+  },
+
   trainModel: async () => {
     const response = await api.post('/api/ml/train');
     return response.data;
@@ -307,6 +317,11 @@ export const zoneAPI = {
     return response.data;
   },
   
+  getInterpolated: async (zoneId: string) => {
+    const response = await api.get(`/api/zones/${zoneId}/interpolated`);
+    return response.data;
+  },
+  
   activateSprinklers: async (zoneId: string) => {
     const response = await api.post(`/api/zones/${zoneId}/activate-sprinklers`);
     return response.data;
@@ -321,6 +336,30 @@ export const zoneAPI = {
     const response = await api.post('/api/nodes/register', nodeData);
     return response.data;
   },
+  
+  // nodes: an array of node objects, or CSV text with a header row
+  bulkRegisterNodes: async (nodes: any[] | string) => {
+    const response = typeof nodes === 'string'
+      ? await api.post('/api/nodes/bulk-register', nodes, { headers: { 'Content-Type': 'text/csv' } })
+      : await api.post('/api/nodes/bulk-register', { nodes });
+    return response.data;
+  },
+  
+  getNearbyNodes: async (
+    latitude: number,
+    longitude: number,
+    options: { radiusM?: number; k?: number; onlineOnly?: boolean } = {}
+  ) => {
+    const params = new URLSearchParams({
+      latitude: latitude.toString(),
+      longitude: longitude.toString(),
+    });
+    if (options.radiusM !== undefined) params.append('radius_m', options.radiusM.toString());
+    if (options.k !== undefined) params.append('k', options.k.toString());
+    if (options.onlineOnly !== undefined) params.append('online_only', String(options.onlineOnly));
+    const response = await api.get(`/api/nodes/nearby?${params.toString()}`);
+    return response.data;
+  },
 };
 
 // External Data API
@@ -363,29 +402,94 @@ export const externalAPI = {
 };
 
 // Analytics API
+// Queries cover one node, one zone, or the whole fleet when no scope is given
+export interface AnalyticsScope {
+  nodeId?: string;
+  zoneId?: string;
+}
+
+const scopeParams = (scope: AnalyticsScope = {}) => {
+  const params = new URLSearchParams();
+  if (scope.nodeId) params.append('node_id', scope.nodeId);
+  if (scope.zoneId) params.append('zone_id', scope.zoneId);
+  return params;
+};
+
 export const analyticsAPI = {
-  getTrends: async (metric: string = 'temperature') => {
-    const response = await api.get(`/api/analytics/trends?metric=${metric}`);
+  getTrends: async (metric: string = 'temperature', scope?: AnalyticsScope) => {
+    const params = scopeParams(scope);
+    params.append('metric', metric);
+    const response = await api.get(`/api/analytics/trends?${params.toString()}`);
     return response.data;
   },
   
-  getPatterns: async () => {
-    const response = await api.get('/api/analytics/patterns');
+  getPatterns: async (scope?: AnalyticsScope) => {
+    const response = await api.get(`/api/analytics/patterns?${scopeParams(scope).toString()}`);
     return response.data;
   },
   
-  getInsights: async () => {
-    const response = await api.get('/api/analytics/insights');
+  getPatternEvents: async (limit: number = 50, scope?: AnalyticsScope) => {
+    const params = scopeParams(scope);
+    params.append('limit', limit.toString());
+    const response = await api.get(`/api/analytics/pattern-events?${params.toString()}`);
     return response.data;
   },
   
-  getForecast: async () => {
-    const response = await api.get('/api/analytics/forecast');
+  getPatternSpecs: async () => {
+    const response = await api.get('/api/analytics/pattern-specs');
     return response.data;
   },
   
-  getHistoricalComparison: async (daysBack: number = 7) => {
-    const response = await api.get(`/api/analytics/historical-comparison?days_back=${daysBack}`);
+  updatePatternSpecs: async (specs: any[]) => {
+    const response = await api.put('/api/analytics/pattern-specs', specs);
+    return response.data;
+  },
+  
+  getInsights: async (scope?: AnalyticsScope) => {
+    const response = await api.get(`/api/analytics/insights?${scopeParams(scope).toString()}`);
+    return response.data;
+  },
+  
+  getForecast: async (scope?: AnalyticsScope) => {
+    const response = await api.get(`/api/analytics/forecast?${scopeParams(scope).toString()}`);
+    return response.data;
+  },
+  
+  getAnomalies: async (limit: number = 50, scope?: AnalyticsScope) => {
+    const params = scopeParams(scope);
+    params.append('limit', limit.toString());
+    const response = await api.get(`/api/analytics/anomalies?${params.toString()}`);
+    return response.data;
+  },
+  
+  getHistoricalComparison: async (daysBack: number = 7, scope?: AnalyticsScope) => {
+    const params = scopeParams(scope);
+    params.append('days_back', daysBack.toString());
+    const response = await api.get(`/api/analytics/historical-comparison?${params.toString()}`);
+    return response.data;
+  },
+
+  getRollup: async (
+    metric: string = 'temperature',
+    daysBack: number = 30,
+    resolutionMinutes: number = 60,
+    scope?: AnalyticsScope
+  ) => {
+    const params = scopeParams(scope);
+    params.append('metric', metric);
+    params.append('days_back', daysBack.toString());
+    params.append('resolution_minutes', resolutionMinutes.toString());
+    const response = await api.get(`/api/analytics/rollup?${params.toString()}`);
+    return response.data;
+  },
+
+  getWarmStart: async () => {
+    const response = await api.get('/api/analytics/warm-start');
+    return response.data;
+  },
+
+  saveSnapshot: async () => {
+    const response = await api.post('/api/analytics/snapshot');
     return response.data;
   },
 };